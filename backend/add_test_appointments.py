@@ -3,29 +3,22 @@
 Script to add test appointments for today
 """
 
-import mysql.connector
-from datetime import datetime, timedelta
+from datetime import datetime
 import sys
 import os
 
 # Add the current directory to the path so we can import app
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host='localhost',
-        user='root',
-        password='',
-        database='dental_care',
-        autocommit=True
-    )
+import rollups
+from db_pool import get_db_connection
 
 def add_test_appointments():
     # Database connection
     conn = get_db_connection()
     
     try:
-        with conn.cursor(dictionary=True) as cursor:
+        with conn.cursor() as cursor:
             # Get today's date
             today = datetime.now().strftime('%Y-%m-%d')
             
@@ -50,6 +43,9 @@ def add_test_appointments():
                     INSERT INTO appointments (patient_id, doctor_id, date, time, status)
                     VALUES (%s, %s, %s, %s, %s)
                 ''', (patient_id, doctor_id, date, time, status))
+                rollups.record_created(cursor, {'patient_id': patient_id, 'doctor_id': doctor_id,
+                                                'date': date, 'time': time, 'status': status})
+            conn.commit()
             
             print(f"Added {len(test_appointments)} test appointments for today ({today})")
             
@@ -69,6 +65,7 @@ def add_test_appointments():
                 print(f"- {appt['time']}: {appt['patient_name']} with {appt['doctor_name']} ({appt['status']})")
                 
     except Exception as e:
+        conn.rollback()
         print(f"Error: {e}")
     finally:
         conn.close()
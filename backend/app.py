@@ -1,20 +1,125 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, request, jsonify, make_response, stream_with_context
 from flask_cors import CORS
-import pymysql
-from pymysql.cursors import DictCursor
-from datetime import timedelta, time as dtime, datetime
+from pymysql.err import IntegrityError
+import base64
+import hashlib
+import json
+import os
+from datetime import date, datetime, timedelta
+from app_logging import configure_logging, get_logger
+from availability import AvailabilityIndex, parse_range
+from booking_index import BookingIndex, date_error, is_active, slot_alignment_error
+import bulk_updates
+from cache import TTLCache, VersionedCache
+from db_pool import get_db_connection, pool as db_pool
+from events import EVENT_TOKEN_TTL, TooManySubscribers, broker as event_broker
+import exports
+from json_provider import RowJSONProvider
+from migrations import run_migrations
+from passwords import HasherBusy, hasher as password_hasher
+from patient_search import PatientIndex, search_sql as search_patients_sql
+import rollups
+from reminders import ReminderDispatcher
+from scheduler import ScheduleOptimizer
+from schema import SchemaStatus
+from tokens import EPHEMERAL_SECRET, TokenError, tokens as session_tokens
+import user_import
+
+configure_logging()
+logger = get_logger('api')
+if EPHEMERAL_SECRET:
+    logger.warning('SESSION_SECRET is not set; session tokens are signed with a per-process random key')
+
+# Checked once here instead of per request; reported by /api/health
+schema_status = SchemaStatus(get_db_connection)
+schema_check = schema_status.verify()
+if not schema_check['ok']:
+    logger.warning('database schema check failed', extra={'fields': schema_check})
 
 app = Flask(__name__)
+app.json = RowJSONProvider(app)
 CORS(app, resources={r"/*": {"origins": ["http://127.0.0.1:8080", "http://192.168.137.160:8080", "*"]}})
 
-def get_db_connection():
-    return pymysql.connect(
-        host='localhost',
-        user='root',
-        password='V1S21_pass_mysql',
-        db='dental_care',
-        cursorclass=DictCursor
-    )
+# The doctor dashboard polls its stats; keep each doctor's result for a few seconds
+doctor_stats_cache = TTLCache(ttl=float(os.environ.get('DOCTOR_STATS_TTL', '5')))
+# Encoded doctor lists keyed by 'approved'/'all'; invalidated on approve, reject and register.
+# The TTL bounds staleness when another worker process made the change.
+doctor_directory_cache = VersionedCache(ttl=float(os.environ.get('DOCTOR_DIRECTORY_TTL', '60')))
+# Unread notification counts per patient, for the notification bell
+unread_count_cache = TTLCache(ttl=float(os.environ.get('UNREAD_COUNT_TTL', '30')))
+# Booked doctor/chair intervals per day, for O(log n) double-booking checks
+bookings = BookingIndex()
+# Per-day slot bitmaps for the availability endpoints, updated alongside `bookings`
+availability = AvailabilityIndex()
+# Name/contact prefix index for the patient typeahead
+patient_index = PatientIndex(get_db_connection)
+
+ER_DUP_ENTRY = 1062
+
+def is_duplicate_key(error):
+    """True when MySQL rejected a write on a unique key (e.g. a double-booked slot)"""
+    return isinstance(error, IntegrityError) and bool(error.args) and error.args[0] == ER_DUP_ENTRY
+
+def session_claims():
+    """Claims of the request's bearer token, or None when it carries none
+
+    Raises TokenError when a token is present but invalid, expired or revoked.
+    """
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    return session_tokens.verify(header[len('Bearer '):].strip())
+
+def require_session(role, resource_id):
+    """None when the bearer session belongs to that doctor/patient (or an admin), else an error response
+
+    The self-service endpoints take the caller's identity from the signed
+    token; the id in the URL only has to agree with it.
+    """
+    try:
+        claims = session_claims()
+    except TokenError as e:
+        return jsonify({'error': str(e)}), 401
+    if claims is None:
+        return jsonify({'error': 'Bearer token required'}), 401
+    if claims['role'] == 'admin':
+        return None
+    if claims['role'] != role or claims[f'{role}_id'] != resource_id:
+        return jsonify({'error': f'Not your {role} record'}), 403
+    return None
+
+def publish_status_change(before, after):
+    """Push an appointment status change to the patient's event stream"""
+    if before.get('patient_id') is not None and before['status'] != after['status']:
+        event_broker.publish(before['patient_id'], 'appointment_status', {
+            'appointment_id': before['id'],
+            'status': after['status'],
+            'previous_status': before['status'],
+            'date': str(after['date']),
+            'time': str(after['time']),
+        })
+
+def reminders_created(reminders):
+    """Refresh the bell and push each reminder created by this process's dispatcher"""
+    for reminder in reminders:
+        unread_count_cache.invalidate(reminder['patient_id'])
+        event_broker.publish(reminder['patient_id'], 'appointment_reminder', {
+            'appointment_id': reminder['appointment_id'],
+            'kind': reminder['kind'],
+            'message': reminder['message'],
+            'date': reminder['date'],
+            'time': reminder['time'],
+        })
+
+# Background reminder generation; enable it in one process per deployment, though
+# reminder_log keeps a second dispatcher from sending anything twice
+reminder_dispatcher = None
+if os.environ.get('REMINDERS_ENABLED', '0') == '1':
+    reminder_dispatcher = ReminderDispatcher(on_created=reminders_created)
+    reminder_dispatcher.start()
+
+def conflict_response(conflict):
+    return jsonify({'error': 'Time slot already booked', 'conflict': conflict.to_dict()}), 409
 
 @app.route('/api/patients', methods=['GET', 'POST'])
 def patients():
@@ -22,7 +127,7 @@ def patients():
     try:
         with conn.cursor() as cursor:
             if request.method == 'GET':
-                cursor.execute('SELECT * FROM patients')
+                cursor.execute(f'SELECT {PATIENT_COLUMNS} FROM patients p')
                 return jsonify(cursor.fetchall())
             elif request.method == 'POST':
                 data = request.get_json()
@@ -33,6 +138,7 @@ def patients():
                     cursor.execute('INSERT INTO patients (name, age, gender, contact) VALUES (%s, %s, %s, %s)',
                                    (data.get('name'), data.get('age'), data.get('gender'), data.get('contact')))
                     conn.commit()
+                    patient_index.add(cursor.lastrowid, data['name'], data['contact'])
                     return jsonify({'status': 'success'}), 201
                 except Exception as e:
                     conn.rollback()
@@ -44,112 +150,274 @@ def patients():
 
 @app.route('/api/doctors', methods=['GET'])
 def get_doctors():
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cursor:
-            # Check if admin access is requested
-            admin_access = request.args.get('admin', 'false').lower() == 'true'
-            
-            if admin_access:
-                # Return all doctors for admin access
-                cursor.execute('SELECT * FROM doctors')
-            else:
-                # Only return approved doctors for appointment booking
-                cursor.execute('SELECT * FROM doctors WHERE status = %s', ('approved',))
-            return jsonify(cursor.fetchall())
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        conn.close()
+    # Check if admin access is requested
+    admin_access = request.args.get('admin', 'false').lower() == 'true'
+    key = 'all' if admin_access else 'approved'
+    
+    entry = doctor_directory_cache.get(key)
+    if entry is None:
+        version = doctor_directory_cache.version
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                if admin_access:
+                    # Return all doctors for admin access
+                    cursor.execute(f'SELECT {DOCTOR_COLUMNS} FROM doctors d')
+                else:
+                    # Only return approved doctors for appointment booking
+                    cursor.execute(f'SELECT {DOCTOR_COLUMNS} FROM doctors d WHERE d.status = %s', ('approved',))
+                body = app.json.dumps(cursor.fetchall())
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+        finally:
+            conn.close()
+        entry = (body, hashlib.sha1(body.encode()).hexdigest())
+        doctor_directory_cache.set_if_current(key, entry, version)
+    
+    body, etag = entry
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Answers If-None-Match with a 304 and no body
+    return response.make_conditional(request)
+
+def check_password(user, password):
+    """True when the password matches the user row (None for unknown users)
+
+    Legacy plaintext passwords are replaced by a hash on their first successful check.
+    """
+    matches, needs_rehash = password_hasher.verify(password, user['password'] if user else None)
+    if matches and needs_rehash:
+        try:
+            hashed = password_hasher.hash(password)
+        except HasherBusy:
+            # Try again on the next login rather than failing this one
+            return True
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                # Only replace the value that was just verified
+                cursor.execute('UPDATE users SET password = %s WHERE id = %s AND password = %s',
+                               (hashed, user['id'], user['password']))
+            conn.commit()
+            logger.info('password rehashed', extra={'fields': {'user_id': user['id']}})
+        except Exception:
+            conn.rollback()
+            logger.exception('password rehash failed')
+        finally:
+            conn.close()
+    return matches
 
 @app.route('/api/login', methods=['POST'])
 def login():
     data = request.get_json()
     if not data or 'username' not in data or 'password' not in data:
         return jsonify({'error': 'Missing username or password'}), 400
+    if not isinstance(data['password'], str):
+        return jsonify({'error': 'password must be a string'}), 400
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            cursor.execute('SELECT * FROM users WHERE username=%s AND password=%s', (data['username'], data['password']))
+            # One lookup on the unique username index, with the doctor's approval status
+            cursor.execute('''
+                SELECT u.*, d.status AS doctor_status
+                FROM users u
+                LEFT JOIN doctors d ON d.id = u.doctor_id
+                WHERE u.username = %s
+            ''', (data['username'],))
             user = cursor.fetchone()
-            if not user:
-                return jsonify({'error': 'Invalid credentials'}), 401
-            
-            # Check if user is a doctor and verify approval status
-            if user['role'] == 'doctor':
-                cursor.execute('SELECT status FROM doctors WHERE id=%s', (user['doctor_id'],))
-                doctor = cursor.fetchone()
-                if not doctor:
-                    return jsonify({'error': 'Doctor profile not found'}), 404
-                
-                if doctor['status'] == 'pending_approval':
-                    return jsonify({'error': 'Your account is pending admin approval. Please wait for approval.'}), 403
-                elif doctor['status'] == 'rejected':
-                    return jsonify({'error': 'Your account has been rejected. Please contact administrator.'}), 403
-            
-            user.pop('password', None)
-            return jsonify(user)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
+    
+    # scrypt runs on the hasher pool, without holding a database connection
+    try:
+        if not check_password(user, data['password']):
+            return jsonify({'error': 'Invalid credentials'}), 401
+    except HasherBusy as e:
+        return jsonify({'error': str(e)}), 503
+    
+    # Check if user is a doctor and verify approval status
+    doctor_status = user.pop('doctor_status', None)
+    if user['role'] == 'doctor':
+        if doctor_status is None:
+            return jsonify({'error': 'Doctor profile not found'}), 404
+        
+        if doctor_status == 'pending_approval':
+            return jsonify({'error': 'Your account is pending admin approval. Please wait for approval.'}), 403
+        elif doctor_status == 'rejected':
+            return jsonify({'error': 'Your account has been rejected. Please contact administrator.'}), 403
+    
+    user.pop('password', None)
+    token, claims = session_tokens.issue(user)
+    user['token'] = token
+    user['token_expires_at'] = claims['exp']
+    return jsonify(user)
+
+@app.route('/api/logout', methods=['POST'])
+def logout():
+    """Revoke the bearer token, or every session of its user with {'all': true}"""
+    try:
+        claims = session_claims()
+    except TokenError as e:
+        return jsonify({'error': str(e)}), 401
+    if claims is None:
+        return jsonify({'error': 'Bearer token required'}), 401
+    data = request.get_json(silent=True) or {}
+    if data.get('all'):
+        session_tokens.revoke_user(claims['sub'])
+    else:
+        session_tokens.revoke(claims)
+    return jsonify({'status': 'success'})
+
+APPOINTMENTS_DEFAULT_LIMIT = 50
+APPOINTMENTS_MAX_LIMIT = 500
+# Appointment columns returned by the list endpoints; active_slot is internal to the unique keys
+APPOINTMENT_COLUMNS = 'a.id, a.patient_id, a.doctor_id, a.date, a.time, a.status, a.chair_id, a.priority, a.type'
+# Doctor and patient columns returned by the API; import_key is internal to the bulk importer
+DOCTOR_COLUMNS = ('d.id, d.name, d.specialty, d.contact, d.email, d.license_number, d.experience, d.education, '
+                  'd.status, d.rejection_reason, d.created_at')
+PATIENT_COLUMNS = 'p.id, p.name, p.age, p.gender, p.contact'
+
+def encode_cursor(values):
+    """Opaque keyset cursor holding the sort key of the last row of a page"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor_value):
+    return json.loads(base64.urlsafe_b64decode(cursor_value.encode()))
+
+def encode_appointment_cursor(row):
+    """Opaque keyset cursor for the (date, time, id) ordering"""
+    # str(timedelta) drops the leading zero ('9:00:00'), which sorts after '10:30:00' as text
+    return encode_cursor([str(row['date']), str(row['time']).zfill(8), row['id']])
+
+def decode_appointment_cursor(cursor_value):
+    date_value, time_value, appointment_id = decode_cursor(cursor_value)
+    return date_value, time_value, int(appointment_id)
 
 @app.route('/api/appointments', methods=['GET', 'POST'])
 def appointments():
-    print('--- /api/appointments called ---')
-    print('Method:', request.method)
-    print('Headers:', dict(request.headers))
-    if request.method == 'POST':
-        print('Body:', request.get_data(as_text=True))
+    logger.debug('appointments request', extra={'fields': {'method': request.method, 'args': request.args.to_dict()}})
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
             if request.method == 'GET':
-                patient_id = request.args.get('patient_id')
-                if patient_id:
-                    cursor.execute('''
-                        SELECT a.*, d.name as doctor_name 
-                        FROM appointments a 
-                        LEFT JOIN doctors d ON a.doctor_id = d.id 
-                        WHERE a.patient_id=%s
-                    ''', (patient_id,))
-                else:
-                    cursor.execute('''
-                        SELECT a.*, d.name as doctor_name 
-                        FROM appointments a 
-                        LEFT JOIN doctors d ON a.doctor_id = d.id
-                    ''')
+                # Server-side filters
+                conditions = []
+                params = []
+                for arg, column in (('patient_id', 'a.patient_id'), ('doctor_id', 'a.doctor_id'), ('status', 'a.status')):
+                    value = request.args.get(arg)
+                    if value:
+                        conditions.append(f'{column} = %s')
+                        params.append(value)
+                if request.args.get('date_from'):
+                    conditions.append('a.date >= %s')
+                    params.append(request.args['date_from'])
+                if request.args.get('date_to'):
+                    conditions.append('a.date <= %s')
+                    params.append(request.args['date_to'])
+
+                # Keyset pagination is opt-in so existing callers still get a plain list
+                paginate = 'limit' in request.args or 'cursor' in request.args
+                if paginate:
+                    try:
+                        limit = int(request.args.get('limit', APPOINTMENTS_DEFAULT_LIMIT))
+                    except ValueError:
+                        return jsonify({'error': 'limit must be an integer'}), 400
+                    limit = max(1, min(limit, APPOINTMENTS_MAX_LIMIT))
+                    if request.args.get('cursor'):
+                        try:
+                            after_date, after_time, after_id = decode_appointment_cursor(request.args['cursor'])
+                        except Exception:
+                            return jsonify({'error': 'Invalid cursor'}), 400
+                        # Leading range on date keeps the predicate index-friendly
+                        conditions.append('a.date >= %s AND (a.date > %s OR a.time > %s OR (a.time = %s AND a.id > %s))')
+                        params.extend([after_date, after_date, after_time, after_time, after_id])
+
+                query = f'''
+                    SELECT {APPOINTMENT_COLUMNS}, d.name as doctor_name 
+                    FROM appointments a 
+                    LEFT JOIN doctors d ON a.doctor_id = d.id
+                '''
+                if conditions:
+                    query += ' WHERE ' + ' AND '.join(conditions)
+                if paginate:
+                    query += ' ORDER BY a.date, a.time, a.id LIMIT %s'
+                    params.append(limit + 1)
+                cursor.execute(query, params)
                 results = cursor.fetchall()
-                print('Fetched appointments:', results)
-                for row in results:
-                    for k, v in row.items():
-                        print(f'Key: {k}, Value: {v}, Type: {type(v)}')
-                        if isinstance(v, (timedelta, dtime)):
-                            row[k] = str(v)
-                print('Serialized appointments:', results)
+                next_cursor = None
+                if paginate and len(results) > limit:
+                    results = results[:limit]
+                    next_cursor = encode_appointment_cursor(results[-1])
+                logger.debug('appointments fetched', extra={'fields': {'count': len(results)}})
+                if paginate:
+                    return jsonify({'appointments': results, 'next_cursor': next_cursor})
                 return jsonify(results)
             elif request.method == 'POST':
                 data = request.get_json()
-                print('Received appointment POST data:', data)
                 required = ['patient_id', 'doctor_id', 'date', 'time', 'status']
                 if not data or not all(k in data and data[k] is not None for k in required):
-                    print('Missing required fields:', data)
+                    logger.info('appointment rejected: missing required fields')
                     return jsonify({'error': 'Missing required fields'}), 400
+                invalid = date_error(data['date']) or slot_alignment_error(data['time'])
+                if invalid:
+                    return jsonify({'error': invalid}), 400
                 try:
+                    conflict = bookings.find_conflict(cursor, data)
+                    if conflict:
+                        logger.info('appointment rejected: slot taken', extra={'fields': conflict.to_dict()})
+                        return conflict_response(conflict)
                     cursor.execute('INSERT INTO appointments (patient_id, doctor_id, date, time, status) VALUES (%s, %s, %s, %s, %s)',
                                    (data.get('patient_id'), data.get('doctor_id'), data.get('date'), data.get('time'), data.get('status')))
+                    appointment_id = cursor.lastrowid
+                    rollups.record_created(cursor, data)
                     conn.commit()
-                    print('Appointment inserted successfully.')
+                    bookings.add(appointment_id, data)
+                    availability.add(appointment_id, data)
+                    doctor_stats_cache.invalidate(int(data['doctor_id']))
+                    logger.info('appointment created', extra={'fields': {'appointment_id': cursor.lastrowid}})
                     return jsonify({'status': 'success'}), 201
                 except Exception as e:
                     conn.rollback()
-                    print('Error inserting appointment:', str(e))
+                    if is_duplicate_key(e):
+                        # Another worker booked the same slot first
+                        return jsonify({'error': 'Time slot already booked'}), 409
+                    logger.error('appointment insert failed', extra={'fields': {'error': str(e)}})
                     return jsonify({'error': str(e)}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
 
+@app.route('/api/appointments/conflicts', methods=['GET'])
+def check_appointment_conflicts():
+    """Report whether a doctor/chair slot is free without booking it"""
+    if not request.args.get('date') or not request.args.get('time'):
+        return jsonify({'error': 'date and time are required'}), 400
+    if not request.args.get('doctor_id') and not request.args.get('chair_id'):
+        return jsonify({'error': 'doctor_id or chair_id is required'}), 400
+    invalid = date_error(request.args['date']) or slot_alignment_error(request.args['time'])
+    if invalid:
+        return jsonify({'error': invalid}), 400
+    candidate = {
+        'doctor_id': request.args.get('doctor_id'),
+        'chair_id': request.args.get('chair_id'),
+        'date': request.args['date'],
+        'time': request.args['time'],
+        'status': 'scheduled'
+    }
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            conflict = bookings.find_conflict(cursor, candidate)
+            return jsonify({'available': conflict is None, 'conflict': conflict.to_dict() if conflict else None})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
 @app.route('/api/payments', methods=['GET', 'POST'])
 def payments():
     conn = get_db_connection()
@@ -180,14 +448,71 @@ def payments():
     finally:
         conn.close()
 
+NOTIFICATIONS_DEFAULT_LIMIT = 20
+NOTIFICATIONS_MAX_LIMIT = 200
+
+def list_notifications(cursor, table, read_column, date_column):
+    """GET handler body shared by the notification tables
+
+    Filters on ?patient_id= and ?unread_only=true. Passing limit or cursor
+    switches to keyset pages, newest first, returned as
+    {'notifications': [...], 'next_cursor': ...}.
+    """
+    conditions = []
+    params = []
+    if request.args.get('patient_id'):
+        conditions.append('patient_id = %s')
+        params.append(request.args['patient_id'])
+    if request.args.get('unread_only', 'false').lower() == 'true':
+        conditions.append(f'`{read_column}` = 0')
+    
+    paginate = 'limit' in request.args or 'cursor' in request.args
+    if paginate:
+        try:
+            limit = int(request.args.get('limit', NOTIFICATIONS_DEFAULT_LIMIT))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, NOTIFICATIONS_MAX_LIMIT))
+        if request.args.get('cursor'):
+            try:
+                before_date, before_id = decode_cursor(request.args['cursor'])
+            except Exception:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            # Rows without a date sort last (DESC puts NULLs last in MySQL and SQLite)
+            if before_date is None:
+                conditions.append(f'{date_column} IS NULL AND id < %s')
+                params.append(int(before_id))
+            else:
+                conditions.append(f'({date_column} IS NULL OR {date_column} < %s '
+                                  f'OR ({date_column} = %s AND id < %s))')
+                params.extend([before_date, before_date, int(before_id)])
+    
+    query = f'SELECT * FROM {table}'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    if paginate:
+        query += f' ORDER BY {date_column} DESC, id DESC LIMIT %s'
+        params.append(limit + 1)
+    elif table == 'smart_notifications':
+        query += f' ORDER BY {date_column} DESC'
+    cursor.execute(query, params)
+    results = cursor.fetchall()
+    if not paginate:
+        return jsonify(results)
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last_date = results[-1][date_column]
+        next_cursor = encode_cursor([None if last_date is None else str(last_date), results[-1]['id']])
+    return jsonify({'notifications': results, 'next_cursor': next_cursor})
+
 @app.route('/api/notifications', methods=['GET', 'POST'])
 def notifications():
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
             if request.method == 'GET':
-                cursor.execute('SELECT * FROM notifications')
-                return jsonify(cursor.fetchall())
+                return list_notifications(cursor, 'notifications', 'is_read', 'date')
             elif request.method == 'POST':
                 data = request.get_json()
                 required = ['patient_id', 'message', 'date', 'is_read']
@@ -197,6 +522,11 @@ def notifications():
                     cursor.execute('INSERT INTO notifications (patient_id, message, date, is_read) VALUES (%s, %s, %s, %s)',
                                    (data.get('patient_id'), data.get('message'), data.get('date'), data.get('is_read')))
                     conn.commit()
+                    unread_count_cache.invalidate(int(data['patient_id']))
+                    event_broker.publish(data['patient_id'], 'notification', {
+                        'id': cursor.lastrowid, 'patient_id': data['patient_id'], 'message': data['message'],
+                        'date': data['date'], 'is_read': data['is_read'],
+                    })
                     return jsonify({'status': 'success'}), 201
                 except Exception as e:
                     conn.rollback()
@@ -212,47 +542,56 @@ def test():
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'ok'})
+    schema = schema_status.get()
+    return jsonify({'status': 'ok' if schema['ok'] else 'degraded', 'schema': schema, 'db_pool': db_pool.stats(), 'password_hasher': password_hasher.stats(),
+                    'sessions': session_tokens.stats(), 'events': event_broker.stats(),
+                    'reminders': reminder_dispatcher.stats() if reminder_dispatcher else None,
+                    'patient_index': patient_index.stats()})
 
 @app.route('/api/register', methods=['POST'])
 def register():
     data = request.get_json()
     required = ['username', 'password', 'role', 'name', 'contact']
     if not data or not all(k in data and data[k] for k in required):
-        print('❌ Missing required fields:', data)
+        logger.info('registration rejected: missing required fields')
         return jsonify({'error': 'Missing required fields'}), 400
+    if not isinstance(data['password'], str):
+        return jsonify({'error': 'password must be a string'}), 400
     
-    print(f"[REGISTER] Attempt: {data.get('username')} as {data.get('role')} at {datetime.now()}")
+    logger.info('registration attempt', extra={'fields': {'username': data.get('username'), 'role': data.get('role')}})
+    
+    try:
+        password_hash = password_hasher.hash(data['password'])
+    except HasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
             cursor.execute('SELECT id FROM users WHERE username=%s', (data['username'],))
             if cursor.fetchone():
-                print(f"❌ Username already exists: {data['username']}")
+                logger.info('registration rejected: username exists', extra={'fields': {'username': data['username']}})
                 return jsonify({'error': 'Username already exists'}), 400
             
             if data['role'] == 'doctor':
                 if 'specialty' not in data:
-                    print('❌ Missing specialty for doctor:', data)
+                    logger.info('registration rejected: missing specialty', extra={'fields': {'username': data['username']}})
                     return jsonify({'error': 'Missing specialty for doctor'}), 400
                 email = data.get('email', '')
                 license_number = data.get('licenseNumber', '')
                 experience = data.get('experience', 0)
                 education = data.get('education', '')
                 status = data.get('status', 'pending_approval')
-                print(f"[REGISTER] Inserting doctor: {data['name']} with status {status}")
                 cursor.execute('''
                     INSERT INTO doctors (name, specialty, contact, email, license_number, experience, education, status, rejection_reason, created_at) 
                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
                 ''', (data['name'], data['specialty'], data['contact'], email, license_number, experience, education, status, None))
                 doctor_id = cursor.lastrowid
-                print(f"[REGISTER] Doctor inserted with ID: {doctor_id}")
                 cursor.execute('INSERT INTO users (username, password, role, doctor_id) VALUES (%s, %s, %s, %s)',
-                               (data['username'], data['password'], 'doctor', doctor_id))
-                print(f"[REGISTER] User inserted for doctor: {data['username']}")
+                               (data['username'], password_hash, 'doctor', doctor_id))
                 conn.commit()
-                print(f"[REGISTER] Doctor registration successful: {data['username']} (ID: {doctor_id})")
+                doctor_directory_cache.invalidate_all()
+                logger.info('doctor registered', extra={'fields': {'username': data['username'], 'doctor_id': doctor_id, 'status': status}})
                 return jsonify({
                     'status': 'success', 
                     'message': 'Registration submitted successfully. Your account is pending admin approval.',
@@ -260,41 +599,84 @@ def register():
                 }), 201
             elif data['role'] == 'patient':
                 if 'age' not in data or 'gender' not in data:
-                    print('❌ Missing age or gender for patient:', data)
+                    logger.info('registration rejected: missing age or gender', extra={'fields': {'username': data['username']}})
                     return jsonify({'error': 'Missing age or gender for patient'}), 400
                 cursor.execute('INSERT INTO patients (name, age, gender, contact) VALUES (%s, %s, %s, %s)',
                                (data['name'], data['age'], data['gender'], data['contact']))
                 patient_id = cursor.lastrowid
                 cursor.execute('INSERT INTO users (username, password, role, patient_id) VALUES (%s, %s, %s, %s)',
-                               (data['username'], data['password'], 'patient', patient_id))
+                               (data['username'], password_hash, 'patient', patient_id))
                 conn.commit()
-                print(f"[REGISTER] Patient registration successful: {data['username']} (ID: {patient_id})")
+                patient_index.add(patient_id, data['name'], data['contact'])
+                logger.info('patient registered', extra={'fields': {'username': data['username'], 'patient_id': patient_id}})
                 return jsonify({'status': 'success'}), 201
             else:
-                print('❌ Invalid role:', data)
+                logger.info('registration rejected: invalid role', extra={'fields': {'role': data['role']}})
                 return jsonify({'error': 'Invalid role'}), 400
     except Exception as e:
         conn.rollback()
-        print(f"❌ Registration error: {str(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception('registration failed')
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
 
+BULK_REGISTER_MAX = int(os.environ.get('BULK_REGISTER_MAX', '50000'))
+
+@app.route('/api/register/bulk', methods=['POST'])
+def register_bulk():
+    """Register many doctors/patients: {'records': [...], 'role': optional default}
+
+    Each record takes the /api/register fields. Results are reported per
+    record; valid records are created even when others fail.
+    """
+    data = request.get_json(silent=True) or {}
+    records = data.get('records')
+    if not isinstance(records, list) or not records:
+        return jsonify({'error': 'records must be a non-empty list'}), 400
+    if len(records) > BULK_REGISTER_MAX:
+        return jsonify({'error': f'At most {BULK_REGISTER_MAX} records per request'}), 400
+
+    try:
+        # Passwords are hashed before the importer takes a pooled connection
+        summary = user_import.register_records(records, default_role=data.get('role'),
+                                               dry_run=bool(data.get('dry_run')))
+        if summary['doctors_created']:
+            doctor_directory_cache.invalidate_all()
+        patient_index.add_many((result['patient_id'], records[result['index']]['name'], records[result['index']]['contact'])
+                               for result in summary['results'] if 'patient_id' in result)
+        logger.info('bulk registration', extra={'fields': {'records': len(records), 'created': summary['created'],
+                                                           'failed': summary['failed']}})
+        if data.get('dry_run'):
+            status_code = 400 if summary['failed'] else 200
+        else:
+            status_code = 201 if summary['created'] else 400
+        return jsonify(dict(summary, status='error' if status_code == 400 else 'success')), status_code
+    except HasherBusy as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.exception('bulk registration failed')
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/init-db', methods=['POST'])
 def init_db():
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
             # Drop existing tables in reverse order to handle foreign keys
+            cursor.execute('DROP TABLE IF EXISTS schema_migrations')
+            cursor.execute('DROP TABLE IF EXISTS reminder_log')
+            cursor.execute('DROP TABLE IF EXISTS doctor_patient_summary')
+            cursor.execute('DROP TABLE IF EXISTS chair_daily_stats')
+            cursor.execute('DROP TABLE IF EXISTS doctor_daily_stats')
+            cursor.execute('DROP TABLE IF EXISTS smart_notifications')
+            cursor.execute('DROP TABLE IF EXISTS treatment_notes')
             cursor.execute('DROP TABLE IF EXISTS users')
             cursor.execute('DROP TABLE IF EXISTS notifications')
             cursor.execute('DROP TABLE IF EXISTS payments')
             cursor.execute('DROP TABLE IF EXISTS appointments')
+            cursor.execute('DROP TABLE IF EXISTS chairs')
             cursor.execute('DROP TABLE IF EXISTS doctors')
             cursor.execute('DROP TABLE IF EXISTS patients')
-            cursor.execute('DROP TABLE IF EXISTS treatment_notes')
             
             # Create tables with updated schema
             cursor.execute('''
@@ -378,6 +760,8 @@ def init_db():
                     FOREIGN KEY (patient_id) REFERENCES patients(id)
                 )
             ''')
+            # Chairs, smart notifications, scheduling columns and indexes
+            run_migrations(conn)
             # Seed doctors with updated schema
             cursor.execute("INSERT IGNORE INTO doctors (id, name, specialty, contact, email, license_number, experience, education, status) VALUES (1, 'Dr. Sarah Smith', 'General Dentistry', '+1 234-567-8901', 'drsmith@dentalcare.com', 'MD123456', 8, 'DDS from Harvard Dental School', 'approved')")
             cursor.execute("INSERT IGNORE INTO doctors (id, name, specialty, contact, email, license_number, experience, education, status) VALUES (2, 'Dr. Mike Johnson', 'Orthodontics', '+1 234-567-8902', 'drjohnson@dentalcare.com', 'MD789012', 12, 'DDS from Stanford Dental School, Orthodontics Residency', 'approved')")
@@ -397,15 +781,20 @@ def init_db():
             cursor.execute("INSERT IGNORE INTO appointments (id, patient_id, doctor_id, date, time, status) VALUES (1, 1, 1, '2024-07-01', '09:00:00', 'scheduled')")
             cursor.execute("INSERT IGNORE INTO appointments (id, patient_id, doctor_id, date, time, status) VALUES (2, 2, 2, '2024-07-01', '10:00:00', 'completed')")
             cursor.execute("INSERT IGNORE INTO appointments (id, patient_id, doctor_id, date, time, status) VALUES (3, 3, 3, '2024-07-01', '11:00:00', 'pending')")
+            rollups.rebuild(cursor)
             # Seed payments
             cursor.execute("INSERT IGNORE INTO payments (id, patient_id, amount, date, status) VALUES (1, 1, 1500, '2024-07-01', 'paid')")
             cursor.execute("INSERT IGNORE INTO payments (id, patient_id, amount, date, status) VALUES (2, 2, 2000, '2024-07-01', 'paid')")
             cursor.execute("INSERT IGNORE INTO payments (id, patient_id, amount, date, status) VALUES (3, 3, 800, '2024-07-01', 'pending')")
+            # Seed chairs
+            cursor.execute("INSERT IGNORE INTO chairs (id, name, status) VALUES (1, 'Chair 1', 'available'), (2, 'Chair 2', 'available'), (3, 'Chair 3', 'available')")
             # Seed notifications
             cursor.execute("INSERT IGNORE INTO notifications (id, patient_id, message, date, is_read) VALUES (1, 1, 'Your appointment is scheduled for 9:00 AM.', NOW(), 0)")
             cursor.execute("INSERT IGNORE INTO notifications (id, patient_id, message, date, is_read) VALUES (2, 2, 'Payment received for your last visit.', NOW(), 1)")
             cursor.execute("INSERT IGNORE INTO notifications (id, patient_id, message, date, is_read) VALUES (3, 3, 'Your next appointment is pending.', NOW(), 0)")
             conn.commit()
+        schema_status.verify()
+        patient_index.clear()
         return jsonify({'status': 'initialized'}), 201
     except Exception as e:
         conn.rollback()
@@ -413,12 +802,47 @@ def init_db():
     finally:
         conn.close()
 
+PATIENT_SEARCH_DEFAULT_LIMIT = 10
+PATIENT_SEARCH_MAX_LIMIT = 50
+
+@app.route('/api/patients/search', methods=['GET'])
+def search_patients():
+    """Typeahead over patient name and contact: ?q=&limit=, best matches first"""
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    try:
+        limit = int(request.args.get('limit', PATIENT_SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, PATIENT_SEARCH_MAX_LIMIT))
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            ids = patient_index.search(cursor, q, limit)
+            if ids is None:
+                return jsonify({'patients': search_patients_sql(cursor, q, limit)})
+            if not ids:
+                return jsonify({'patients': []})
+            placeholders = ', '.join(['%s'] * len(ids))
+            cursor.execute(f'SELECT id, name, age, gender, contact FROM patients WHERE id IN ({placeholders})', ids)
+            rows = {row['id']: row for row in cursor.fetchall()}
+            return jsonify({'patients': [rows[i] for i in ids if i in rows]})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
 @app.route('/api/patients/<int:patient_id>', methods=['GET'])
 def get_patient(patient_id):
+    denied = require_session('patient', patient_id)
+    if denied:
+        return denied
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            cursor.execute('SELECT * FROM patients WHERE id=%s', (patient_id,))
+            cursor.execute(f'SELECT {PATIENT_COLUMNS} FROM patients p WHERE p.id=%s', (patient_id,))
             patient = cursor.fetchone()
             if not patient:
                 return jsonify({'error': 'Patient not found'}), 404
@@ -440,25 +864,70 @@ def get_chairs():
     finally:
         conn.close()
 
+SCHEDULE_FIELDS = ('chair_id', 'time', 'status')
+
 @app.route('/api/appointments/optimize', methods=['POST'])
 def optimize_appointments():
-    data = request.get_json()
-    if not data or 'appointments' not in data:
-        return jsonify({'error': 'Missing appointments data'}), 400
+    """Compute and save an optimized chair/time schedule for one day
+
+    Body (all optional): date (default today), doctor_hours
+    ({doctor_id: [start, end]}), dry_run. Clients may still post their own
+    assignments as 'appointments' to have them applied as-is.
+    """
+    data = request.get_json(silent=True) or {}
     
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            for appointment in data['appointments']:
+            result = None
+            if 'appointments' in data:
+                assignments = data['appointments']
+            else:
+                day = data.get('date') or date.today().isoformat()
                 cursor.execute('''
-                    UPDATE appointments 
-                    SET chair_id=%s, time=%s, status=%s 
-                    WHERE id=%s
-                ''', (appointment['chair_id'], appointment['time'], appointment['status'], appointment['id']))
+                    SELECT id, doctor_id, chair_id, date, time, status, priority, type
+                    FROM appointments
+                    WHERE date = %s
+                ''', (day,))
+                day_appointments = cursor.fetchall()
+                cursor.execute("SELECT id FROM chairs WHERE status = 'available'")
+                chair_ids = [row['id'] for row in cursor.fetchall()]
+                if not chair_ids:
+                    return jsonify({'error': 'No available chairs'}), 400
+                optimizer = ScheduleOptimizer(chair_ids, doctor_hours=data.get('doctor_hours'))
+                result = optimizer.optimize(day_appointments)
+                result['date'] = day
+                assignments = result['assignments']
+                if data.get('dry_run'):
+                    return jsonify(dict(result, status='success', dry_run=True))
+            
+            if not isinstance(assignments, list):
+                return jsonify({'error': 'appointments must be a list'}), 400
+            current = bulk_updates.fetch_current(cursor, [a.get('id') for a in assignments if isinstance(a, dict)])
+            valid, errors = bulk_updates.validate_updates(assignments, SCHEDULE_FIELDS, current)
+            if errors:
+                return jsonify({'error': 'Invalid assignments', 'errors': errors}), 400
+            changes = [(current[a['id']], dict(current[a['id']], **{f: a[f] for f in SCHEDULE_FIELDS})) for a in valid]
+            if valid:
+                # Free the old slots first: MySQL checks unique keys row by row, so
+                # swapping two appointments' times would otherwise collide mid-batch
+                bulk_updates.clear_times(cursor, [a['id'] for a in valid])
+                bulk_updates.bulk_update_appointments(cursor, valid, SCHEDULE_FIELDS)
+                rollups.record_changes(cursor, changes)
             conn.commit()
-            return jsonify({'status': 'success', 'message': 'Schedule optimized successfully'})
+            for before, after in changes:
+                bookings.apply_change(before['id'], before, after)
+                availability.apply_change(before['id'], before, after)
+            # Statuses may have changed for any doctor in the batch
+            doctor_stats_cache.clear()
+            response = {'status': 'success', 'message': 'Schedule optimized successfully'}
+            if result is not None:
+                response.update(result)
+            return jsonify(response)
     except Exception as e:
         conn.rollback()
+        if is_duplicate_key(e):
+            return jsonify({'error': 'Optimized schedule double-books a doctor or chair'}), 409
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
@@ -469,13 +938,23 @@ def create_emergency_slot():
     required = ['patient_id', 'doctor_id', 'date', 'time', 'priority']
     if not data or not all(k in data and data[k] for k in required):
         return jsonify({'error': 'Missing required fields'}), 400
+    invalid = date_error(data['date']) or slot_alignment_error(data['time'])
+    if invalid:
+        return jsonify({'error': invalid}), 400
     
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            # Find available chair
-            cursor.execute('SELECT id FROM chairs WHERE status="available" LIMIT 1')
-            chair = cursor.fetchone()
+            # Find an available chair that is free at the requested time
+            cursor.execute('SELECT id FROM chairs WHERE status="available" ORDER BY id')
+            chair = None
+            for candidate in cursor.fetchall():
+                conflict = bookings.find_conflict(cursor, dict(data, chair_id=candidate['id'], status='scheduled'))
+                if conflict is None:
+                    chair = candidate
+                    break
+                if conflict.resource == 'doctor':
+                    return conflict_response(conflict)
             if not chair:
                 return jsonify({'error': 'No available chairs'}), 400
             
@@ -485,10 +964,19 @@ def create_emergency_slot():
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             ''', (data['patient_id'], data['doctor_id'], data['date'], data['time'], 
                   'scheduled', data['priority'], chair['id'], 'Emergency'))
+            appointment_id = cursor.lastrowid
+            appointment = {'patient_id': data['patient_id'], 'doctor_id': data['doctor_id'], 'chair_id': chair['id'],
+                           'date': data['date'], 'time': data['time'], 'status': 'scheduled'}
+            rollups.record_created(cursor, appointment)
             conn.commit()
+            bookings.add(appointment_id, appointment)
+            availability.add(appointment_id, appointment)
+            doctor_stats_cache.invalidate(int(data['doctor_id']))
             return jsonify({'status': 'success', 'message': 'Emergency slot created'})
     except Exception as e:
         conn.rollback()
+        if is_duplicate_key(e):
+            return jsonify({'error': 'Time slot already booked'}), 409
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
@@ -499,12 +987,7 @@ def smart_notifications():
     try:
         with conn.cursor() as cursor:
             if request.method == 'GET':
-                patient_id = request.args.get('patient_id')
-                if patient_id:
-                    cursor.execute('SELECT * FROM smart_notifications WHERE patient_id=%s ORDER BY timestamp DESC', (patient_id,))
-                else:
-                    cursor.execute('SELECT * FROM smart_notifications ORDER BY timestamp DESC')
-                return jsonify(cursor.fetchall())
+                return list_notifications(cursor, 'smart_notifications', 'read', 'timestamp')
             elif request.method == 'POST':
                 data = request.get_json()
                 required = ['patient_id', 'type', 'title', 'message']
@@ -512,11 +995,17 @@ def smart_notifications():
                     return jsonify({'error': 'Missing required fields'}), 400
                 
                 cursor.execute('''
-                    INSERT INTO smart_notifications (patient_id, type, title, message, timestamp, read, action_required)
+                    INSERT INTO smart_notifications (patient_id, type, title, message, timestamp, `read`, action_required)
                     VALUES (%s, %s, %s, %s, NOW(), %s, %s)
                 ''', (data['patient_id'], data['type'], data['title'], data['message'], 
                       data.get('read', False), data.get('action_required', False)))
                 conn.commit()
+                unread_count_cache.invalidate(int(data['patient_id']))
+                event_broker.publish(data['patient_id'], 'smart_notification', {
+                    'id': cursor.lastrowid, 'patient_id': data['patient_id'], 'type': data['type'],
+                    'title': data['title'], 'message': data['message'], 'timestamp': datetime.now().isoformat(),
+                    'read': bool(data.get('read', False)), 'action_required': bool(data.get('action_required', False)),
+                })
                 return jsonify({'status': 'success'}), 201
     except Exception as e:
         if request.method == 'POST':
@@ -525,43 +1014,225 @@ def smart_notifications():
     finally:
         conn.close()
 
+@app.route('/api/patients/<int:patient_id>/notifications/unread-count', methods=['GET'])
+def get_unread_notification_count(patient_id):
+    """Unread notifications and smart notifications of a patient"""
+    denied = require_session('patient', patient_id)
+    if denied:
+        return denied
+    counts = unread_count_cache.get(patient_id)
+    if counts is not None:
+        return jsonify(counts)
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            # Both counts are answered from the (patient_id, read) indexes
+            cursor.execute('''
+                SELECT (SELECT COUNT(*) FROM notifications WHERE patient_id = %s AND is_read = 0) AS notifications,
+                       (SELECT COUNT(*) FROM smart_notifications WHERE patient_id = %s AND `read` = 0) AS smart_notifications
+            ''', (patient_id, patient_id))
+            counts = cursor.fetchone()
+            counts['total'] = counts['notifications'] + counts['smart_notifications']
+            unread_count_cache.set(patient_id, counts)
+            return jsonify(counts)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/notifications/read', methods=['PUT'])
+def mark_notifications_read():
+    """Mark a patient's notifications read in one UPDATE per table
+
+    Body: {'ids': [...], 'smart_ids': [...]} or {'all': true}. The patient
+    comes from the bearer session; admins name one with 'patient_id'.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        claims = session_claims()
+    except TokenError as e:
+        return jsonify({'error': str(e)}), 401
+    if claims is None:
+        return jsonify({'error': 'Bearer token required'}), 401
+    patient_id = claims['patient_id'] if claims['role'] == 'patient' else data.get('patient_id')
+    if isinstance(patient_id, bool) or not isinstance(patient_id, int):
+        return jsonify({'error': 'patient_id must be an integer'}), 400
+    denied = require_session('patient', patient_id)
+    if denied:
+        return denied
+    targets = {}
+    for key, table in (('ids', 'notifications'), ('smart_ids', 'smart_notifications')):
+        ids = data.get(key) or []
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return jsonify({'error': f'{key} must be a list of integers'}), 400
+        if ids or data.get('all'):
+            targets[table] = sorted(set(ids))
+    if not targets:
+        return jsonify({'error': 'ids, smart_ids or all is required'}), 400
+    
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            updated = {'notifications': 0, 'smart_notifications': 0}
+            for table, ids in targets.items():
+                read_column = 'is_read' if table == 'notifications' else 'read'
+                query = f'UPDATE {table} SET `{read_column}` = 1 WHERE patient_id = %s AND `{read_column}` = 0'
+                params = [patient_id]
+                if not data.get('all'):
+                    query += f" AND id IN ({', '.join(['%s'] * len(ids))})"
+                    params.extend(ids)
+                cursor.execute(query, params)
+                updated[table] = cursor.rowcount
+            conn.commit()
+            unread_count_cache.invalidate(patient_id)
+            if any(updated.values()):
+                # Lets the patient's other open tabs clear their badges
+                event_broker.publish(patient_id, 'notifications_read', {
+                    'ids': data.get('ids') or [], 'smart_ids': data.get('smart_ids') or [], 'all': bool(data.get('all')),
+                })
+            return jsonify({'status': 'success', 'updated': updated})
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+def can_read_events(claims, patient_id):
+    return claims['role'] == 'admin' or (claims['role'] == 'patient' and claims['patient_id'] == patient_id)
+
+@app.route('/api/patients/<int:patient_id>/events/token', methods=['POST'])
+def patient_events_token(patient_id):
+    """Short-lived token for the event stream; EventSource cannot send an Authorization header"""
+    try:
+        claims = session_claims()
+    except TokenError as e:
+        return jsonify({'error': str(e)}), 401
+    if claims is None:
+        return jsonify({'error': 'Bearer token required'}), 401
+    if not can_read_events(claims, patient_id):
+        return jsonify({'error': 'Not your event stream'}), 403
+    user = {'id': claims['sub'], 'role': claims['role'], 'patient_id': claims['patient_id'],
+            'doctor_id': claims['doctor_id']}
+    token, event_claims = session_tokens.issue(user, ttl=EVENT_TOKEN_TTL, scope='events')
+    return jsonify({'token': token, 'expires_at': event_claims['exp']})
+
+@app.route('/api/patients/<int:patient_id>/events', methods=['GET'])
+def patient_events(patient_id):
+    """Server-Sent Events stream of a patient's notifications and appointment status changes
+
+    Needs ?token= from POST .../events/token (or a bearer session token);
+    once it expires the client fetches a new one before reconnecting.
+    """
+    try:
+        if request.args.get('token'):
+            claims = session_tokens.verify(request.args['token'], scope='events')
+        else:
+            claims = session_claims()
+    except TokenError as e:
+        return jsonify({'error': str(e)}), 401
+    if claims is None:
+        return jsonify({'error': 'Event stream token required'}), 401
+    if not can_read_events(claims, patient_id):
+        return jsonify({'error': 'Not your event stream'}), 403
+    
+    # EventSource sends the header on reconnect; ?last_event_id= lets other clients resume too
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        stream = event_broker.stream(patient_id, last_event_id)
+    except TooManySubscribers as e:
+        return jsonify({'error': str(e)}), 503
+    response = app.response_class(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/export/<dataset>', methods=['GET'])
+def export_dataset(dataset):
+    """Stream appointments, payments or treatment_notes as CSV or JSON Lines
+
+    Query args: format (csv|jsonl), gzip, date_from, date_to and the
+    dataset's id/status filters.
+    """
+    if dataset not in exports.EXPORTS:
+        return jsonify({'error': f"Unknown export, expected one of {', '.join(exports.EXPORTS)}"}), 404
+    fmt = request.args.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        return jsonify({'error': 'format must be csv or jsonl'}), 400
+    compress = request.args.get('gzip', 'false').lower() == 'true'
+    
+    conn = get_db_connection()
+    try:
+        cursor = exports.open_export(conn, dataset, request.args)
+    except ValueError as e:
+        conn.close()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        conn.discard()
+        logger.exception('export failed', extra={'fields': {'dataset': dataset}})
+        return jsonify({'error': str(e)}), 500
+    
+    filename = f'{dataset}.{fmt}' + ('.gz' if compress else '')
+    response = app.response_class(stream_with_context(exports.stream_export(conn, cursor, fmt, compress)),
+                                  mimetype='application/gzip' if compress else exports.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
 @app.route('/api/analytics/productivity', methods=['GET'])
 def get_productivity_analytics():
+    """Chair utilization and doctor productivity from the daily rollup tables"""
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else date.today()
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else start
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+    if end < start:
+        return jsonify({'error': 'end must not be before start'}), 400
+    granularity = request.args.get('granularity')
+    if granularity is not None and granularity not in rollups.GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(rollups.GRANULARITIES)}"}), 400
+    
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            # Calculate chair utilization
-            cursor.execute('''
-                SELECT 
-                    c.id, c.name, c.status,
-                    COUNT(a.id) as appointment_count,
-                    (COUNT(a.id) * 100.0 / 8) as utilization_rate
-                FROM chairs c
-                LEFT JOIN appointments a ON c.id = a.chair_id AND a.date = CURDATE()
-                GROUP BY c.id, c.name, c.status
-            ''')
-            chair_analytics = cursor.fetchall()
-            
-            # Calculate doctor productivity
-            cursor.execute('''
-                SELECT 
-                    d.id, d.name, d.specialty,
-                    COUNT(a.id) as appointment_count,
-                    (COUNT(a.id) * 100.0 / 10) as productivity_score
-                FROM doctors d
-                LEFT JOIN appointments a ON d.id = a.doctor_id AND a.date = CURDATE()
-                GROUP BY d.id, d.name, d.specialty
-            ''')
-            doctor_analytics = cursor.fetchall()
-            
-            return jsonify({
-                'chair_utilization': chair_analytics,
-                'doctor_productivity': doctor_analytics
-            })
+            cursor.execute('SELECT id, name, status FROM chairs')
+            chairs = cursor.fetchall()
+            cursor.execute('SELECT id, name, specialty FROM doctors')
+            doctors = cursor.fetchall()
+            chair_totals = rollups.summarize(rollups.read_rollups(cursor, 'chair', start, end),
+                                             granularity, start, end, rollups.CHAIR_DAILY_CAPACITY)
+            doctor_totals = rollups.summarize(rollups.read_rollups(cursor, 'doctor', start, end),
+                                              granularity, start, end, rollups.DOCTOR_DAILY_CAPACITY)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
+    
+    def build(entities, totals, rate_field):
+        empty = {'appointment_count': 0, 'completed_count': 0, 'rate': 0.0}
+        if granularity is None:
+            # Every chair/doctor is listed, including idle ones
+            result = []
+            for entity in entities:
+                entry = totals.get(entity['id'], empty)
+                result.append(dict(entity, appointment_count=entry['appointment_count'],
+                                   completed_count=entry['completed_count'], **{rate_field: entry['rate']}))
+            return result
+        by_id = {entity['id']: entity for entity in entities}
+        result = []
+        for (period, key), entry in sorted(totals.items(), key=lambda item: (item[0][0], item[0][1])):
+            entity = by_id.get(key, {'id': key})
+            result.append(dict(entity, period=period, appointment_count=entry['appointment_count'],
+                               completed_count=entry['completed_count'], **{rate_field: entry['rate']}))
+        return result
+    
+    return jsonify({
+        'start': start,
+        'end': end,
+        'granularity': granularity or 'total',
+        'chair_utilization': build(chairs, chair_totals, 'utilization_rate'),
+        'doctor_productivity': build(doctors, doctor_totals, 'productivity_score')
+    })
 
 @app.route('/api/doctors/pending', methods=['GET'])
 def get_pending_doctors():
@@ -569,8 +1240,8 @@ def get_pending_doctors():
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            cursor.execute('''
-                SELECT d.*, u.username 
+            cursor.execute(f'''
+                SELECT {DOCTOR_COLUMNS}, u.username 
                 FROM doctors d 
                 LEFT JOIN users u ON d.id = u.doctor_id 
                 WHERE d.status = 'pending_approval'
@@ -585,7 +1256,7 @@ def get_pending_doctors():
                     
             return jsonify(doctors)
     except Exception as e:
-        print(f"Error fetching pending doctors: {str(e)}")
+        logger.exception('fetching pending doctors failed')
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
@@ -600,6 +1271,7 @@ def approve_doctor(doctor_id):
             if cursor.rowcount == 0:
                 return jsonify({'error': 'Doctor not found'}), 404
             conn.commit()
+            doctor_directory_cache.invalidate_all()
             return jsonify({'status': 'success', 'message': 'Doctor approved successfully'})
     except Exception as e:
         conn.rollback()
@@ -619,7 +1291,13 @@ def reject_doctor(doctor_id):
             cursor.execute('UPDATE doctors SET status = "rejected", rejection_reason = %s WHERE id = %s', (reason, doctor_id))
             if cursor.rowcount == 0:
                 return jsonify({'error': 'Doctor not found'}), 404
+            cursor.execute('SELECT id FROM users WHERE doctor_id = %s', (doctor_id,))
+            user_ids = [row['id'] for row in cursor.fetchall()]
             conn.commit()
+            doctor_directory_cache.invalidate_all()
+            # Sessions issued while the doctor was approved must stop working
+            for user_id in user_ids:
+                session_tokens.revoke_user(user_id)
             return jsonify({'status': 'success', 'message': 'Doctor rejected successfully'})
     except Exception as e:
         conn.rollback()
@@ -643,55 +1321,67 @@ def admin_login():
     data = request.get_json()
     if not data or 'username' not in data or 'password' not in data:
         return jsonify({'error': 'Missing username or password'}), 400
+    if not isinstance(data['password'], str):
+        return jsonify({'error': 'password must be a string'}), 400
     
     # Security: Log admin login attempt
-    print(f"Admin login attempt: {data.get('username')} at {datetime.now()}")
+    logger.info('admin login attempt', extra={'fields': {'username': data.get('username')}})
     
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
             # Check for admin credentials in database
-            cursor.execute('SELECT * FROM users WHERE username = %s AND password = %s AND role = "admin"', 
-                         (data['username'], data['password']))
+            cursor.execute('SELECT * FROM users WHERE username = %s AND role = "admin"', (data['username'],))
             admin_user = cursor.fetchone()
-            
-            if admin_user:
-                # Log successful admin login
-                print(f"Admin login successful: {data['username']} at {datetime.now()}")
-                
-                admin_response = {
-                    'id': admin_user['id'],
-                    'username': admin_user['username'],
-                    'role': admin_user['role'],
-                    'name': 'System Administrator',
-                    'loginTime': datetime.now().isoformat()
-                }
-                
-                return jsonify(admin_response)
-            else:
-                # Log failed admin login attempt
-                print(f"Failed admin login attempt: {data['username']} at {datetime.now()}")
-                return jsonify({'error': 'Invalid admin credentials'}), 401
-                
     except Exception as e:
-        print(f"Admin login error: {str(e)}")
+        logger.exception('admin login error')
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
+    
+    # As in login(): hash without holding a database connection
+    try:
+        if not check_password(admin_user, data['password']):
+            # Log failed admin login attempt
+            logger.warning('admin login failed', extra={'fields': {'username': data['username']}})
+            return jsonify({'error': 'Invalid admin credentials'}), 401
+    except HasherBusy as e:
+        return jsonify({'error': str(e)}), 503
+    
+    # Log successful admin login
+    logger.info('admin login successful', extra={'fields': {'username': data['username']}})
+    
+    admin_response = {
+        'id': admin_user['id'],
+        'username': admin_user['username'],
+        'role': admin_user['role'],
+        'name': 'System Administrator',
+        'loginTime': datetime.now().isoformat()
+    }
+    token, claims = session_tokens.issue(admin_user)
+    admin_response['token'] = token
+    admin_response['token_expires_at'] = claims['exp']
+    
+    return jsonify(admin_response)
 
 @app.route('/api/doctors/profile', methods=['GET'])
 def get_doctor_profile():
     """Get the profile of the logged-in doctor"""
-    # Get doctor_id from query parameter or session
-    doctor_id = request.args.get('doctor_id')
-    if not doctor_id:
-        return jsonify({'error': 'Doctor ID required'}), 400
+    try:
+        claims = session_claims()
+    except TokenError as e:
+        return jsonify({'error': str(e)}), 401
+    if claims is None:
+        return jsonify({'error': 'Bearer token required'}), 401
+    if claims['role'] != 'doctor':
+        return jsonify({'error': 'Doctor session required'}), 403
+    doctor_id = claims['doctor_id']
     
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            cursor.execute('''
-                SELECT d.*, u.username 
+            cursor.execute(f'''
+                SELECT {DOCTOR_COLUMNS}, u.username 
                 FROM doctors d 
                 JOIN users u ON d.id = u.doctor_id 
                 WHERE d.id = %s
@@ -710,26 +1400,20 @@ def get_doctor_profile():
 @app.route('/api/doctors/<int:doctor_id>/appointments', methods=['GET'])
 def get_doctor_appointments(doctor_id):
     """Get appointments for a specific doctor"""
+    denied = require_session('doctor', doctor_id)
+    if denied:
+        return denied
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            cursor.execute('''
-                SELECT a.*, p.name as patient_name, p.age, p.gender, p.contact as patient_contact
+            cursor.execute(f'''
+                SELECT {APPOINTMENT_COLUMNS}, p.name as patient_name, p.age, p.gender, p.contact as patient_contact
                 FROM appointments a
                 JOIN patients p ON a.patient_id = p.id
                 WHERE a.doctor_id = %s
                 ORDER BY a.date DESC, a.time ASC
             ''', (doctor_id,))
-            appointments = cursor.fetchall()
-            
-            # Convert datetime objects to strings
-            for appointment in appointments:
-                if appointment.get('date'):
-                    appointment['date'] = appointment['date'].strftime('%Y-%m-%d')
-                if appointment.get('time'):
-                    appointment['time'] = str(appointment['time'])
-            
-            return jsonify(appointments)
+            return jsonify(cursor.fetchall())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -738,26 +1422,20 @@ def get_doctor_appointments(doctor_id):
 @app.route('/api/doctors/<int:doctor_id>/appointments/today', methods=['GET'])
 def get_doctor_today_appointments(doctor_id):
     """Get today's appointments for a specific doctor"""
+    denied = require_session('doctor', doctor_id)
+    if denied:
+        return denied
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            cursor.execute('''
-                SELECT a.*, p.name as patient_name, p.age, p.gender, p.contact as patient_contact
+            cursor.execute(f'''
+                SELECT {APPOINTMENT_COLUMNS}, p.name as patient_name, p.age, p.gender, p.contact as patient_contact
                 FROM appointments a
                 JOIN patients p ON a.patient_id = p.id
                 WHERE a.doctor_id = %s AND a.date = CURDATE()
                 ORDER BY a.time ASC
             ''', (doctor_id,))
-            appointments = cursor.fetchall()
-            
-            # Convert datetime objects to strings
-            for appointment in appointments:
-                if appointment.get('date'):
-                    appointment['date'] = appointment['date'].strftime('%Y-%m-%d')
-                if appointment.get('time'):
-                    appointment['time'] = str(appointment['time'])
-            
-            return jsonify(appointments)
+            return jsonify(cursor.fetchall())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -773,11 +1451,6 @@ def treatment_notes():
                 doctor_id = request.args.get('doctor_id')
                 patient_id = request.args.get('patient_id')
                 try:
-                    # Check if table exists
-                    cursor.execute("SHOW TABLES LIKE 'treatment_notes'")
-                    if not cursor.fetchone():
-                        print('ERROR: treatment_notes table does not exist!')
-                        return jsonify({'error': 'treatment_notes table does not exist'}), 500
                     if doctor_id:
                         cursor.execute('''
                             SELECT tn.*, p.name as patient_name, d.name as doctor_name
@@ -804,14 +1477,9 @@ def treatment_notes():
                             JOIN doctors d ON tn.doctor_id = d.id
                             ORDER BY tn.created_at DESC
                         ''')
-                    notes = cursor.fetchall()
-                    for note in notes:
-                        if note.get('created_at'):
-                            note['created_at'] = note['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-                    return jsonify(notes)
+                    return jsonify(cursor.fetchall())
                 except Exception as e:
-                    print('Error in GET /api/treatment-notes:', str(e))
-                    import traceback; traceback.print_exc()
+                    logger.exception('GET /api/treatment-notes failed')
                     return jsonify({'error': str(e)}), 500
             elif request.method == 'POST':
                 data = request.get_json()
@@ -826,16 +1494,97 @@ def treatment_notes():
                     conn.commit()
                     return jsonify({'status': 'success', 'id': cursor.lastrowid}), 201
                 except Exception as e:
-                    print('Error in POST /api/treatment-notes:', str(e))
-                    import traceback; traceback.print_exc()
+                    logger.exception('POST /api/treatment-notes failed')
                     return jsonify({'error': str(e)}), 500
     except Exception as e:
-        print('General error in /api/treatment-notes:', str(e))
-        import traceback; traceback.print_exc()
+        logger.exception('/api/treatment-notes failed')
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
 
+NOTE_SEARCH_DEFAULT_LIMIT = 20
+NOTE_SEARCH_MAX_LIMIT = 100
+# Relevance order has no stable keyset, so pages are offsets; deeper pages mean a worse query
+NOTE_SEARCH_MAX_OFFSET = 1000
+NOTE_SEARCH_MODES = {'natural': 'IN NATURAL LANGUAGE MODE', 'boolean': 'IN BOOLEAN MODE'}
+
+@app.route('/api/treatment-notes/search', methods=['GET'])
+def search_treatment_notes():
+    """Ranked full-text search over diagnosis, treatment plan and notes
+
+    ?q= is required; doctor_id/patient_id narrow the search, mode=boolean
+    enables +required -excluded "exact phrase" syntax. Returns
+    {'notes': [...], 'next_cursor': ...}, best match first.
+    """
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    if len(q) > 200:
+        return jsonify({'error': 'q must be at most 200 characters'}), 400
+    mode = request.args.get('mode', 'natural')
+    if mode not in NOTE_SEARCH_MODES:
+        return jsonify({'error': f"mode must be one of {', '.join(NOTE_SEARCH_MODES)}"}), 400
+    try:
+        limit = int(request.args.get('limit', NOTE_SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, NOTE_SEARCH_MAX_LIMIT))
+    # Everything that decides the result set; a cursor only continues the same search
+    search = [q, mode, request.args.get('doctor_id') or None, request.args.get('patient_id') or None]
+    offset = 0
+    if request.args.get('cursor'):
+        try:
+            offset, *cursor_search = decode_cursor(request.args['cursor'])
+            offset = int(offset)
+        except Exception:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        if offset < 0:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        if cursor_search != search:
+            return jsonify({'error': 'Cursor belongs to a different search'}), 400
+    if offset >= NOTE_SEARCH_MAX_OFFSET:
+        return jsonify({'notes': [], 'next_cursor': None})
+
+    match = f'MATCH (diagnosis, treatment_plan, notes) AGAINST (%s {NOTE_SEARCH_MODES[mode]})'
+    conditions = [match]
+    params = [q]
+    for arg in ('doctor_id', 'patient_id'):
+        if request.args.get(arg):
+            conditions.append(f'{arg} = %s')
+            params.append(request.args[arg])
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            # Rank and page on the full-text index alone, then join just the page
+            cursor.execute(f'''
+                SELECT tn.*, hits.score, p.name AS patient_name, d.name AS doctor_name
+                FROM (
+                    SELECT id, {match} AS score
+                    FROM treatment_notes
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY score DESC, id DESC
+                    LIMIT %s OFFSET %s
+                ) hits
+                JOIN treatment_notes tn ON tn.id = hits.id
+                LEFT JOIN patients p ON p.id = tn.patient_id
+                LEFT JOIN doctors d ON d.id = tn.doctor_id
+                ORDER BY hits.score DESC, hits.id DESC
+            ''', [q, *params, limit + 1, offset])
+            results = cursor.fetchall()
+    except Exception as e:
+        logger.exception('GET /api/treatment-notes/search failed')
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        if offset + limit < NOTE_SEARCH_MAX_OFFSET:
+            next_cursor = encode_cursor([offset + limit, *search])
+    return jsonify({'notes': results, 'next_cursor': next_cursor})
+
 @app.route('/api/appointments/<int:appointment_id>/status', methods=['PUT'])
 def update_appointment_status(appointment_id):
     """Update appointment status"""
@@ -846,41 +1595,228 @@ def update_appointment_status(appointment_id):
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
+            cursor.execute('SELECT id, patient_id, doctor_id, chair_id, date, time, status FROM appointments WHERE id = %s', (appointment_id,))
+            appointment = cursor.fetchone()
+            if not appointment:
+                return jsonify({'error': 'Appointment not found'}), 404
+            
+            updated = dict(appointment, status=data['status'])
+            if not is_active(appointment['status']) and is_active(data['status']):
+                if appointment['time'] is not None and slot_alignment_error(appointment['time']):
+                    return jsonify({'error': 'Appointment time is off the slot grid; reschedule it instead'}), 400
+                # Re-activating a cancelled appointment must not double-book its slot
+                conflict = bookings.find_conflict(cursor, updated, ignore_id=appointment_id)
+                if conflict:
+                    return conflict_response(conflict)
+            
             cursor.execute('UPDATE appointments SET status = %s WHERE id = %s', (data['status'], appointment_id))
+            rollups.record_changed(cursor, appointment, updated)
             conn.commit()
-            
-            if cursor.rowcount == 0:
-                return jsonify({'error': 'Appointment not found'}), 404
+            bookings.apply_change(appointment_id, appointment, updated)
+            availability.apply_change(appointment_id, appointment, updated)
+            doctor_stats_cache.invalidate(appointment['doctor_id'])
+            publish_status_change(appointment, updated)
             
             return jsonify({'status': 'success'})
     except Exception as e:
+        conn.rollback()
+        if is_duplicate_key(e):
+            return jsonify({'error': 'Time slot already booked'}), 409
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
 
+@app.route('/api/appointments/status', methods=['PUT'])
+def bulk_update_appointment_status():
+    """Update the status of many appointments: {'updates': [{'id', 'status'}, ...]}
+
+    Valid rows are written in one transaction; invalid ones are reported per
+    row in 'errors' and skipped.
+    """
+    data = request.get_json(silent=True) or {}
+    updates = data.get('updates')
+    if not isinstance(updates, list) or not updates:
+        return jsonify({'error': 'updates must be a non-empty list'}), 400
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            current = bulk_updates.fetch_current(cursor, [u.get('id') for u in updates if isinstance(u, dict)])
+            valid, errors = bulk_updates.validate_updates(updates, ('status',), current)
+
+            pending = {update['id'] for update in valid}
+            writes = []
+            changes = []
+            for index, update in enumerate(updates):
+                if not isinstance(update, dict) or update.get('id') not in pending:
+                    continue
+                pending.discard(update['id'])
+                before = current[update['id']]
+                after = dict(before, status=update['status'])
+                if not is_active(before['status']) and is_active(after['status']):
+                    if before['time'] is not None and slot_alignment_error(before['time']):
+                        errors.append({'index': index, 'id': before['id'],
+                                       'error': 'Appointment time is off the slot grid; reschedule it instead'})
+                        continue
+                    # Re-activating a cancelled appointment must not double-book its slot
+                    conflict = bookings.find_conflict(cursor, after, ignore_id=before['id'])
+                    if conflict:
+                        errors.append({'index': index, 'id': before['id'], 'error': 'Time slot already booked',
+                                       'conflict': conflict.to_dict()})
+                        continue
+                writes.append(update)
+                changes.append((before, after))
+
+            if writes:
+                bulk_updates.bulk_update_appointments(cursor, writes, ('status',))
+                rollups.record_changes(cursor, changes)
+                conn.commit()
+                for before, after in changes:
+                    bookings.apply_change(before['id'], before, after)
+                    availability.apply_change(before['id'], before, after)
+                    publish_status_change(before, after)
+                doctor_stats_cache.invalidate(*{before['doctor_id'] for before, _ in changes})
+
+            errors.sort(key=lambda error: error['index'])
+            status_code = 200 if writes or not errors else 400
+            return jsonify({'status': 'success' if writes else 'error', 'updated': len(writes), 'errors': errors}), status_code
+    except Exception as e:
+        conn.rollback()
+        if is_duplicate_key(e):
+            return jsonify({'error': 'Time slot already booked'}), 409
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+DOCTOR_PATIENTS_DEFAULT_LIMIT = 50
+DOCTOR_PATIENTS_MAX_LIMIT = 500
+# ?sort= -> (column, default direction); rows without a value sort last either way
+DOCTOR_PATIENT_SORTS = {
+    'name': ('p.name', 'asc'),
+    'last_visit': ('s.last_visit', 'desc'),
+    'next_visit': ('s.next_visit', 'asc'),
+    'appointment_count': ('s.appointment_count', 'desc'),
+    'last_appointment': ('s.last_appointment', 'desc'),
+}
+
 @app.route('/api/doctors/<int:doctor_id>/patients', methods=['GET'])
 def get_doctor_patients(doctor_id):
-    """Get all patients for a specific doctor"""
+    """Get all patients for a specific doctor
+
+    Read from doctor_patient_summary, which the appointment write handlers
+    keep up to date. ?sort= picks the order (name, last_visit, next_visit,
+    appointment_count, last_appointment) and ?order=asc|desc overrides its
+    direction; passing limit or cursor switches to keyset pages returned as
+    {'patients': [...], 'next_cursor': ...}.
+    """
+    denied = require_session('doctor', doctor_id)
+    if denied:
+        return denied
+    sort = request.args.get('sort', 'name')
+    if sort not in DOCTOR_PATIENT_SORTS:
+        return jsonify({'error': f"sort must be one of {', '.join(DOCTOR_PATIENT_SORTS)}"}), 400
+    column, order = DOCTOR_PATIENT_SORTS[sort]
+    order = request.args.get('order', order).lower()
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'order must be asc or desc'}), 400
+    compare = '>' if order == 'asc' else '<'
+
+    conditions = ['s.doctor_id = %s']
+    params = [doctor_id]
+    paginate = 'limit' in request.args or 'cursor' in request.args
+    if paginate:
+        try:
+            limit = int(request.args.get('limit', DOCTOR_PATIENTS_DEFAULT_LIMIT))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, DOCTOR_PATIENTS_MAX_LIMIT))
+        if request.args.get('cursor'):
+            try:
+                cursor_sort, cursor_order, after_value, after_id = decode_cursor(request.args['cursor'])
+                after_id = int(after_id)
+            except Exception:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            if (cursor_sort, cursor_order) != (sort, order):
+                return jsonify({'error': 'Cursor belongs to a different sort order'}), 400
+            if after_value is None:
+                conditions.append(f'{column} IS NULL AND s.patient_id {compare} %s')
+                params.append(after_id)
+            else:
+                conditions.append(f'({column} IS NULL OR {column} {compare} %s '
+                                  f'OR ({column} = %s AND s.patient_id {compare} %s))')
+                params.extend([after_value, after_value, after_id])
+
+    query = f'''
+        SELECT {PATIENT_COLUMNS}, s.appointment_count, s.last_appointment, s.last_visit, s.next_visit
+        FROM doctor_patient_summary s
+        JOIN patients p ON p.id = s.patient_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {column} IS NULL, {column} {order.upper()}, s.patient_id {order.upper()}
+    '''
+    if paginate:
+        query += ' LIMIT %s'
+        params.append(limit + 1)
+
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            cursor.execute('''
-                SELECT DISTINCT p.*, 
-                       COUNT(a.id) as appointment_count,
-                       MAX(a.date) as last_appointment
-                FROM patients p
-                JOIN appointments a ON p.id = a.patient_id
-                WHERE a.doctor_id = %s
-                GROUP BY p.id
-                ORDER BY p.name
-            ''', (doctor_id,))
-            patients = cursor.fetchall()
-            
-            for patient in patients:
-                if patient.get('last_appointment'):
-                    patient['last_appointment'] = patient['last_appointment'].strftime('%Y-%m-%d')
-            
-            return jsonify(patients)
+            rollups.refresh_past_next_visits(cursor, doctor_id)
+            conn.commit()
+            cursor.execute(query, params)
+            results = cursor.fetchall()
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+    if not paginate:
+        return jsonify(results)
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        value = last[column.split('.')[1]]
+        next_cursor = encode_cursor([sort, order, value if value is None or isinstance(value, int) else str(value),
+                                     last['id']])
+    return jsonify({'patients': results, 'next_cursor': next_cursor})
+
+@app.route('/api/doctors/<int:doctor_id>/availability', methods=['GET'])
+def get_doctor_availability(doctor_id):
+    """Free slots for one approved doctor between ?start= and ?end= (default the next 7 days)"""
+    try:
+        start, end = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            # Same doctors as /api/availability: pending or rejected ones cannot be booked
+            cursor.execute("SELECT id FROM doctors WHERE id = %s AND status = 'approved'", (doctor_id,))
+            doctor = cursor.fetchone()
+            if not doctor:
+                return jsonify({'error': 'Doctor not found'}), 404
+            slots = availability.free_slots(cursor, [doctor_id], start, end)
+            return jsonify({'doctor_id': doctor_id, 'slot_minutes': availability.slot_minutes, 'days': slots[doctor_id]})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/availability', methods=['GET'])
+def get_availability():
+    """Free slots for every approved doctor between ?start= and ?end="""
+    try:
+        start, end = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM doctors WHERE status = 'approved'")
+            doctor_ids = [row['id'] for row in cursor.fetchall()]
+            slots = availability.free_slots(cursor, doctor_ids, start, end)
+            return jsonify({'slot_minutes': availability.slot_minutes,
+                            'doctors': [{'doctor_id': doctor_id, 'days': slots[doctor_id]} for doctor_id in doctor_ids]})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -889,41 +1825,47 @@ def get_doctor_patients(doctor_id):
 @app.route('/api/doctors/<int:doctor_id>/stats', methods=['GET'])
 def get_doctor_stats(doctor_id):
     """Get statistics for a specific doctor"""
+    denied = require_session('doctor', doctor_id)
+    if denied:
+        return denied
+    stats = doctor_stats_cache.get(doctor_id)
+    if stats is not None:
+        return jsonify(stats)
+    
+    today = date.today()
+    month_start = today.replace(day=1)
+    next_month = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1)
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            # Today's appointments
+            # Every count is a range on (doctor_id, date) or on the summary's primary key
             cursor.execute('''
-                SELECT COUNT(*) as today_appointments,
-                       SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
-                       SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending,
-                       SUM(CASE WHEN status = 'urgent' THEN 1 ELSE 0 END) as urgent
-                FROM appointments 
-                WHERE doctor_id = %s AND date = CURDATE()
-            ''', (doctor_id,))
-            today_stats = cursor.fetchone()
-            
-            # Total patients
-            cursor.execute('''
-                SELECT COUNT(DISTINCT patient_id) as total_patients
-                FROM appointments 
-                WHERE doctor_id = %s
-            ''', (doctor_id,))
-            patient_stats = cursor.fetchone()
-            
-            # Monthly appointments
-            cursor.execute('''
-                SELECT COUNT(*) as monthly_appointments
-                FROM appointments 
-                WHERE doctor_id = %s AND MONTH(date) = MONTH(CURDATE()) AND YEAR(date) = YEAR(CURDATE())
-            ''', (doctor_id,))
-            monthly_stats = cursor.fetchone()
+                SELECT today.today_appointments, today.completed, today.pending, today.urgent,
+                       (SELECT COUNT(*) FROM doctor_patient_summary WHERE doctor_id = %s) as total_patients,
+                       (SELECT COUNT(*) FROM appointments
+                        WHERE doctor_id = %s AND date >= %s AND date < %s) as monthly_appointments
+                FROM (
+                    SELECT COUNT(*) as today_appointments,
+                           COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed,
+                           COUNT(CASE WHEN status = 'pending' THEN 1 END) as pending,
+                           COUNT(CASE WHEN status = 'urgent' THEN 1 END) as urgent
+                    FROM appointments
+                    WHERE doctor_id = %s AND date = %s
+                ) today
+            ''', (doctor_id, doctor_id, month_start, next_month, doctor_id, today))
+            row = cursor.fetchone()
             
             stats = {
-                'today': today_stats,
-                'patients': patient_stats,
-                'monthly': monthly_stats
+                'today': {
+                    'today_appointments': row['today_appointments'],
+                    'completed': row['completed'],
+                    'pending': row['pending'],
+                    'urgent': row['urgent']
+                },
+                'patients': {'total_patients': row['total_patients']},
+                'monthly': {'monthly_appointments': row['monthly_appointments']}
             }
+            doctor_stats_cache.set(doctor_id, stats)
             
             return jsonify(stats)
     except Exception as e:
@@ -0,0 +1,202 @@
+"""
+Free appointment slots per doctor and day
+
+Each loaded day holds one bitmap (a Python int, bit n = n-th slot of the
+day) of booked time per doctor and per chair. A doctor's free slots are
+then working hours & ~doctor bitmap & (any available chair free), a handful
+of integer operations per doctor-day. Working hours are the clinic hours,
+or the doctor's own from DOCTOR_HOURS, the same source the optimizer uses. Days are loaded with one range query
+over the (date, time) index, kept up to date by the write handlers after
+they commit, and reloaded after AVAILABILITY_TTL seconds to pick up writes
+from other worker processes.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from booking_index import INACTIVE_STATUSES, SLOT_MINUTES, is_active, to_date, to_minutes
+from scheduler import CLINIC_CLOSE, CLINIC_OPEN, DOCTOR_HOURS, format_minutes
+
+AVAILABILITY_TTL = float(os.environ.get('AVAILABILITY_TTL', '30'))
+MAX_DAYS = int(os.environ.get('AVAILABILITY_MAX_DAYS', '400'))
+MAX_RANGE_DAYS = int(os.environ.get('AVAILABILITY_MAX_RANGE_DAYS', '62'))
+
+
+class _Day:
+    __slots__ = ('bookings', 'doctor_busy', 'chair_busy', 'loaded_at')
+
+    def __init__(self):
+        self.bookings = {}      # appointment id -> (doctor_id, chair_id, slot bitmap)
+        self.doctor_busy = {}   # doctor_id -> slot bitmap
+        self.chair_busy = {}    # chair_id -> slot bitmap
+        self.loaded_at = time.monotonic()
+
+    def add(self, appointment_id, doctor_id, chair_id, bits):
+        self.remove(appointment_id)
+        self.bookings[appointment_id] = (doctor_id, chair_id, bits)
+        if doctor_id is not None:
+            self.doctor_busy[doctor_id] = self.doctor_busy.get(doctor_id, 0) | bits
+        if chair_id is not None:
+            self.chair_busy[chair_id] = self.chair_busy.get(chair_id, 0) | bits
+
+    def remove(self, appointment_id):
+        booking = self.bookings.pop(appointment_id, None)
+        if booking is None:
+            return
+        doctor_id, chair_id, _ = booking
+        # Rebuild the two affected bitmaps; a day only holds a few dozen bookings
+        if doctor_id is not None:
+            self.doctor_busy[doctor_id] = self._union(0, doctor_id)
+        if chair_id is not None:
+            self.chair_busy[chair_id] = self._union(1, chair_id)
+
+    def _union(self, position, resource_id):
+        bits = 0
+        for booking in self.bookings.values():
+            if booking[position] == resource_id:
+                bits |= booking[2]
+        return bits
+
+
+class AvailabilityIndex:
+    def __init__(self, slot_minutes=SLOT_MINUTES, clinic_open=CLINIC_OPEN, clinic_close=CLINIC_CLOSE,
+                 doctor_hours=DOCTOR_HOURS, ttl=AVAILABILITY_TTL, max_days=MAX_DAYS):
+        self.slot_minutes = slot_minutes
+        self.clinic_hours = self._window(to_minutes(clinic_open), to_minutes(clinic_close))
+        # {doctor_id: (start_minutes, end_minutes)}, as parsed by scheduler.parse_doctor_hours
+        self.doctor_hours = {doctor_id: self._window(start, end) for doctor_id, (start, end) in doctor_hours.items()}
+        self.ttl = ttl
+        self.max_days = max_days
+        self._days = OrderedDict()
+        self._chairs = None     # (available chair ids, loaded_at)
+        self._lock = threading.Lock()
+
+    def _window(self, start_minutes, end_minutes):
+        """Bitmap of the slots from start (inclusive) to end (exclusive)"""
+        first, last = start_minutes // self.slot_minutes, end_minutes // self.slot_minutes
+        return ((1 << max(last - first, 0)) - 1) << first
+
+    def _slot_bits(self, appointment_time):
+        """Bitmap of the slots an appointment starting at this time overlaps"""
+        start = to_minutes(appointment_time)
+        first = start // self.slot_minutes
+        last = (start + self.slot_minutes - 1) // self.slot_minutes
+        return ((1 << (last - first + 1)) - 1) << first
+
+    def _fresh(self, loaded_at):
+        return time.monotonic() - loaded_at < self.ttl
+
+    def _load_days(self, cursor, start, end):
+        placeholders = ', '.join(['%s'] * len(INACTIVE_STATUSES))
+        cursor.execute(f'''
+            SELECT id, doctor_id, chair_id, date, time FROM appointments
+            WHERE date BETWEEN %s AND %s AND time IS NOT NULL AND status NOT IN ({placeholders})
+        ''', (start, end, *INACTIVE_STATUSES))
+        days = {start + timedelta(days=i): _Day() for i in range((end - start).days + 1)}
+        for row in cursor.fetchall():
+            day = days.get(to_date(row['date']))
+            if day is not None:
+                day.add(row['id'], row['doctor_id'], row['chair_id'], self._slot_bits(row['time']))
+        return days
+
+    def _get_days(self, cursor, start, end):
+        wanted = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        with self._lock:
+            found = {d: self._days[d] for d in wanted if d in self._days and self._fresh(self._days[d].loaded_at)}
+        missing = [d for d in wanted if d not in found]
+        if missing:
+            loaded = self._load_days(cursor, missing[0], missing[-1])
+            with self._lock:
+                for day in missing:
+                    self._days[day] = found[day] = loaded[day]
+                    self._days.move_to_end(day)
+                while len(self._days) > self.max_days:
+                    self._days.popitem(last=False)
+        return [(day, found[day]) for day in wanted]
+
+    def _available_chairs(self, cursor):
+        with self._lock:
+            if self._chairs is not None and self._fresh(self._chairs[1]):
+                return self._chairs[0]
+        cursor.execute("SELECT id FROM chairs WHERE status = 'available'")
+        chair_ids = [row['id'] for row in cursor.fetchall()]
+        with self._lock:
+            self._chairs = (chair_ids, time.monotonic())
+        return chair_ids
+
+    def free_slots(self, cursor, doctor_ids, start, end, now=None):
+        """{doctor_id: {'YYYY-MM-DD': ['HH:MM:SS', ...]}} of bookable slots in [start, end]"""
+        now = now or datetime.now()
+        chair_ids = self._available_chairs(cursor)
+        result = {doctor_id: {} for doctor_id in doctor_ids}
+        for day, entry in self._get_days(cursor, start, end):
+            if day < now.date():
+                continue
+            window = -1
+            if day == now.date():
+                # Only slots that have not started yet
+                window = ~((1 << -(-(now.hour * 60 + now.minute) // self.slot_minutes)) - 1)
+            with self._lock:
+                chair_free = 0
+                for chair_id in chair_ids:
+                    chair_free |= ~entry.chair_busy.get(chair_id, 0)
+                doctor_busy = {d: entry.doctor_busy.get(d, 0) for d in doctor_ids}
+            open_bits = window & chair_free
+            for doctor_id in doctor_ids:
+                free = open_bits & self.doctor_hours.get(doctor_id, self.clinic_hours) & ~doctor_busy[doctor_id]
+                result[doctor_id][day.isoformat()] = self._bits_to_times(free)
+        return result
+
+    def _bits_to_times(self, bits):
+        times = []
+        while bits:
+            low = bits & -bits
+            times.append(format_minutes((low.bit_length() - 1) * self.slot_minutes))
+            bits ^= low
+        return times
+
+    def add(self, appointment_id, appointment):
+        """Record a committed booking in its day, if that day is loaded"""
+        if not is_active(appointment.get('status')) or appointment.get('time') is None or appointment.get('date') is None:
+            return
+        with self._lock:
+            entry = self._days.get(to_date(appointment['date']))
+            if entry is not None:
+                doctor_id = int(appointment['doctor_id']) if appointment.get('doctor_id') is not None else None
+                chair_id = int(appointment['chair_id']) if appointment.get('chair_id') is not None else None
+                entry.add(appointment_id, doctor_id, chair_id, self._slot_bits(appointment['time']))
+
+    def remove(self, appointment_id, appointment):
+        if appointment.get('date') is None:
+            return
+        with self._lock:
+            entry = self._days.get(to_date(appointment['date']))
+            if entry is not None:
+                entry.remove(appointment_id)
+
+    def apply_change(self, appointment_id, before, after):
+        self.remove(appointment_id, before)
+        self.add(appointment_id, after)
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+            self._chairs = None
+
+
+def parse_range(args, today=None):
+    """(start, end) dates from ?start=&end= (default: the next 7 days); raises ValueError"""
+    today = today or date.today()
+    try:
+        start = date.fromisoformat(args['start']) if args.get('start') else today
+        end = date.fromisoformat(args['end']) if args.get('end') else start + timedelta(days=6)
+    except ValueError:
+        raise ValueError('start and end must be YYYY-MM-DD')
+    if end < start:
+        raise ValueError('end must not be before start')
+    if (end - start).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f'At most {MAX_RANGE_DAYS} days per request')
+    return start, end
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Seed a benchmark database and load-test the API against it
+
+    python benchmark.py seed [--doctors N] [--patients N] [--appointments N] [--notes N] [--seed N] [--force]
+    python benchmark.py run [--workloads login,booking,...] [--concurrency N] [--duration S]
+                            [--warmup S] [--output FILE] [--baseline FILE] [--threshold 0.2]
+
+`seed` fills the database from db_pool's DB_* settings (run it against a
+dedicated database) with bench_* users, conflict-free appointments spread
+around today, treatment notes and rollups, and writes the id ranges to
+bench_manifest.json; --force first deletes the bench_* data an earlier seed
+left behind. `run` drives each workload for --duration seconds with
+--concurrency client threads against BENCH_URL and reports latency
+percentiles and throughput. With --baseline, it exits 1 when a workload's
+p95 grew, or its throughput dropped, by more than --threshold.
+"""
+
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from booking_index import SLOT_MINUTES, to_minutes
+from db_pool import get_db_connection
+from migrations import MIGRATIONS, run_migrations
+from passwords import hash_password
+from scheduler import CLINIC_CLOSE, CLINIC_OPEN, format_minutes
+
+BENCH_URL = os.environ.get('BENCH_URL', 'http://127.0.0.1:5000')
+BENCH_PASSWORD = os.environ.get('BENCH_PASSWORD', 'bench-password')
+MANIFEST_PATH = os.environ.get('BENCH_MANIFEST', 'bench_manifest.json')
+SEED_CHUNK_SIZE = 5000
+# Matches the seeded usernames; '!' rather than backslash escapes the same way in MySQL and SQLite
+BENCH_USERS = "username LIKE 'bench!_%' ESCAPE '!'"
+
+SEED_DEFAULTS = {'--doctors': '500', '--patients': '200000', '--appointments': '5000000', '--notes': '200000', '--seed': '1'}
+RUN_DEFAULTS = {'--workloads': 'login,booking,dashboard,analytics,treatment_notes', '--concurrency': '16',
+                '--duration': '30', '--warmup': '3', '--output': '', '--baseline': '', '--threshold': '0.2'}
+
+SPECIALTIES = ('General Dentistry', 'Orthodontics', 'Oral Surgery', 'Periodontics', 'Endodontics', 'Pediatric Dentistry')
+DIAGNOSES = ('Dental caries', 'Gingivitis', 'Periodontitis', 'Pulpitis', 'Impacted wisdom tooth', 'Malocclusion',
+             'Tooth sensitivity', 'Cracked tooth', 'Abscess', 'Enamel erosion')
+TREATMENTS = ('Composite filling', 'Scaling and root planing', 'Root canal treatment', 'Extraction', 'Crown placement',
+              'Fluoride varnish', 'Night guard', 'Orthodontic consultation', 'Antibiotics and drainage', 'Follow-up in 6 months')
+
+
+def _parse_options(args, defaults):
+    options = dict(defaults)
+    flags = set()
+    while args:
+        arg = args.pop(0)
+        if arg in options and args:
+            options[arg] = args.pop(0)
+        elif arg.startswith('--') and arg not in options:
+            flags.add(arg)
+        else:
+            raise ValueError(f'Unexpected argument: {arg}')
+    return options, flags
+
+
+# --- seeding ---------------------------------------------------------------
+
+def _insert_rows(conn, cursor, sql, rows):
+    """executemany in chunks (pymysql folds each chunk into multi-row INSERTs); returns the row count"""
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == SEED_CHUNK_SIZE:
+            cursor.executemany(sql, chunk)
+            conn.commit()
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        cursor.executemany(sql, chunk)
+        conn.commit()
+        count += len(chunk)
+    return count
+
+
+def _id_range(cursor, table, before):
+    cursor.execute(f'SELECT MIN(id) AS first, MAX(id) AS last FROM {table} WHERE id > %s', (before,))
+    row = cursor.fetchone()
+    return [row['first'], row['last']]
+
+
+def _max_id(cursor, table):
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) AS max_id FROM {table}')
+    return cursor.fetchone()['max_id']
+
+
+def _delete_in(conn, cursor, table, column, ids):
+    """DELETE ... WHERE column IN ids, one chunk (and commit) at a time"""
+    for i in range(0, len(ids), SEED_CHUNK_SIZE):
+        chunk = ids[i:i + SEED_CHUNK_SIZE]
+        cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+        conn.commit()
+
+
+def purge(conn):
+    """Delete the bench_* users and every row seeded or booked for them, for seed --force"""
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT doctor_id, patient_id FROM users WHERE {BENCH_USERS}")
+        users = cursor.fetchall()
+        doctor_ids = sorted({u['doctor_id'] for u in users if u['doctor_id'] is not None})
+        patient_ids = sorted({u['patient_id'] for u in users if u['patient_id'] is not None})
+        cursor.execute("SELECT id FROM chairs WHERE name LIKE 'Bench Chair %'")
+        chair_ids = [row['id'] for row in cursor.fetchall()]
+        print(f"🧹 Deleting {len(doctor_ids)} bench doctors, {len(patient_ids)} patients and {len(chair_ids)} chairs")
+
+        cursor.execute(f"DELETE FROM users WHERE {BENCH_USERS}")
+        conn.commit()
+        for column, ids in (('doctor_id', doctor_ids), ('patient_id', patient_ids), ('chair_id', chair_ids)):
+            _delete_in(conn, cursor, 'appointments', column, ids)
+        cursor.execute('''
+            DELETE FROM reminder_log
+            WHERE NOT EXISTS (SELECT 1 FROM appointments a WHERE a.id = reminder_log.appointment_id)
+        ''')
+        for table in ('treatment_notes', 'doctor_patient_summary', 'doctor_daily_stats'):
+            _delete_in(conn, cursor, table, 'doctor_id', doctor_ids)
+        for table in ('treatment_notes', 'doctor_patient_summary', 'payments', 'notifications', 'smart_notifications'):
+            _delete_in(conn, cursor, table, 'patient_id', patient_ids)
+        _delete_in(conn, cursor, 'chair_daily_stats', 'chair_id', chair_ids)
+        _delete_in(conn, cursor, 'doctors', 'id', doctor_ids)
+        _delete_in(conn, cursor, 'patients', 'id', patient_ids)
+        _delete_in(conn, cursor, 'chairs', 'id', chair_ids)
+        conn.commit()
+
+
+def seed(conn, doctors, patients, appointments, notes, rng, today=None):
+    """Insert the benchmark data set; returns the manifest describing it"""
+    today = today or date.today()
+    slots = [format_minutes(m) for m in range(to_minutes(CLINIC_OPEN), to_minutes(CLINIC_CLOSE), SLOT_MINUTES)]
+    # Appointment k goes to doctor k % doctors in that doctor's (k // doctors)-th slot,
+    # so no doctor or chair (one per doctor) is ever double-booked
+    days = max(1, math.ceil(appointments / (doctors * len(slots))))
+    start_date = today - timedelta(days=days // 2)
+
+    run_migrations(conn)
+    with conn.cursor() as cursor:
+        cursor.execute('SET SESSION foreign_key_checks = 0')
+        before = {t: _max_id(cursor, t) for t in ('doctors', 'chairs', 'patients', 'users', 'appointments')}
+
+        print(f"👨‍⚕️ Seeding {doctors} doctors and chairs")
+        _insert_rows(conn, cursor, '''
+            INSERT INTO doctors (name, specialty, contact, email, license_number, experience, education, status, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 'approved', NOW())
+        ''', ((f'Dr. Bench {i}', SPECIALTIES[i % len(SPECIALTIES)], f'+1 555-{i:07d}', f'bench_d{i}@example.com',
+               f'BN{i:06d}', rng.randint(1, 30), 'DDS') for i in range(1, doctors + 1)))
+        doctor_ids = _id_range(cursor, 'doctors', before['doctors'])
+        _insert_rows(conn, cursor, "INSERT INTO chairs (name, status) VALUES (%s, 'available')",
+                     ((f'Bench Chair {i}',) for i in range(1, doctors + 1)))
+        chair_ids = _id_range(cursor, 'chairs', before['chairs'])
+
+        print(f"🧑 Seeding {patients} patients")
+        _insert_rows(conn, cursor, 'INSERT INTO patients (name, age, gender, contact) VALUES (%s, %s, %s, %s)',
+                     ((f'Bench Patient {i}', rng.randint(3, 90), rng.choice(('Female', 'Male')), f'+1 556-{i:07d}')
+                      for i in range(1, patients + 1)))
+        patient_ids = _id_range(cursor, 'patients', before['patients'])
+
+        # One hash for every bench user; hashing each password would dominate the seed time
+        password = hash_password(BENCH_PASSWORD)
+        print(f"🔑 Seeding {doctors + patients} users")
+        _insert_rows(conn, cursor, 'INSERT INTO users (username, password, role, patient_id, doctor_id) VALUES (%s, %s, %s, %s, %s)',
+                     ((f'bench_d{i}', password, 'doctor', None, doctor_ids[0] + i - 1) for i in range(1, doctors + 1)))
+        _insert_rows(conn, cursor, 'INSERT INTO users (username, password, role, patient_id, doctor_id) VALUES (%s, %s, %s, %s, %s)',
+                     ((f'bench_p{i}', password, 'patient', patient_ids[0] + i - 1, None) for i in range(1, patients + 1)))
+
+        def appointment_rows():
+            for k in range(appointments):
+                doctor = k % doctors
+                slot_index = k // doctors
+                day = start_date + timedelta(days=slot_index // len(slots))
+                if day < today:
+                    status = 'cancelled' if rng.random() < 0.1 else 'completed'
+                else:
+                    status = 'confirmed' if rng.random() < 0.5 else 'scheduled'
+                yield (patient_ids[0] + rng.randrange(patients), doctor_ids[0] + doctor, chair_ids[0] + doctor,
+                       day, slots[slot_index % len(slots)], status)
+
+        print(f"📅 Seeding {appointments} appointments over {days} days from {start_date}")
+        started = time.monotonic()
+        _insert_rows(conn, cursor, '''
+            INSERT INTO appointments (patient_id, doctor_id, chair_id, date, time, status)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        ''', appointment_rows())
+        print(f"   {appointments / max(time.monotonic() - started, 1e-9):,.0f} rows/s")
+
+        print(f"📝 Seeding {notes} treatment notes")
+        _insert_rows(conn, cursor, '''
+            INSERT INTO treatment_notes (doctor_id, patient_id, diagnosis, treatment_plan, notes, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        ''', ((doctor_ids[0] + rng.randrange(doctors), patient_ids[0] + rng.randrange(patients),
+               rng.choice(DIAGNOSES), rng.choice(TREATMENTS),
+               f'{rng.choice(DIAGNOSES)} noted on tooth {rng.randint(1, 32)}; {rng.choice(TREATMENTS).lower()} discussed.',
+               start_date + timedelta(days=rng.randrange(days), minutes=rng.randrange(24 * 60)))
+              for _ in range(notes)))
+
+        print("📊 Rebuilding daily rollups")
+        for _, _, steps in MIGRATIONS:
+            for step in steps:
+                if step[0] == 'sql' and step[1].startswith('backfill'):
+                    cursor.execute(step[2])
+        conn.commit()
+        cursor.execute('SET SESSION foreign_key_checks = 1')
+
+    return {
+        'doctors': doctors,
+        'patients': patients,
+        'doctor_ids': doctor_ids,
+        'patient_ids': patient_ids,
+        'start_date': start_date.isoformat(),
+        'end_date': (start_date + timedelta(days=days - 1)).isoformat(),
+        'slots': slots,
+        'password': BENCH_PASSWORD,
+    }
+
+
+def seed_command(args):
+    options, flags = _parse_options(args, SEED_DEFAULTS)
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) AS n FROM users WHERE {BENCH_USERS}")
+            existing = cursor.fetchone()['n']
+        if existing:
+            if '--force' not in flags:
+                print("❌ This database already holds bench_* users; use a fresh database or pass --force")
+                return 1
+            purge(conn)
+        manifest = seed(conn, int(options['--doctors']), int(options['--patients']),
+                        int(options['--appointments']), int(options['--notes']), random.Random(int(options['--seed'])))
+    finally:
+        conn.close()
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Seeded; manifest written to {MANIFEST_PATH}")
+    return 0
+
+
+# --- load generation ---------------------------------------------------------
+
+def _login(rng, m):
+    if rng.random() < 0.2:
+        username = f"bench_d{rng.randint(1, m['doctors'])}"
+    else:
+        username = f"bench_p{rng.randint(1, m['patients'])}"
+    return [('POST', '/api/login', {'username': username, 'password': m['password']}, (200,))]
+
+
+def _booking(rng, m):
+    # Past the seeded range, so most requests insert; taken slots answer 409
+    day = date.fromisoformat(m['end_date']) + timedelta(days=rng.randint(1, 365))
+    return [('POST', '/api/appointments', {
+        'patient_id': rng.randint(*m['patient_ids']),
+        'doctor_id': rng.randint(*m['doctor_ids']),
+        'date': day.isoformat(),
+        'time': rng.choice(m['slots']),
+        'status': 'scheduled',
+    }, (201, 409))]
+
+
+def _dashboard(rng, m):
+    # The doctor endpoints only answer the doctor's own session (see WORKLOAD_USERS)
+    doctor_id = m['session']['doctor_id']
+    return [('GET', f'/api/doctors/{doctor_id}/stats', None, (200,)),
+            ('GET', f'/api/doctors/{doctor_id}/appointments/today', None, (200,)),
+            ('GET', f'/api/doctors/{doctor_id}/patients', None, (200,))]
+
+
+def _analytics(rng, m):
+    first = date.fromisoformat(m['start_date'])
+    span = (date.fromisoformat(m['end_date']) - first).days
+    start = first + timedelta(days=rng.randrange(max(span - 30, 1)))
+    query = urlencode({'start': start.isoformat(), 'end': (start + timedelta(days=30)).isoformat(), 'granularity': 'week'})
+    return [('GET', f'/api/analytics/productivity?{query}', None, (200,))]
+
+
+def _treatment_notes(rng, m):
+    if rng.random() < 0.5:
+        query = urlencode({'doctor_id': rng.randint(*m['doctor_ids'])})
+    else:
+        query = urlencode({'patient_id': rng.randint(*m['patient_ids'])})
+    return [('GET', f'/api/treatment-notes?{query}', None, (200,))]
+
+
+# Each operation is one user action; its latency covers all of its requests
+WORKLOADS = {
+    'login': _login,
+    'booking': _booking,
+    'dashboard': _dashboard,
+    'analytics': _analytics,
+    'treatment_notes': _treatment_notes,
+}
+
+# Workloads whose worker threads each sign in once, before the warmup, as
+# the user picked here; the operations get the login response as m['session']
+WORKLOAD_USERS = {
+    'dashboard': lambda rng, m: f"bench_d{rng.randint(1, m['doctors'])}",
+}
+
+
+class _Client:
+    """One keep-alive HTTP connection per worker thread"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.conn = None
+        self.token = None
+
+    def login(self, username, password):
+        """Sign in and send the session token with every later request; returns the user"""
+        status, data = self._send('POST', '/api/login', {'username': username, 'password': password})
+        if status != 200:
+            raise RuntimeError(f'Login as {username} failed with {status}')
+        user = json.loads(data)
+        self.token = user['token']
+        return user
+
+    def request(self, method, path, body):
+        return self._send(method, path, body)[0]
+
+    def _send(self, method, path, body):
+        headers = {}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.conn.request(method, path, payload, headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.conn.close()
+                    self.conn = None
+                return response.status, data
+            except (http.client.HTTPException, OSError):
+                # The server closed an idle keep-alive connection; reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))]
+
+
+def run_workload(name, manifest, concurrency, duration, warmup, base_url=BENCH_URL):
+    """Drive one workload; returns its summary (latencies in milliseconds)"""
+    make_operation = WORKLOADS[name]
+    latencies = []
+    failures = {}
+    lock = threading.Lock()
+    started = time.monotonic()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def worker(index):
+        rng = random.Random(f'{name}-{index}')
+        client = _Client(base_url)
+        context = manifest
+        if name in WORKLOAD_USERS:
+            context = dict(manifest, session=client.login(WORKLOAD_USERS[name](rng, manifest), manifest['password']))
+        local_latencies = []
+        local_failures = {}
+        while True:
+            op_started = time.monotonic()
+            if op_started >= stop_at:
+                break
+            failed = None
+            for method, path, body, ok in make_operation(rng, context):
+                try:
+                    status = client.request(method, path, body)
+                except Exception as e:
+                    failed = type(e).__name__
+                    break
+                if status not in ok:
+                    failed = str(status)
+                    break
+            finished = time.monotonic()
+            if op_started < measure_from:
+                continue
+            if failed:
+                local_failures[failed] = local_failures.get(failed, 0) + 1
+            else:
+                local_latencies.append((finished - op_started) * 1000)
+        with lock:
+            latencies.extend(local_latencies)
+            for key, count in local_failures.items():
+                failures[key] = failures.get(key, 0) + count
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+
+    latencies.sort()
+    return {
+        'operations': len(latencies),
+        'errors': sum(failures.values()),
+        'error_statuses': failures,
+        'throughput': len(latencies) / duration,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': latencies[-1] if latencies else 0.0,
+    }
+
+
+def find_regressions(results, baseline, threshold):
+    """Human-readable regressions of `results` against a previous run's results"""
+    problems = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            problems.append(f"{name}: p95 {current['p95_ms']:.1f}ms vs baseline {previous['p95_ms']:.1f}ms")
+        if previous['throughput'] and current['throughput'] < previous['throughput'] * (1 - threshold):
+            problems.append(f"{name}: {current['throughput']:.1f} ops/s vs baseline {previous['throughput']:.1f} ops/s")
+    return problems
+
+
+def run_command(args):
+    options, flags = _parse_options(args, RUN_DEFAULTS)
+    if flags:
+        raise ValueError(f"Unexpected argument: {', '.join(sorted(flags))}")
+    with open(MANIFEST_PATH, encoding='utf-8') as f:
+        manifest = json.load(f)
+    names = [n.strip() for n in options['--workloads'].split(',') if n.strip()]
+    unknown = [n for n in names if n not in WORKLOADS]
+    if unknown:
+        print(f"❌ Unknown workloads: {', '.join(unknown)} (choose from {', '.join(WORKLOADS)})")
+        return 2
+    concurrency = int(options['--concurrency'])
+    duration = float(options['--duration'])
+
+    print(f"🚀 {BENCH_URL}: {concurrency} clients, {duration:g}s per workload")
+    print(f"{'workload':<16}{'ops':>8}{'errors':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    results = {}
+    for name in names:
+        summary = run_workload(name, manifest, concurrency, duration, float(options['--warmup']))
+        results[name] = summary
+        print(f"{name:<16}{summary['operations']:>8}{summary['errors']:>8}{summary['throughput']:>10.1f}"
+              f"{summary['p50_ms']:>10.1f}{summary['p95_ms']:>10.1f}{summary['p99_ms']:>10.1f}")
+        if summary['error_statuses']:
+            print(f"   errors: {summary['error_statuses']}")
+
+    if options['--output']:
+        with open(options['--output'], 'w', encoding='utf-8') as f:
+            json.dump({'url': BENCH_URL, 'concurrency': concurrency, 'duration': duration, 'results': results}, f, indent=2)
+        print(f"💾 Results written to {options['--output']}")
+
+    if options['--baseline']:
+        with open(options['--baseline'], encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        problems = find_regressions(results, baseline, float(options['--threshold']))
+        for problem in problems:
+            print(f"❌ Regression: {problem}")
+        if problems:
+            return 1
+        print(f"✅ Within {float(options['--threshold']):.0%} of the baseline")
+    return 0
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else None
+    commands = {'seed': seed_command, 'run': run_command}
+    if command not in commands:
+        print(__doc__)
+        return 2
+    try:
+        return commands[command](list(argv[2:]))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,207 @@
+"""
+In-memory interval index of booked doctor and chair time
+
+Each (resource, id, day) bucket keeps its bookings as parallel sorted lists
+of start/end minutes, so an overlap check is two bisects. Buckets are loaded
+lazily from MySQL with an indexed query, updated by the write handlers after
+they commit, and reloaded after BUCKET_TTL seconds so bookings made by other
+worker processes are picked up. The unique (doctor_id/chair_id, date, time,
+active_slot) keys in MySQL remain the final guard against concurrent inserts.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date, timedelta
+
+SLOT_MINUTES = int(os.environ.get('APPOINTMENT_SLOT_MINUTES', '30'))
+BUCKET_TTL = float(os.environ.get('BOOKING_INDEX_TTL', '30'))
+MAX_BUCKETS = int(os.environ.get('BOOKING_INDEX_MAX_BUCKETS', '20000'))
+
+# Appointments in these states do not occupy their slot
+INACTIVE_STATUSES = ('cancelled',)
+
+RESOURCE_COLUMNS = {'doctor': 'doctor_id', 'chair': 'chair_id'}
+
+
+class BookingConflict(Exception):
+    def __init__(self, resource, resource_id, appointment_id):
+        super().__init__(f'{resource} {resource_id} is already booked (appointment {appointment_id})')
+        self.resource = resource
+        self.resource_id = resource_id
+        self.appointment_id = appointment_id
+
+    def to_dict(self):
+        return {'resource': self.resource, 'resource_id': self.resource_id, 'appointment_id': self.appointment_id}
+
+
+def to_minutes(value):
+    """Minutes since midnight for a TIME value (timedelta, time or 'HH:MM[:SS]')"""
+    if isinstance(value, timedelta):
+        return int(value.total_seconds() // 60)
+    if hasattr(value, 'hour'):
+        return value.hour * 60 + value.minute
+    hours, minutes = str(value).split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def slot_alignment_error(value, slot_minutes=SLOT_MINUTES):
+    """Error message unless the TIME value starts exactly on a slot boundary
+
+    The unique (doctor_id/chair_id, date, time, active_slot) keys only catch
+    overlapping bookings when every booking starts on the slot grid.
+    """
+    try:
+        if isinstance(value, timedelta):
+            seconds = int(value.total_seconds())
+        elif hasattr(value, 'hour'):
+            seconds = value.hour * 3600 + value.minute * 60 + value.second
+        else:
+            parts = [int(part) for part in str(value).split(':')]
+            if not 2 <= len(parts) <= 3:
+                raise ValueError(value)
+            seconds = parts[0] * 3600 + parts[1] * 60 + (parts[2] if len(parts) == 3 else 0)
+    except ValueError:
+        return 'time must be HH:MM or HH:MM:SS'
+    if seconds % (slot_minutes * 60):
+        return f'time must start on a {slot_minutes}-minute slot boundary'
+    return None
+
+
+def date_error(value):
+    """Error message unless the value is a date or an ISO 'YYYY-MM-DD' string"""
+    if isinstance(value, date):
+        return None
+    try:
+        date.fromisoformat(str(value))
+    except ValueError:
+        return 'date must be YYYY-MM-DD'
+    return None
+
+
+def to_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def is_active(status):
+    return status not in INACTIVE_STATUSES
+
+
+class _Bucket:
+    __slots__ = ('starts', 'ends', 'ids', 'loaded_at')
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        self.loaded_at = time.monotonic()
+
+    def find_overlap(self, start, end, ignore_id=None):
+        i = bisect_right(self.starts, start)
+        # Bookings never overlap each other, so only the neighbours can collide
+        for j in (i - 1, i):
+            if 0 <= j < len(self.starts) and self.starts[j] < end and self.ends[j] > start:
+                if self.ids[j] != ignore_id:
+                    return self.ids[j]
+        return None
+
+    def insert(self, start, end, appointment_id):
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, appointment_id)
+
+    def remove(self, appointment_id):
+        if appointment_id in self.ids:
+            i = self.ids.index(appointment_id)
+            del self.starts[i], self.ends[i], self.ids[i]
+
+
+class BookingIndex:
+    def __init__(self, slot_minutes=SLOT_MINUTES, ttl=BUCKET_TTL, max_buckets=MAX_BUCKETS):
+        self.slot_minutes = slot_minutes
+        self.ttl = ttl
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, cursor, resource, resource_id, day):
+        column = RESOURCE_COLUMNS[resource]
+        placeholders = ', '.join(['%s'] * len(INACTIVE_STATUSES))
+        cursor.execute(f'''
+            SELECT id, time FROM appointments
+            WHERE {column} = %s AND date = %s AND time IS NOT NULL AND status NOT IN ({placeholders})
+        ''', (resource_id, day, *INACTIVE_STATUSES))
+        bucket = _Bucket()
+        for row in sorted(cursor.fetchall(), key=lambda r: to_minutes(r['time'])):
+            start = to_minutes(row['time'])
+            bucket.starts.append(start)
+            bucket.ends.append(start + self.slot_minutes)
+            bucket.ids.append(row['id'])
+        return bucket
+
+    def _bucket(self, cursor, resource, resource_id, day):
+        key = (resource, int(resource_id), to_date(day))
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None and time.monotonic() - bucket.loaded_at < self.ttl:
+                self._buckets.move_to_end(key)
+                return bucket
+        bucket = self._load(cursor, resource, resource_id, key[2])
+        with self._lock:
+            self._buckets[key] = bucket
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return bucket
+
+    def find_conflict(self, cursor, appointment, ignore_id=None):
+        """First BookingConflict for the appointment's doctor or chair, or None"""
+        if not is_active(appointment.get('status')) or appointment.get('time') is None:
+            return None
+        start = to_minutes(appointment['time'])
+        end = start + self.slot_minutes
+        for resource, column in RESOURCE_COLUMNS.items():
+            resource_id = appointment.get(column)
+            if resource_id is None:
+                continue
+            bucket = self._bucket(cursor, resource, resource_id, appointment['date'])
+            with self._lock:
+                conflicting_id = bucket.find_overlap(start, end, ignore_id)
+            if conflicting_id is not None:
+                return BookingConflict(resource, int(resource_id), conflicting_id)
+        return None
+
+    def add(self, appointment_id, appointment):
+        """Record a committed booking in any loaded buckets"""
+        if not is_active(appointment.get('status')) or appointment.get('time') is None:
+            return
+        start = to_minutes(appointment['time'])
+        with self._lock:
+            for resource, column in RESOURCE_COLUMNS.items():
+                if appointment.get(column) is None:
+                    continue
+                bucket = self._buckets.get((resource, int(appointment[column]), to_date(appointment['date'])))
+                if bucket is not None:
+                    bucket.remove(appointment_id)
+                    bucket.insert(start, start + self.slot_minutes, appointment_id)
+
+    def remove(self, appointment_id, appointment):
+        with self._lock:
+            for resource, column in RESOURCE_COLUMNS.items():
+                if appointment.get(column) is None:
+                    continue
+                bucket = self._buckets.get((resource, int(appointment[column]), to_date(appointment['date'])))
+                if bucket is not None:
+                    bucket.remove(appointment_id)
+
+    def apply_change(self, appointment_id, before, after):
+        """Move a committed booking from its old doctor/chair/day/time/status to the new ones"""
+        self.remove(appointment_id, before)
+        self.add(appointment_id, after)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
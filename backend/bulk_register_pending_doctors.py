@@ -6,10 +6,11 @@ def random_string(length=5):
     return ''.join(random.choices(string.ascii_lowercase + string.digits, k=length))
 
 def bulk_register_doctors(n=5):
+    records = []
     for i in range(n):
         username = f"dr_bulk_{random_string()}"
         name = f"Dr. Bulk Test {random_string()}"
-        data = {
+        records.append({
             'username': username,
             'password': 'password123',
             'role': 'doctor',
@@ -21,10 +22,12 @@ def bulk_register_doctors(n=5):
             'experience': str(2 + i),
             'education': 'DDS from Bulk University',
             'status': 'pending_approval'
-        }
+        })
         print(f"Registering: {username} / {name}")
-        r = requests.post('http://127.0.0.1:5000/api/register', json=data)
-        print(f"  Status: {r.status_code} | Response: {r.text}")
+    r = requests.post('http://127.0.0.1:5000/api/register/bulk', json={'records': records})
+    print(f"  Status: {r.status_code}")
+    for result in r.json().get('results', []):
+        print(f"  {result['username']}: {result['status']} {result.get('error', '')}")
 
 if __name__ == "__main__":
-    bulk_register_doctors(5) 
\ No newline at end of file
+    bulk_register_doctors(5) 
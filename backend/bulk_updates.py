@@ -0,0 +1,120 @@
+"""
+Batched appointment updates
+
+Instead of one UPDATE round trip per appointment, validated rows are written
+in chunks, each chunk as a single UPDATE ... SET col = CASE id WHEN ... END
+WHERE id IN (...) statement.
+"""
+
+import os
+import re
+
+from booking_index import slot_alignment_error
+
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', '500'))
+
+APPOINTMENT_STATUSES = ('scheduled', 'pending', 'confirmed', 'urgent', 'in_progress', 'completed', 'cancelled')
+UPDATABLE_FIELDS = ('chair_id', 'time', 'status')
+
+TIME_PATTERN = re.compile(r'^([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d)?$')
+
+
+def _validate_field(field, value):
+    if field == 'status':
+        if value not in APPOINTMENT_STATUSES:
+            return f"status must be one of {', '.join(APPOINTMENT_STATUSES)}"
+    elif field == 'time':
+        if not isinstance(value, str) or not TIME_PATTERN.match(value):
+            return 'time must be HH:MM or HH:MM:SS'
+        return slot_alignment_error(value)
+    elif field == 'chair_id':
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+            return 'chair_id must be an integer or null'
+    return None
+
+
+def validate_updates(updates, fields, current):
+    """Split requested updates into (valid, errors)
+
+    `current` maps appointment id -> existing row. Each error is
+    {'index', 'id', 'error'} so callers can report it per record.
+    """
+    valid = []
+    errors = []
+    seen = set()
+    for index, update in enumerate(updates):
+        appointment_id = update.get('id') if isinstance(update, dict) else None
+        if isinstance(appointment_id, bool) or not isinstance(appointment_id, int):
+            errors.append({'index': index, 'id': appointment_id, 'error': 'id must be an integer'})
+            continue
+        if appointment_id in seen:
+            errors.append({'index': index, 'id': appointment_id, 'error': 'duplicate id in batch'})
+            continue
+        if appointment_id not in current:
+            errors.append({'index': index, 'id': appointment_id, 'error': 'Appointment not found'})
+            continue
+        problem = None
+        for field in fields:
+            if field not in update:
+                problem = f'{field} is required'
+            elif update[field] != current[appointment_id].get(field):
+                # Values already stored are accepted as-is (e.g. legacy statuses)
+                problem = _validate_field(field, update[field])
+            if problem:
+                break
+        if problem:
+            errors.append({'index': index, 'id': appointment_id, 'error': problem})
+            continue
+        seen.add(appointment_id)
+        valid.append(update)
+    return valid, errors
+
+
+def fetch_current(cursor, ids):
+    """Existing rows for the given ids, keyed by id"""
+    ids = sorted({i for i in ids if isinstance(i, int) and not isinstance(i, bool)})
+    current = {}
+    for start in range(0, len(ids), BULK_CHUNK_SIZE):
+        chunk = ids[start:start + BULK_CHUNK_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f'''
+            SELECT id, patient_id, doctor_id, chair_id, date, time, status
+            FROM appointments WHERE id IN ({placeholders})
+        ''', chunk)
+        current.update({row['id']: row for row in cursor.fetchall()})
+    return current
+
+
+def clear_times(cursor, ids):
+    """Null out the times of rows about to be rescheduled
+
+    MySQL checks unique keys row by row even inside one statement, so two
+    appointments swapping slots would otherwise collide mid-update.
+    """
+    for start in range(0, len(ids), BULK_CHUNK_SIZE):
+        chunk = ids[start:start + BULK_CHUNK_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f'UPDATE appointments SET time = NULL WHERE id IN ({placeholders})', chunk)
+
+
+def bulk_update_appointments(cursor, updates, fields):
+    """Write `fields` of every update in chunked single-statement UPDATEs; returns rows matched"""
+    for field in fields:
+        if field not in UPDATABLE_FIELDS:
+            raise ValueError(f'{field} cannot be bulk updated')
+    total = 0
+    for start in range(0, len(updates), BULK_CHUNK_SIZE):
+        chunk = updates[start:start + BULK_CHUNK_SIZE]
+        assignments = []
+        params = []
+        for field in fields:
+            cases = ' '.join(['WHEN %s THEN %s'] * len(chunk))
+            assignments.append(f'`{field}` = CASE id {cases} ELSE `{field}` END')
+            for update in chunk:
+                params.extend([update['id'], update[field]])
+        ids = [update['id'] for update in chunk]
+        params.extend(ids)
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(f'UPDATE appointments SET {", ".join(assignments)} WHERE id IN ({placeholders})', params)
+        total += len(chunk)
+    return total
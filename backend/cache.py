@@ -0,0 +1,86 @@
+"""
+Small thread-safe in-process caches shared by the API handlers
+"""
+
+import threading
+import time
+
+
+class TTLCache:
+    """Key/value cache whose entries expire `ttl` seconds after being stored"""
+
+    def __init__(self, ttl, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key, value):
+        if len(self._entries) >= self.max_entries and key not in self._entries:
+            self._evict_expired()
+            if len(self._entries) >= self.max_entries:
+                # Still full: drop the entry closest to expiry
+                oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                del self._entries[oldest]
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._entries.items() if expires_at < now]:
+            del self._entries[key]
+
+
+class VersionedCache(TTLCache):
+    """TTL cache with a version counter for write-through invalidation
+
+    Readers capture `version` before querying the database and store with
+    set_if_current(), so a result loaded concurrently with a write is never
+    cached after that write invalidated it.
+    """
+
+    def __init__(self, ttl, max_entries=10000):
+        super().__init__(ttl, max_entries)
+        self.version = 0
+
+    def set_if_current(self, key, value, version):
+        with self._lock:
+            if version != self.version:
+                return False
+            self._store(key, value)
+            return True
+
+    def invalidate_all(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
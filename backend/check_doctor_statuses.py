@@ -1,16 +1,8 @@
-import pymysql
-from pymysql.cursors import DictCursor
+import db_pool
 
 def get_db_connection():
     try:
-        connection = pymysql.connect(
-            host='localhost',
-            user='root',
-            password='V1S21_pass_mysql',
-            db='dental_care',
-            cursorclass=DictCursor
-        )
-        return connection
+        return db_pool.get_db_connection()
     except Exception as e:
         print(f"Error connecting to MySQL: {e}")
         return None
@@ -1,14 +1,8 @@
-import pymysql
-from pymysql.cursors import DictCursor
+from db_pool import get_db_connection
+from passwords import hash_password
 
 def create_admin_user():
-    conn = pymysql.connect(
-        host='localhost',
-        user='root',
-        password='V1S21_pass_mysql',
-        db='dental_care',
-        cursorclass=DictCursor
-    )
+    conn = get_db_connection()
     
     try:
         with conn.cursor() as cursor:
@@ -30,7 +24,7 @@ def create_admin_user():
                 cursor.execute('''
                     INSERT INTO users (username, password, role) 
                     VALUES (%s, %s, %s)
-                ''', ('admin', 'admin123', 'admin'))
+                ''', ('admin', hash_password('admin123'), 'admin'))
                 
                 conn.commit()
                 print("✅ Admin user created successfully!")
@@ -6,7 +6,9 @@ CREATE TABLE IF NOT EXISTS patients (
     name VARCHAR(100),
     age INT,
     gender VARCHAR(10),
-    contact VARCHAR(50)
+    contact VARCHAR(50),
+    import_key VARCHAR(40),
+    INDEX idx_patients_import_key (import_key)
 );
 
 CREATE TABLE IF NOT EXISTS doctors (
@@ -20,7 +22,16 @@ CREATE TABLE IF NOT EXISTS doctors (
     education TEXT,
     status ENUM('pending_approval', 'approved', 'rejected') DEFAULT 'pending_approval',
     rejection_reason TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    import_key VARCHAR(40),
+    INDEX idx_doctors_status_created (status, created_at),
+    INDEX idx_doctors_import_key (import_key)
+);
+
+CREATE TABLE IF NOT EXISTS chairs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(50),
+    status VARCHAR(20) DEFAULT 'available'
 );
 
 CREATE TABLE IF NOT EXISTS appointments (
@@ -30,6 +41,17 @@ CREATE TABLE IF NOT EXISTS appointments (
     date DATE,
     time TIME,
     status VARCHAR(20),
+    chair_id INT NULL,
+    priority VARCHAR(20) NULL,
+    type VARCHAR(50) NULL,
+    -- NULL for cancelled rows so they do not hold their slot in the unique keys
+    active_slot TINYINT AS (CASE WHEN status = 'cancelled' THEN NULL ELSE 1 END) STORED,
+    UNIQUE KEY uq_appointments_doctor_slot (doctor_id, date, time, active_slot),
+    UNIQUE KEY uq_appointments_chair_slot (chair_id, date, time, active_slot),
+    INDEX idx_appointments_doctor_date_time (doctor_id, date, time),
+    INDEX idx_appointments_patient (patient_id),
+    INDEX idx_appointments_chair_date (chair_id, date),
+    INDEX idx_appointments_date_time (date, time, id),
     FOREIGN KEY (patient_id) REFERENCES patients(id),
     FOREIGN KEY (doctor_id) REFERENCES doctors(id)
 );
@@ -40,6 +62,7 @@ CREATE TABLE IF NOT EXISTS payments (
     amount DECIMAL(10,2),
     date DATE,
     status VARCHAR(20),
+    INDEX idx_payments_patient (patient_id),
     FOREIGN KEY (patient_id) REFERENCES patients(id)
 );
 
@@ -49,6 +72,23 @@ CREATE TABLE IF NOT EXISTS notifications (
     message TEXT,
     date DATETIME,
     is_read BOOLEAN,
+    INDEX idx_notifications_patient (patient_id),
+    INDEX idx_notifications_patient_date (patient_id, date, id),
+    INDEX idx_notifications_patient_read (patient_id, is_read),
+    FOREIGN KEY (patient_id) REFERENCES patients(id)
+);
+
+CREATE TABLE IF NOT EXISTS smart_notifications (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    patient_id INT,
+    type VARCHAR(50),
+    title VARCHAR(200),
+    message TEXT,
+    timestamp DATETIME,
+    `read` BOOLEAN DEFAULT 0,
+    action_required BOOLEAN DEFAULT 0,
+    INDEX idx_smart_notifications_patient_ts (patient_id, timestamp),
+    INDEX idx_smart_notifications_patient_read (patient_id, `read`),
     FOREIGN KEY (patient_id) REFERENCES patients(id)
 );
 
@@ -59,6 +99,7 @@ CREATE TABLE IF NOT EXISTS users (
     role ENUM('patient', 'doctor'),
     patient_id INT,
     doctor_id INT,
+    INDEX idx_users_username_password (username, password),
     FOREIGN KEY (patient_id) REFERENCES patients(id),
     FOREIGN KEY (doctor_id) REFERENCES doctors(id)
 );
@@ -71,16 +112,63 @@ CREATE TABLE IF NOT EXISTS treatment_notes (
     treatment_plan TEXT,
     notes TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_treatment_notes_doctor_created (doctor_id, created_at),
+    INDEX idx_treatment_notes_patient_created (patient_id, created_at),
+    FULLTEXT INDEX ft_treatment_notes_text (diagnosis, treatment_plan, notes),
     FOREIGN KEY (doctor_id) REFERENCES doctors(id),
     FOREIGN KEY (patient_id) REFERENCES patients(id)
 );
 
+CREATE TABLE IF NOT EXISTS chair_daily_stats (
+    day DATE NOT NULL,
+    chair_id INT NOT NULL,
+    appointment_count INT NOT NULL DEFAULT 0,
+    completed_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, chair_id)
+);
+
+CREATE TABLE IF NOT EXISTS doctor_daily_stats (
+    day DATE NOT NULL,
+    doctor_id INT NOT NULL,
+    appointment_count INT NOT NULL DEFAULT 0,
+    completed_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, doctor_id)
+);
+
+CREATE TABLE IF NOT EXISTS reminder_log (
+    appointment_id INT NOT NULL,
+    kind VARCHAR(30) NOT NULL,
+    batch_id CHAR(16) NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (appointment_id, kind),
+    INDEX idx_reminder_log_batch (batch_id)
+);
+
+CREATE TABLE IF NOT EXISTS doctor_patient_summary (
+    doctor_id INT NOT NULL,
+    patient_id INT NOT NULL,
+    appointment_count INT NOT NULL DEFAULT 0,
+    last_appointment DATE,
+    last_visit DATE,
+    next_visit DATE,
+    PRIMARY KEY (doctor_id, patient_id),
+    INDEX idx_doctor_patient_summary_last_visit (doctor_id, last_visit),
+    INDEX idx_doctor_patient_summary_next_visit (doctor_id, next_visit),
+    INDEX idx_doctor_patient_summary_count (doctor_id, appointment_count)
+);
+
 -- Sample doctors
 INSERT INTO doctors (name, specialty, contact, email, license_number, experience, education, status) VALUES
 ('Dr. Sarah Smith', 'General Dentistry', '+1 234-567-8901', 'drsmith@dentalcare.com', 'MD123456', 8, 'DDS from Harvard Dental School', 'approved'),
 ('Dr. Mike Johnson', 'Orthodontics', '+1 234-567-8902', 'drjohnson@dentalcare.com', 'MD789012', 12, 'DDS from Stanford Dental School, Orthodontics Residency', 'approved'),
 ('Dr. Lisa Brown', 'Oral Surgery', '+1 234-567-8903', 'drbrown@dentalcare.com', 'MD345678', 15, 'DDS from UCLA Dental School, Oral Surgery Fellowship', 'approved');
 
+-- Sample chairs
+INSERT INTO chairs (name, status) VALUES
+('Chair 1', 'available'),
+('Chair 2', 'available'),
+('Chair 3', 'available');
+
 -- Sample patients
 INSERT INTO patients (name, age, gender, contact) VALUES
 ('Riya Sharma', 28, 'Female', '+1 234-567-8904'),
@@ -93,6 +181,17 @@ INSERT INTO appointments (patient_id, doctor_id, date, time, status) VALUES
 (2, 2, '2024-07-01', '10:00:00', 'completed'),
 (3, 3, '2024-07-01', '11:00:00', 'pending');
 
+-- Rollups for the sample appointments
+INSERT INTO doctor_daily_stats (day, doctor_id, appointment_count, completed_count) VALUES
+('2024-07-01', 1, 1, 0),
+('2024-07-01', 2, 1, 1),
+('2024-07-01', 3, 1, 0);
+
+INSERT INTO doctor_patient_summary (doctor_id, patient_id, appointment_count, last_appointment, last_visit, next_visit) VALUES
+(1, 1, 1, '2024-07-01', NULL, '2024-07-01'),
+(2, 2, 1, '2024-07-01', '2024-07-01', NULL),
+(3, 3, 1, '2024-07-01', NULL, '2024-07-01');
+
 -- Sample payments
 INSERT INTO payments (patient_id, amount, date, status) VALUES
 (1, 1500, '2024-07-01', 'paid'),
@@ -105,7 +204,7 @@ INSERT INTO notifications (patient_id, message, date, is_read) VALUES
 (2, 'Payment received for your last visit.', NOW(), 1),
 (3, 'Your next appointment is pending.', NOW(), 0);
 
--- Sample users (passwords are plain text for demo; use hashing in production)
+-- Sample users (plain text demo passwords; /api/login replaces each with an scrypt hash on first use)
 INSERT INTO users (username, password, role, patient_id, doctor_id) VALUES
 ('riya', 'password123', 'patient', 1, NULL),
 ('john', 'password123', 'patient', 2, NULL),
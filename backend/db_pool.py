@@ -0,0 +1,223 @@
+"""
+Shared database connection pool used by app.py and the maintenance scripts
+
+DB_BACKEND selects the engine: 'mysql' (default) or 'sqlite', the embedded
+engine in sqlite_db.py for hermetic local runs, tests and benchmarks.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+from pymysql.cursors import DictCursor
+
+import sqlite_db
+
+DB_BACKEND = os.environ.get('DB_BACKEND', 'mysql')
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', 'V1S21_pass_mysql'),
+    'db': os.environ.get('DB_NAME', 'dental_care'),
+    'cursorclass': DictCursor,
+}
+
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '10'))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '5'))
+# Connections older than this are closed and replaced on borrow
+POOL_RECYCLE = float(os.environ.get('DB_POOL_RECYCLE', '3600'))
+# Connections idle for longer than this are pinged before being handed out
+POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', '30'))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the pool timeout"""
+
+
+class PooledConnection:
+    """Proxy around a pymysql (or sqlite_db) connection whose close() returns it to the pool"""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._raw, self._created_at)
+
+    def discard(self):
+        """Close the underlying connection instead of returning it (e.g. mid-way through an unbuffered read)"""
+        if self._released:
+            return
+        self._pool._close_quietly(self._raw)
+        self.close()
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of database connections"""
+
+    def __init__(self, config=None, max_size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 recycle=POOL_RECYCLE, ping_after=POOL_PING_AFTER, backend=DB_BACKEND):
+        if backend not in ('mysql', 'sqlite'):
+            raise ValueError(f'Unknown DB_BACKEND: {backend!r}')
+        self.config = dict(config or DB_CONFIG)
+        self.backend = backend
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._cond = threading.Condition()
+        self._reset_state()
+
+    def _reset_state(self):
+        # Idle entries are (connection, created_at, returned_at); newest last
+        self._idle = deque()
+        self._in_use = 0
+        self._pid = os.getpid()
+        self._metrics = {
+            'created': 0,
+            'recycled': 0,
+            'discarded': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def _connect(self):
+        if self.backend == 'sqlite':
+            return sqlite_db.connect()
+        return pymysql.connect(**self.config)
+
+    def _check_fork(self):
+        # Connections must not be shared with a forked worker (e.g. gunicorn --preload)
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def _close_quietly(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _usable(self, raw, created_at, returned_at):
+        now = time.monotonic()
+        if now - created_at > self.recycle:
+            self._metrics['recycled'] += 1
+            return False
+        if now - returned_at > self.ping_after:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                self._metrics['discarded'] += 1
+                return False
+        return True
+
+    def acquire(self, timeout=None):
+        """Borrow a connection, waiting up to `timeout` seconds for one to free up"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        waited = False
+        with self._cond:
+            self._check_fork()
+            while True:
+                while self._idle:
+                    raw, created_at, returned_at = self._idle.pop()
+                    if self._usable(raw, created_at, returned_at):
+                        self._in_use += 1
+                        self._record_wait(started, waited)
+                        return PooledConnection(self, raw, created_at)
+                    self._close_quietly(raw)
+                if self._in_use < self.max_size:
+                    # Reserve the slot before connecting outside the lock
+                    self._in_use += 1
+                    break
+                remaining = timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._metrics['timeouts'] += 1
+                    raise PoolTimeout(f'No database connection available after {timeout}s')
+                waited = True
+                self._cond.wait(remaining)
+        try:
+            raw = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._metrics['created'] += 1
+            self._record_wait(started, waited)
+        return PooledConnection(self, raw, time.monotonic())
+
+    def _record_wait(self, started, waited):
+        if not waited:
+            return
+        elapsed = time.monotonic() - started
+        self._metrics['waits'] += 1
+        self._metrics['wait_time_total'] += elapsed
+        self._metrics['wait_time_max'] = max(self._metrics['wait_time_max'], elapsed)
+
+    def _release(self, raw, created_at):
+        healthy = raw.open
+        if healthy and raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            # Drop uncommitted work and the read snapshot before reuse
+            try:
+                raw.rollback()
+            except Exception:
+                healthy = False
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((raw, created_at, time.monotonic()))
+            else:
+                self._metrics['discarded'] += 1
+                self._close_quietly(raw)
+            self._cond.notify()
+
+    def stats(self):
+        """Snapshot of pool usage for health checks and monitoring"""
+        with self._cond:
+            metrics = dict(self._metrics)
+            metrics.update({
+                'backend': self.backend,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+            })
+        waits = metrics['waits']
+        metrics['wait_time_avg'] = metrics['wait_time_total'] / waits if waits else 0.0
+        return metrics
+
+    def close_all(self):
+        """Close every idle connection (borrowed ones close when returned)"""
+        with self._cond:
+            while self._idle:
+                raw, _, _ = self._idle.pop()
+                self._close_quietly(raw)
+
+
+pool = ConnectionPool()
+
+
+def get_db_connection():
+    return pool.acquire()
@@ -0,0 +1,173 @@
+"""
+In-process publish/subscribe for per-patient Server-Sent Events
+
+Every patient channel keeps its last EVENT_BUFFER_SIZE events in a ring
+buffer, so a client reconnecting with Last-Event-ID gets what it missed.
+Event ids are '<boot>-<seq>': an id from before a restart, or one that has
+already dropped out of the buffer, gets a 'resync' event telling the client
+to refetch over the REST endpoints instead. Events only reach subscribers
+connected to the process that published them.
+"""
+
+import itertools
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+
+EVENT_BUFFER_SIZE = int(os.environ.get('EVENT_BUFFER_SIZE', '100'))
+MAX_CHANNELS = int(os.environ.get('EVENT_MAX_CHANNELS', '10000'))
+MAX_SUBSCRIBERS = int(os.environ.get('EVENT_MAX_SUBSCRIBERS', '200'))
+HEARTBEAT_SECONDS = float(os.environ.get('EVENT_HEARTBEAT_SECONDS', '15'))
+# Streams are closed after this long; browsers reconnect with Last-Event-ID
+STREAM_MAX_SECONDS = float(os.environ.get('EVENT_STREAM_MAX_SECONDS', '300'))
+RETRY_MS = 3000
+# Lifetime of the ?token= an EventSource connects with; outlives a few reconnects
+EVENT_TOKEN_TTL = int(os.environ.get('EVENT_TOKEN_TTL', '3600'))
+
+
+class TooManySubscribers(Exception):
+    """Raised when MAX_SUBSCRIBERS streams are already open"""
+
+
+class _Subscription:
+    """One subscriber's started stream; the WSGI server's close() ends it"""
+
+    def __init__(self, first, stream):
+        self._first = [first]
+        self._stream = stream
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._first:
+            return self._first.pop()
+        return next(self._stream)
+
+    def close(self):
+        self._stream.close()
+
+
+class _Channel:
+    __slots__ = ('events', 'dropped_seq', 'subscribers')
+
+    def __init__(self):
+        self.events = deque(maxlen=EVENT_BUFFER_SIZE)   # (seq, event, data)
+        self.dropped_seq = 0    # highest seq that fell out of the buffer
+        self.subscribers = 0
+
+
+class EventBroker:
+    def __init__(self, max_channels=MAX_CHANNELS, max_subscribers=MAX_SUBSCRIBERS):
+        self.boot = secrets.token_hex(4)
+        self.max_channels = max_channels
+        self.max_subscribers = max_subscribers
+        self._seq = itertools.count(1)
+        self._channels = OrderedDict()
+        self._cond = threading.Condition()
+        self._subscribers = 0
+        self._published = 0
+        self._evicted_seq = 0   # newest seq of any channel forgotten so far
+
+    def _channel(self, key):
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = _Channel()
+            # The channel may have existed before being evicted; resuming from
+            # before that point cannot be trusted
+            channel.dropped_seq = self._evicted_seq
+            # Forget the least recently used channels nobody is listening to
+            while len(self._channels) > self.max_channels:
+                oldest = next((k for k, c in self._channels.items() if not c.subscribers), None)
+                if oldest is None:
+                    break
+                evicted = self._channels.pop(oldest)
+                newest = evicted.events[-1][0] if evicted.events else evicted.dropped_seq
+                self._evicted_seq = max(self._evicted_seq, newest)
+        self._channels.move_to_end(key)
+        return channel
+
+    def publish(self, patient_id, event, data):
+        """Queue an event for a patient's subscribers; returns its id"""
+        with self._cond:
+            channel = self._channel(int(patient_id))
+            seq = next(self._seq)
+            if len(channel.events) == channel.events.maxlen:
+                channel.dropped_seq = channel.events[0][0]
+            channel.events.append((seq, event, data))
+            self._published += 1
+            self._cond.notify_all()
+        return f'{self.boot}-{seq}'
+
+    def _parse_last_id(self, last_event_id):
+        """Sequence number to resume after, or None when the id cannot be resumed from"""
+        if not last_event_id:
+            return 0
+        boot, _, seq = last_event_id.partition('-')
+        if boot != self.boot or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def stream(self, patient_id, last_event_id=None, heartbeat=HEARTBEAT_SECONDS, max_seconds=STREAM_MAX_SECONDS):
+        """Iterator of SSE-formatted strings for one subscriber
+
+        The subscriber slot is taken here, together with the limit check, and
+        given back when the iterator is exhausted or closed.
+        """
+        key = int(patient_id)
+        last_seq = self._parse_last_id(last_event_id)
+        with self._cond:
+            if self._subscribers >= self.max_subscribers:
+                raise TooManySubscribers('Too many open event streams')
+            self._subscribers += 1
+            channel = self._channel(key)
+            channel.subscribers += 1
+            resync = last_seq is None or (last_seq and last_seq < channel.dropped_seq)
+            if not last_seq:
+                # A fresh subscriber starts from now, not from the buffered history;
+                # taken here so nothing published before the first read is skipped
+                last_seq = channel.events[-1][0] if channel.events else 0
+        stream = self._stream(channel, last_seq, resync, heartbeat, max_seconds)
+        # Run up to the first yield so closing (or collecting) the generator releases the slot
+        return _Subscription(next(stream), stream)
+
+    def _stream(self, channel, last_seq, resync, heartbeat, max_seconds):
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            if resync:
+                yield self._format(None, 'resync', {'reason': 'missed events'})
+            deadline = time.monotonic() + max_seconds
+            while time.monotonic() < deadline:
+                with self._cond:
+                    pending = [e for e in channel.events if e[0] > last_seq]
+                    if not pending:
+                        self._cond.wait(min(heartbeat, max(deadline - time.monotonic(), 0)))
+                        pending = [e for e in channel.events if e[0] > last_seq]
+                if pending:
+                    for seq, event, data in pending:
+                        yield self._format(f'{self.boot}-{seq}', event, data)
+                    last_seq = pending[-1][0]
+                else:
+                    yield ': keep-alive\n\n'
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+                channel.subscribers -= 1
+
+    def _format(self, event_id, event, data):
+        lines = []
+        if event_id:
+            lines.append(f'id: {event_id}')
+        lines.append(f'event: {event}')
+        lines.append(f'data: {json.dumps(data, default=str)}')
+        return '\n'.join(lines) + '\n\n'
+
+    def stats(self):
+        with self._cond:
+            return {'subscribers': self._subscribers, 'channels': len(self._channels), 'published': self._published}
+
+
+broker = EventBroker()
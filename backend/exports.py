@@ -0,0 +1,160 @@
+"""
+Streaming CSV / JSON Lines exports
+
+Rows are read with an unbuffered SSDictCursor and written out in small
+batches as they arrive, so memory use does not depend on the table size.
+The connection belongs to the generator until the last row is sent; if the
+client goes away mid-stream the connection is discarded rather than
+returned to the pool with an unread result set.
+"""
+
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import date, timedelta
+
+from pymysql.cursors import SSDictCursor
+
+from serializers import serialize_row
+
+EXPORT_FLUSH_BYTES = int(os.environ.get('EXPORT_FLUSH_BYTES', '65536'))
+# Seconds MySQL waits on a slow client before aborting the unbuffered read
+EXPORT_NET_WRITE_TIMEOUT = int(os.environ.get('EXPORT_NET_WRITE_TIMEOUT', '600'))
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+EXPORTS = {
+    'appointments': {
+        'query': '''
+            SELECT a.id, a.patient_id, p.name AS patient_name, a.doctor_id, d.name AS doctor_name,
+                   a.chair_id, a.date, a.time, a.status, a.priority, a.type
+            FROM appointments a
+            LEFT JOIN patients p ON a.patient_id = p.id
+            LEFT JOIN doctors d ON a.doctor_id = d.id
+        ''',
+        'date_column': 'a.date',
+        'filters': {'patient_id': 'a.patient_id', 'doctor_id': 'a.doctor_id', 'status': 'a.status'},
+        'order': 'a.date, a.time, a.id',
+    },
+    'payments': {
+        'query': 'SELECT id, patient_id, amount, date, status FROM payments',
+        'date_column': 'date',
+        'filters': {'patient_id': 'patient_id', 'status': 'status'},
+        'order': 'date, id',
+    },
+    'treatment_notes': {
+        'query': '''
+            SELECT tn.id, tn.doctor_id, d.name AS doctor_name, tn.patient_id, p.name AS patient_name,
+                   tn.diagnosis, tn.treatment_plan, tn.notes, tn.created_at
+            FROM treatment_notes tn
+            LEFT JOIN patients p ON tn.patient_id = p.id
+            LEFT JOIN doctors d ON tn.doctor_id = d.id
+        ''',
+        'date_column': 'tn.created_at',
+        'datetime': True,
+        'filters': {'patient_id': 'tn.patient_id', 'doctor_id': 'tn.doctor_id'},
+        'order': 'tn.created_at, tn.id',
+    },
+}
+
+
+def build_query(name, args):
+    """SQL and params for an export; raises ValueError for bad filter values"""
+    spec = EXPORTS[name]
+    conditions = []
+    params = []
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+    try:
+        date_from = date.fromisoformat(date_from) if date_from else None
+        date_to = date.fromisoformat(date_to) if date_to else None
+    except ValueError:
+        raise ValueError('date_from and date_to must be YYYY-MM-DD')
+    if date_from:
+        conditions.append(f"{spec['date_column']} >= %s")
+        params.append(date_from)
+    if date_to:
+        if spec.get('datetime'):
+            # Whole last day, still a plain range on the indexed column
+            conditions.append(f"{spec['date_column']} < %s")
+            params.append(date_to + timedelta(days=1))
+        else:
+            conditions.append(f"{spec['date_column']} <= %s")
+            params.append(date_to)
+    for arg, column in spec['filters'].items():
+        if args.get(arg):
+            conditions.append(f'{column} = %s')
+            params.append(args[arg])
+    sql = spec['query']
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += f" ORDER BY {spec['order']}"
+    return sql, params
+
+
+def open_export(conn, name, args):
+    """Run the export query on an unbuffered cursor; rows are fetched while streaming"""
+    sql, params = build_query(name, args)
+    cursor = conn.cursor(SSDictCursor)
+    cursor.execute('SET SESSION net_write_timeout = %s', (EXPORT_NET_WRITE_TIMEOUT,))
+    cursor.execute(sql, params)
+    return cursor
+
+
+def _csv_chunks(cursor):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column[0] for column in cursor.description])
+    for row in cursor:
+        serialize_row(row)
+        writer.writerow(['' if value is None else value for value in row.values()])
+        if buffer.tell() >= EXPORT_FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _jsonl_chunks(cursor):
+    lines = []
+    size = 0
+    for row in cursor:
+        line = json.dumps(serialize_row(row), default=str)
+        lines.append(line)
+        size += len(line) + 1
+        if size >= EXPORT_FLUSH_BYTES:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+            size = 0
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def stream_export(conn, cursor, fmt, compress=False):
+    """Yield encoded export chunks, then hand the connection back to the pool"""
+    finished = False
+    try:
+        chunks = _csv_chunks(cursor) if fmt == 'csv' else _jsonl_chunks(cursor)
+        compressor = zlib.compressobj(wbits=31) if compress else None  # gzip container
+        for chunk in chunks:
+            data = chunk.encode('utf-8')
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+        if compressor:
+            yield compressor.flush()
+        cursor.close()
+        with conn.cursor() as reset:
+            reset.execute('SET SESSION net_write_timeout = DEFAULT')
+        finished = True
+    finally:
+        if finished:
+            conn.close()
+        else:
+            conn.discard()
@@ -0,0 +1,43 @@
+"""
+Flask JSON provider that encodes MySQL row types directly
+
+date, datetime, time, timedelta and Decimal values are converted with the
+same rules as serializers.py, so handlers can return raw cursor rows.
+When orjson is installed it is used for encoding and decoding.
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+from serializers import CONVERTERS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_default(value):
+    converter = CONVERTERS.get(type(value))
+    if converter:
+        return converter(value)
+    return DefaultJSONProvider.default(value)
+
+
+if orjson is not None:
+    # Route date/time types through encode_default so both encoders agree on format
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+
+
+class RowJSONProvider(DefaultJSONProvider):
+    default = staticmethod(encode_default)
+
+    def dumps(self, obj, **kwargs):
+        # Pretty-printed output (debug mode) still goes through the stdlib encoder
+        if orjson is None or kwargs.get('indent'):
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=encode_default, option=ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
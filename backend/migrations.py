@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for the dental_care database
+
+Every step checks information_schema before changing anything, so the
+migrations can be applied to a database created from create_tables.sql,
+by /api/init-db, or by hand. Usage:
+
+    python migrations.py migrate   # apply pending versions
+    python migrations.py verify    # check every expected table/column/index
+    python migrations.py explain   # EXPLAIN the hot app.py queries, flag full scans
+"""
+
+import sys
+
+from db_pool import get_db_connection
+
+# Steps are ('table', name, ddl), ('column', table, column, definition),
+# ('index', table, index_name, columns[, 'unique' | 'fulltext']), ('drop_index', table, index_name)
+# or ('sql', label, statement).
+# 'sql' steps are data backfills: they run once, when their version is applied.
+MIGRATIONS = [
+    (1, 'chairs, smart_notifications and appointment scheduling columns', [
+        ('table', 'chairs', '''
+            CREATE TABLE chairs (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(50),
+                status VARCHAR(20) DEFAULT 'available'
+            )
+        '''),
+        ('table', 'smart_notifications', '''
+            CREATE TABLE smart_notifications (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                patient_id INT,
+                type VARCHAR(50),
+                title VARCHAR(200),
+                message TEXT,
+                timestamp DATETIME,
+                `read` BOOLEAN DEFAULT 0,
+                action_required BOOLEAN DEFAULT 0,
+                FOREIGN KEY (patient_id) REFERENCES patients(id)
+            )
+        '''),
+        ('column', 'appointments', 'chair_id', 'INT NULL'),
+        ('column', 'appointments', 'priority', "VARCHAR(20) NULL"),
+        ('column', 'appointments', 'type', "VARCHAR(50) NULL"),
+    ]),
+    (2, 'secondary indexes for the hot query shapes', [
+        ('index', 'appointments', 'idx_appointments_doctor_date_time', ['doctor_id', 'date', 'time']),
+        ('index', 'appointments', 'idx_appointments_patient', ['patient_id']),
+        ('index', 'appointments', 'idx_appointments_chair_date', ['chair_id', 'date']),
+        ('index', 'appointments', 'idx_appointments_date_time', ['date', 'time', 'id']),
+        ('index', 'doctors', 'idx_doctors_status_created', ['status', 'created_at']),
+        ('index', 'treatment_notes', 'idx_treatment_notes_doctor_created', ['doctor_id', 'created_at']),
+        ('index', 'treatment_notes', 'idx_treatment_notes_patient_created', ['patient_id', 'created_at']),
+        ('index', 'payments', 'idx_payments_patient', ['patient_id']),
+        ('index', 'users', 'idx_users_username_password', ['username', 'password']),
+        ('index', 'notifications', 'idx_notifications_patient', ['patient_id']),
+        ('index', 'smart_notifications', 'idx_smart_notifications_patient_ts', ['patient_id', 'timestamp']),
+    ]),
+    (3, 'daily chair and doctor productivity rollups', [
+        ('table', 'chair_daily_stats', '''
+            CREATE TABLE chair_daily_stats (
+                day DATE NOT NULL,
+                chair_id INT NOT NULL,
+                appointment_count INT NOT NULL DEFAULT 0,
+                completed_count INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, chair_id)
+            )
+        '''),
+        ('table', 'doctor_daily_stats', '''
+            CREATE TABLE doctor_daily_stats (
+                day DATE NOT NULL,
+                doctor_id INT NOT NULL,
+                appointment_count INT NOT NULL DEFAULT 0,
+                completed_count INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, doctor_id)
+            )
+        '''),
+        ('sql', 'backfill chair_daily_stats', '''
+            INSERT INTO chair_daily_stats (day, chair_id, appointment_count, completed_count)
+            SELECT date, chair_id, COUNT(*), COUNT(CASE WHEN status = 'completed' THEN 1 END)
+            FROM appointments
+            WHERE chair_id IS NOT NULL AND date IS NOT NULL
+            GROUP BY date, chair_id
+            ON DUPLICATE KEY UPDATE appointment_count = VALUES(appointment_count),
+                                    completed_count = VALUES(completed_count)
+        '''),
+        ('sql', 'backfill doctor_daily_stats', '''
+            INSERT INTO doctor_daily_stats (day, doctor_id, appointment_count, completed_count)
+            SELECT date, doctor_id, COUNT(*), COUNT(CASE WHEN status = 'completed' THEN 1 END)
+            FROM appointments
+            WHERE doctor_id IS NOT NULL AND date IS NOT NULL
+            GROUP BY date, doctor_id
+            ON DUPLICATE KEY UPDATE appointment_count = VALUES(appointment_count),
+                                    completed_count = VALUES(completed_count)
+        '''),
+    ]),
+    # Fails if the table already holds double bookings; resolve those first
+    (4, 'unique active doctor and chair slots', [
+        ('column', 'appointments', 'active_slot',
+         "TINYINT AS (CASE WHEN status = 'cancelled' THEN NULL ELSE 1 END) STORED"),
+        ('index', 'appointments', 'uq_appointments_doctor_slot', ['doctor_id', 'date', 'time', 'active_slot'], 'unique'),
+        ('index', 'appointments', 'uq_appointments_chair_slot', ['chair_id', 'date', 'time', 'active_slot'], 'unique'),
+    ]),
+    (5, 'per-patient notification pages and unread counts', [
+        ('index', 'notifications', 'idx_notifications_patient_date', ['patient_id', 'date', 'id']),
+        ('index', 'notifications', 'idx_notifications_patient_read', ['patient_id', 'is_read']),
+        ('index', 'smart_notifications', 'idx_smart_notifications_patient_read', ['patient_id', 'read']),
+    ]),
+    (6, 'appointment reminder log', [
+        ('table', 'reminder_log', '''
+            CREATE TABLE reminder_log (
+                appointment_id INT NOT NULL,
+                kind VARCHAR(30) NOT NULL,
+                batch_id CHAR(16) NOT NULL,
+                created_at DATETIME NOT NULL,
+                PRIMARY KEY (appointment_id, kind),
+                INDEX idx_reminder_log_batch (batch_id)
+            )
+        '''),
+    ]),
+    # Building the index copies the table; run it off-peak on large databases
+    (7, 'full-text search over treatment notes', [
+        ('index', 'treatment_notes', 'ft_treatment_notes_text', ['diagnosis', 'treatment_plan', 'notes'], 'fulltext'),
+    ]),
+    (8, 'per-doctor patient summary', [
+        ('table', 'doctor_patient_summary', '''
+            CREATE TABLE doctor_patient_summary (
+                doctor_id INT NOT NULL,
+                patient_id INT NOT NULL,
+                appointment_count INT NOT NULL DEFAULT 0,
+                last_appointment DATE,
+                last_visit DATE,
+                next_visit DATE,
+                PRIMARY KEY (doctor_id, patient_id),
+                INDEX idx_doctor_patient_summary_last_visit (doctor_id, last_visit),
+                INDEX idx_doctor_patient_summary_next_visit (doctor_id, next_visit),
+                INDEX idx_doctor_patient_summary_count (doctor_id, appointment_count)
+            )
+        '''),
+        ('sql', 'backfill doctor_patient_summary', '''
+            INSERT INTO doctor_patient_summary
+                (doctor_id, patient_id, appointment_count, last_appointment, last_visit, next_visit)
+            SELECT doctor_id, patient_id, COUNT(*), MAX(date),
+                   MAX(CASE WHEN status = 'completed' THEN date END),
+                   MIN(CASE WHEN status IN ('scheduled', 'pending', 'confirmed', 'urgent') THEN date END)
+            FROM appointments
+            WHERE doctor_id IS NOT NULL AND patient_id IS NOT NULL
+            GROUP BY doctor_id, patient_id
+            ON DUPLICATE KEY UPDATE appointment_count = VALUES(appointment_count),
+                                    last_appointment = VALUES(last_appointment),
+                                    last_visit = VALUES(last_visit),
+                                    next_visit = VALUES(next_visit)
+        '''),
+    ]),
+    (9, 'drop the username/password index left unused by hashed logins', [
+        ('drop_index', 'users', 'idx_users_username_password'),
+    ]),
+    (10, 'import keys for reading back bulk-registered profile ids', [
+        ('column', 'doctors', 'import_key', 'VARCHAR(40) NULL'),
+        ('column', 'patients', 'import_key', 'VARCHAR(40) NULL'),
+        ('index', 'doctors', 'idx_doctors_import_key', ['import_key']),
+        ('index', 'patients', 'idx_patients_import_key', ['import_key']),
+    ]),
+]
+
+# Representative queries from app.py that are expected to use an index
+EXPLAIN_QUERIES = [
+    ('appointments by patient',
+     'SELECT a.*, d.name FROM appointments a LEFT JOIN doctors d ON a.doctor_id = d.id WHERE a.patient_id = %s',
+     (1,)),
+    ('appointments page',
+     'SELECT a.* FROM appointments a WHERE a.date >= %s ORDER BY a.date, a.time, a.id LIMIT 50',
+     ('2024-07-01',)),
+    ('doctor appointments',
+     'SELECT a.*, p.name FROM appointments a JOIN patients p ON a.patient_id = p.id '
+     'WHERE a.doctor_id = %s ORDER BY a.date DESC, a.time ASC',
+     (1,)),
+    ('doctor appointments today',
+     'SELECT a.* FROM appointments a WHERE a.doctor_id = %s AND a.date = CURDATE() ORDER BY a.time',
+     (1,)),
+    ('chair utilization',
+     'SELECT c.id, COUNT(a.id) FROM chairs c LEFT JOIN appointments a ON c.id = a.chair_id AND a.date = CURDATE() GROUP BY c.id',
+     ()),
+    ('pending doctors',
+     "SELECT d.* FROM doctors d WHERE d.status = 'pending_approval' ORDER BY d.created_at DESC",
+     ()),
+    ('treatment notes by doctor',
+     'SELECT tn.* FROM treatment_notes tn WHERE tn.doctor_id = %s ORDER BY tn.created_at DESC',
+     (1,)),
+    ('treatment notes by patient',
+     'SELECT tn.* FROM treatment_notes tn WHERE tn.patient_id = %s ORDER BY tn.created_at DESC',
+     (1,)),
+    ('payments by patient', 'SELECT * FROM payments WHERE patient_id = %s', (1,)),
+    ('login', 'SELECT * FROM users WHERE username = %s', ('riya',)),
+    ('notifications page',
+     'SELECT * FROM notifications WHERE patient_id = %s ORDER BY date DESC, id DESC LIMIT 20',
+     (1,)),
+    ('unread notifications', 'SELECT COUNT(*) FROM notifications WHERE patient_id = %s AND is_read = 0', (1,)),
+    ('smart notifications by patient',
+     'SELECT * FROM smart_notifications WHERE patient_id = %s ORDER BY timestamp DESC',
+     (1,)),
+    ('treatment note search',
+     'SELECT id, MATCH (diagnosis, treatment_plan, notes) AGAINST (%s) AS score FROM treatment_notes '
+     'WHERE MATCH (diagnosis, treatment_plan, notes) AGAINST (%s) ORDER BY score DESC, id DESC LIMIT 20',
+     ('wisdom tooth', 'wisdom tooth')),
+    ('due reminders',
+     'SELECT a.id FROM appointments a LEFT JOIN reminder_log r ON r.appointment_id = a.id AND r.kind = %s '
+     'WHERE a.date >= %s AND a.date <= %s AND r.appointment_id IS NULL ORDER BY a.date, a.time, a.id LIMIT 1000',
+     ('upcoming', '2024-07-01', '2024-07-02')),
+    ('doctor patients by next visit',
+     'SELECT s.*, p.name FROM doctor_patient_summary s JOIN patients p ON p.id = s.patient_id '
+     'WHERE s.doctor_id = %s ORDER BY s.next_visit, s.patient_id LIMIT 50',
+     (1,)),
+]
+
+
+def _table_exists(cursor, table):
+    cursor.execute('''
+        SELECT 1 AS found FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s
+    ''', (table,))
+    return cursor.fetchone() is not None
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute('''
+        SELECT 1 AS found FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    ''', (table, column))
+    return cursor.fetchone() is not None
+
+
+def _index_columns(cursor, table):
+    """Map of index name -> ordered column list for a table"""
+    cursor.execute('''
+        SELECT index_name AS index_name, column_name AS column_name
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        ORDER BY index_name, seq_in_index
+    ''', (table,))
+    indexes = {}
+    for row in cursor.fetchall():
+        indexes.setdefault(row['index_name'], []).append(row['column_name'].lower())
+    return indexes
+
+
+def _index_satisfied(cursor, table, columns, exact=False):
+    # Any index whose leading columns match is good enough (e.g. the implicit
+    # index InnoDB creates for a foreign key), which avoids duplicate indexes.
+    # Unique and full-text indexes have to cover exactly the wanted columns.
+    wanted = [c.lower() for c in columns]
+    for existing in _index_columns(cursor, table).values():
+        if existing[:len(wanted)] == wanted and (not exact or existing == wanted):
+            return True
+    return False
+
+
+def _step_done(cursor, step):
+    kind = step[0]
+    if kind == 'table':
+        return _table_exists(cursor, step[1])
+    if kind == 'column':
+        return _column_exists(cursor, step[1], step[2])
+    if kind == 'index':
+        return _index_satisfied(cursor, step[1], step[3], exact=bool({'unique', 'fulltext'} & set(step[4:])))
+    if kind == 'drop_index':
+        return step[2] not in _index_columns(cursor, step[1])
+    if kind == 'sql':
+        return False
+    raise ValueError(f'Unknown migration step: {kind}')
+
+
+def _apply_step(cursor, step):
+    kind = step[0]
+    if kind in ('table', 'sql'):
+        cursor.execute(step[2])
+    elif kind == 'column':
+        cursor.execute(f'ALTER TABLE {step[1]} ADD COLUMN `{step[2]}` {step[3]}')
+    elif kind == 'index':
+        index_type = 'UNIQUE ' if 'unique' in step[4:] else 'FULLTEXT ' if 'fulltext' in step[4:] else ''
+        columns = ', '.join(f'`{c}`' for c in step[3])
+        cursor.execute(f'CREATE {index_type}INDEX {step[2]} ON {step[1]} ({columns})')
+    elif kind == 'drop_index':
+        cursor.execute(f'DROP INDEX {step[2]} ON {step[1]}')
+
+
+def _describe(step):
+    if step[0] == 'table':
+        return f'table {step[1]}'
+    if step[0] == 'drop_index':
+        return f'removal of index {step[1]}.{step[2]}'
+    return f'{step[0]} {step[1]}.{step[2]}'
+
+
+def _ensure_version_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(200),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def applied_versions(cursor):
+    _ensure_version_table(cursor)
+    cursor.execute('SELECT version FROM schema_migrations')
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def run_migrations(conn):
+    """Apply every pending migration; returns the list of versions applied"""
+    applied = []
+    with conn.cursor() as cursor:
+        done = applied_versions(cursor)
+        for version, description, steps in MIGRATIONS:
+            if version in done:
+                continue
+            for step in steps:
+                if not _step_done(cursor, step):
+                    _apply_step(cursor, step)
+            cursor.execute('INSERT INTO schema_migrations (version, description) VALUES (%s, %s)',
+                           (version, description))
+            conn.commit()
+            applied.append(version)
+    return applied
+
+
+def verify_schema(conn):
+    """List of human-readable problems; empty when every step is in place"""
+    problems = []
+    # Indexes a later version drops are not expected to be there
+    dropped = {(step[1], step[2]) for _, _, steps in MIGRATIONS for step in steps if step[0] == 'drop_index'}
+    with conn.cursor() as cursor:
+        for version, _, steps in MIGRATIONS:
+            for step in steps:
+                if step[0] == 'index' and (step[1], step[2]) in dropped:
+                    continue
+                if step[0] != 'sql' and not _step_done(cursor, step):
+                    problems.append(f'v{version}: missing {_describe(step)}')
+    return problems
+
+
+def explain_full_scans(conn):
+    """EXPLAIN each hot query and return (label, table) pairs that scan the whole table
+
+    Run it against realistically sized data: on a handful of seed rows the
+    optimizer may legitimately prefer a scan over an available index.
+    """
+    flagged = []
+    with conn.cursor() as cursor:
+        for label, query, params in EXPLAIN_QUERIES:
+            cursor.execute('EXPLAIN ' + query, params)
+            for row in cursor.fetchall():
+                if row.get('type') == 'ALL':
+                    flagged.append((label, row.get('table')))
+    return flagged
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else 'migrate'
+    conn = get_db_connection()
+    try:
+        if command == 'migrate':
+            applied = run_migrations(conn)
+            if applied:
+                print(f"✅ Applied migrations: {', '.join(str(v) for v in applied)}")
+            else:
+                print("ℹ️ Schema already up to date")
+        elif command == 'verify':
+            problems = verify_schema(conn)
+            for problem in problems:
+                print(f"❌ {problem}")
+            if problems:
+                return 1
+            print("✅ All expected tables, columns and indexes are present")
+        elif command == 'explain':
+            flagged = explain_full_scans(conn)
+            for label, table in flagged:
+                print(f"⚠️  Full table scan on {table} in '{label}'")
+            if flagged:
+                return 1
+            print("✅ No full table scans in the checked queries")
+        else:
+            print(__doc__)
+            return 2
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,158 @@
+"""
+Password hashing with scrypt on a bounded worker pool
+
+Hashes are stored as 'scrypt$n$r$p$salt$hash' (base64 salt and hash).
+Rows still holding a plaintext password are accepted once and rehashed by
+the login handler. hashlib.scrypt releases the GIL, so a small thread pool
+keeps the CPU work off the request threads' critical path; the number of
+queued jobs is bounded so a login burst is answered with 503s instead of
+piling up behind the workers.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+SCRYPT_N = int(os.environ.get('SCRYPT_N', str(2 ** 14)))
+SCRYPT_R = int(os.environ.get('SCRYPT_R', '8'))
+SCRYPT_P = int(os.environ.get('SCRYPT_P', '1'))
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Jobs allowed to wait for a worker, on top of the ones running
+HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE', '64'))
+HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', '10'))
+
+PREFIX = 'scrypt$'
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full or a job does not finish within the timeout"""
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(PREFIX)
+
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                            maxmem=256 * n * r + 1024 * 1024, dklen=HASH_BYTES)
+    return '$'.join(['scrypt', str(n), str(r), str(p),
+                     base64.b64encode(salt).decode(), base64.b64encode(digest).decode()])
+
+
+def verify_password(password, stored):
+    """(matches, needs_rehash) for a password against a stored hash or legacy plaintext"""
+    if not stored:
+        return False, False
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8')), True
+    try:
+        _, n, r, p, salt, expected = stored.split('$')
+        n, r, p = int(n), int(r), int(p)
+        salt = base64.b64decode(salt)
+        expected = base64.b64decode(expected)
+    except ValueError:
+        return False, False
+    digest = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                            maxmem=256 * n * r + 1024 * 1024, dklen=len(expected))
+    matches = hmac.compare_digest(digest, expected)
+    return matches, matches and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+class PasswordHasher:
+    """Runs hash/verify jobs on a fixed thread pool with a bounded queue"""
+
+    def __init__(self, workers=HASH_WORKERS, queue_limit=HASH_QUEUE_LIMIT, timeout=HASH_TIMEOUT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._metrics = {
+            'completed': 0,
+            'rejected': 0,
+            'max_pending': 0,
+            'queue_wait_total': 0.0,
+            'run_time_total': 0.0,
+        }
+        # Verified against when the username does not exist, so both cases cost the same
+        self._dummy_hash = None
+
+    def _run(self, fn, args, submitted_at):
+        started = time.monotonic()
+        with self._lock:
+            self._running += 1
+            self._metrics['queue_wait_total'] += started - submitted_at
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+                self._metrics['completed'] += 1
+                self._metrics['run_time_total'] += time.monotonic() - started
+            self._slots.release()
+
+    def _submit(self, fn, args, wait=False):
+        acquired = self._slots.acquire(timeout=self.timeout) if wait else self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                self._metrics['rejected'] += 1
+            raise HasherBusy('Too many concurrent password operations, retry shortly')
+        with self._lock:
+            self._pending += 1
+            self._metrics['max_pending'] = max(self._metrics['max_pending'], self._pending)
+        return self._executor.submit(self._run, fn, args, time.monotonic())
+
+    def _result(self, future):
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            raise HasherBusy('Password operation timed out, retry shortly') from None
+
+    def hash(self, password):
+        return self._result(self._submit(hash_password, (password,)))
+
+    def hash_many(self, passwords):
+        """Hash a batch, keeping at most `workers` jobs in flight so logins are not starved"""
+        results = []
+        for start in range(0, len(passwords), self.workers):
+            futures = [self._submit(hash_password, (password,), wait=True) for password in passwords[start:start + self.workers]]
+            results.extend(self._result(future) for future in futures)
+        return results
+
+    def verify(self, password, stored):
+        """(matches, needs_rehash); unknown users (stored None) are checked against a dummy hash"""
+        if stored is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = hash_password(os.urandom(16).hex())
+            self._result(self._submit(verify_password, (password, self._dummy_hash)))
+            return False, False
+        return self._result(self._submit(verify_password, (password, stored)))
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics.update({
+                'workers': self.workers,
+                'queue_limit': self.queue_limit,
+                'running': self._running,
+                'queued': self._pending - self._running,
+            })
+        completed = metrics['completed']
+        metrics['queue_wait_avg'] = metrics['queue_wait_total'] / completed if completed else 0.0
+        metrics['run_time_avg'] = metrics['run_time_total'] / completed if completed else 0.0
+        return metrics
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,287 @@
+"""
+In-memory typeahead index over patient names and contact numbers
+
+Every name word and the contact's digits (whole, and the last four) are
+kept as one sorted list of keys with a parallel array of patient ids, so a
+prefix lookup is one bisect plus a short scan. When an exact prefix finds
+fewer than `limit` patients, the word being typed is retried with every
+one-edit variant (deletion, substitution, transposition, insertion), each
+again a bisect on the same list. The first search starts building the index
+on a background thread with keyset-paged reads; new patients are added by
+the write handlers and rows inserted by other processes are picked up with
+an `id > last seen` query every PATIENT_INDEX_REFRESH seconds. While the
+index is building, or once it holds PATIENT_INDEX_MAX patients, search()
+returns None and callers fall back to SQL.
+"""
+
+import heapq
+import os
+import re
+import string
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from app_logging import get_logger
+
+PATIENT_INDEX_MAX = int(os.environ.get('PATIENT_INDEX_MAX', '1000000'))
+PATIENT_INDEX_REFRESH = float(os.environ.get('PATIENT_INDEX_REFRESH', '30'))
+LOAD_PAGE_SIZE = 50000
+# Each key inserted on its own shifts the key list; larger batches are merged in one pass
+MERGE_THRESHOLD = 1000
+# Keys ranked per query; bounds the cost of one-letter queries
+SCAN_LIMIT = 500
+FUZZY_SCAN_LIMIT = 50
+FUZZY_MIN_LENGTH = 3
+
+_NON_WORD = re.compile(r'[^a-z0-9 ]+')
+_NON_DIGIT = re.compile(r'\D')
+
+logger = get_logger('patient_search')
+
+
+def normalize(text):
+    """Lowercase ASCII words: accents dropped, punctuation turned into spaces"""
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return ' '.join(_NON_WORD.sub(' ', text.lower()).split())
+
+
+def _contact_keys(contact):
+    digits = _NON_DIGIT.sub('', contact or '')
+    if not digits:
+        return set()
+    return {digits, digits[-4:]}
+
+
+def _one_edit_variants(word):
+    letters = string.ascii_lowercase
+    variants = set()
+    for i in range(len(word)):
+        variants.add(word[:i] + word[i + 1:])
+        for c in letters:
+            variants.add(word[:i] + c + word[i + 1:])
+            variants.add(word[:i] + c + word[i:])
+        if i + 1 < len(word):
+            variants.add(word[:i] + word[i + 1] + word[i] + word[i + 2:])
+    variants.discard(word)
+    return sorted(v for v in variants if len(v) >= 2)
+
+
+class PatientIndex:
+    def __init__(self, connect, max_patients=PATIENT_INDEX_MAX, refresh_seconds=PATIENT_INDEX_REFRESH):
+        self.connect = connect      # opens the connection used by the background build
+        self.max_patients = max_patients
+        self.refresh_seconds = refresh_seconds
+        self._keys = []             # sorted name words and contact digits
+        self._ids = array('i')      # patient id of each key
+        self._names = {}            # patient id -> normalized name
+        self._max_id = 0            # highest id read from the table
+        self._loaded = False
+        self._loading = False
+        self._truncated = False
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _fetch_after(self, cursor, after_id):
+        cursor.execute('SELECT id, name, contact FROM patients WHERE id > %s ORDER BY id LIMIT %s',
+                       (after_id, LOAD_PAGE_SIZE))
+        return cursor.fetchall()
+
+    def _load(self, cursor):
+        names = {}
+        entries = []
+        max_id = 0
+        truncated = False
+        while not truncated:
+            rows = self._fetch_after(cursor, max_id)
+            for row in rows:
+                if len(names) >= self.max_patients:
+                    truncated = True
+                    break
+                name = normalize(row['name'])
+                names[row['id']] = name
+                for key in set(name.split()) | _contact_keys(row['contact']):
+                    entries.append((key, row['id']))
+                max_id = row['id']
+            if len(rows) < LOAD_PAGE_SIZE:
+                break
+        entries.sort()
+        with self._lock:
+            self._keys = [key for key, _ in entries]
+            self._ids = array('i', (patient_id for _, patient_id in entries))
+            self._names = names
+            self._max_id = max_id
+            self._truncated = truncated
+            self._loaded = True
+            self._refreshed_at = time.monotonic()
+
+    def _build(self):
+        try:
+            conn = self.connect()
+            try:
+                with conn.cursor() as cursor:
+                    self._load(cursor)
+            finally:
+                conn.close()
+            logger.info('patient index built', extra={'fields': {'patients': len(self._names), 'truncated': self._truncated}})
+        except Exception:
+            logger.exception('patient index build failed')
+        finally:
+            with self._lock:
+                self._loading = False
+
+    def _start_build(self):
+        with self._lock:
+            if self._loaded or self._loading:
+                return
+            self._loading = True
+        threading.Thread(target=self._build, name='patient-index', daemon=True).start()
+
+    def _refresh(self, cursor):
+        """Index rows inserted since the last read, e.g. by other worker processes"""
+        if time.monotonic() - self._refreshed_at < self.refresh_seconds:
+            return
+        # One request refreshes; the others keep searching the current keys
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            while True:
+                rows = self._fetch_after(cursor, self._max_id)
+                self.add_many((row['id'], row['name'], row['contact']) for row in rows)
+                if rows:
+                    self._max_id = max(self._max_id, rows[-1]['id'])
+                if len(rows) < LOAD_PAGE_SIZE or self._truncated:
+                    break
+            self._refreshed_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+
+    def add(self, patient_id, name, contact):
+        self.add_many([(patient_id, name, contact)])
+
+    def add_many(self, patients):
+        """Index committed (id, name, contact) rows; no-op until the index is loaded, and for known ids"""
+        with self._lock:
+            if not self._loaded:
+                return
+            entries = []
+            for patient_id, name, contact in patients:
+                patient_id = int(patient_id)
+                if patient_id in self._names:
+                    continue
+                if len(self._names) >= self.max_patients:
+                    self._truncated = True
+                    break
+                name = normalize(name)
+                self._names[patient_id] = name
+                entries.extend((key, patient_id) for key in set(name.split()) | _contact_keys(contact))
+            if len(entries) <= MERGE_THRESHOLD:
+                for key, patient_id in entries:
+                    position = bisect_left(self._keys, key)
+                    self._keys.insert(position, key)
+                    self._ids.insert(position, patient_id)
+                return
+            entries.sort()
+            merged = list(heapq.merge(zip(self._keys, self._ids), entries))
+            self._keys = [key for key, _ in merged]
+            self._ids = array('i', (patient_id for _, patient_id in merged))
+
+    def _range(self, prefix):
+        """[lo, hi) positions of the keys starting with prefix; call with the lock held"""
+        # Keys only hold [a-z0-9], all of which sort before DEL
+        return bisect_left(self._keys, prefix), bisect_left(self._keys, prefix + '\x7f')
+
+    def _scan(self, prefix, limit):
+        lo, hi = self._range(prefix)
+        return self._ids[lo:min(hi, lo + limit)]
+
+    def search(self, cursor, query, limit=10):
+        """Ranked patient ids for a typeahead query
+
+        Returns None while the index is being built (the first call starts
+        the build) or once it is truncated; callers then use search_sql().
+        """
+        if not self._loaded:
+            self._start_build()
+            return None
+        if self._truncated:
+            return None
+        self._refresh(cursor)
+        text = normalize(query)
+        if not text:
+            return []
+        words = text.split()
+        with self._lock:
+            if not any(c.isalpha() for c in text):
+                digits = _NON_DIGIT.sub('', text)
+                return list(dict.fromkeys(self._scan(digits, SCAN_LIMIT)))[:limit]
+
+            # Scan the word with the fewest keys and check the others against the name
+            ranges = {word: self._range(word) for word in words}
+            pivot = min(words, key=lambda word: ranges[word][1] - ranges[word][0])
+            lo, hi = ranges[pivot]
+            last = words[-1]
+            others = [word for word in words if word != pivot]
+            ranked = self._rank(self._ids[lo:min(hi, lo + SCAN_LIMIT)], others, text, last)
+            if len(ranked) < limit and len(last) >= FUZZY_MIN_LENGTH and last.isalpha():
+                # Typo in the word being typed: retry it with each one-edit variant
+                seen = set(ranked)
+                fuzzy = []
+                for variant in _one_edit_variants(last):
+                    fuzzy.extend(i for i in self._scan(variant, FUZZY_SCAN_LIMIT) if i not in seen)
+                ranked.extend(self._rank(fuzzy, words[:-1], text, None))
+            return ranked[:limit]
+
+    def _rank(self, candidates, words, text, last):
+        """Keep candidates matching every word, best first: whole-name prefix,
+        then first-word prefix, then shorter names"""
+        names = self._names
+        scored = {}
+        for patient_id in candidates:
+            if patient_id in scored:
+                continue
+            name = names[patient_id]
+            if words:
+                name_words = name.split()
+                if not all(any(n.startswith(w) for n in name_words) for w in words):
+                    continue
+            if name.startswith(text):
+                tier = 0
+            elif last and name.startswith(last):
+                tier = 1
+            else:
+                tier = 2
+            scored[patient_id] = (tier, len(name), name, patient_id)
+        return sorted(scored, key=scored.get)
+
+    def clear(self):
+        """Forget everything, e.g. after the tables were recreated; the next search rebuilds"""
+        with self._lock:
+            self._keys = []
+            self._ids = array('i')
+            self._names = {}
+            self._max_id = 0
+            self._loaded = False
+            self._truncated = False
+
+    def stats(self):
+        with self._lock:
+            return {'loaded': self._loaded, 'loading': self._loading, 'patients': len(self._names),
+                    'keys': len(self._keys), 'truncated': self._truncated}
+
+
+def search_sql(cursor, query, limit=10):
+    """Fallback while the index is unavailable: prefix match on name or contact in MySQL"""
+    pattern = query.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    cursor.execute('''
+        SELECT id, name, age, gender, contact FROM patients
+        WHERE name LIKE %s OR contact LIKE %s
+        ORDER BY name
+        LIMIT %s
+    ''', (pattern, pattern, limit))
+    return cursor.fetchall()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Appointment reminders
+
+A dispatcher thread wakes every REMINDER_INTERVAL seconds and, for each
+reminder kind in REMINDER_LEADS (name:minutes before the appointment), walks
+the appointments starting between the next shorter lead and its own lead in
+keyset pages over the (date, time, id) index. Each page is claimed in reminder_log (primary key
+appointment_id + kind) with one multi-row INSERT IGNORE, so an appointment
+is reminded once per kind even with several dispatchers running, and the
+claimed rows become in-app notifications with one multi-row INSERT, all in
+one transaction. The committed reminders are then handed to the configured
+sender. Usage:
+
+    python reminders.py [--once] [--sender stdout|file[:PATH]|none|module:Class]
+"""
+
+import importlib
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app_logging import configure_logging, get_logger
+from booking_index import to_minutes
+from db_pool import get_db_connection
+from scheduler import format_minutes
+
+REMINDER_LEADS = os.environ.get('REMINDER_LEADS', 'day_before:1440,upcoming:120')
+REMINDER_INTERVAL = float(os.environ.get('REMINDER_INTERVAL', '60'))
+REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE', '1000'))
+# smart_notifications or notifications
+REMINDER_TABLE = os.environ.get('REMINDER_TABLE', 'smart_notifications')
+REMINDER_SENDER = os.environ.get('REMINDER_SENDER', 'stdout')
+REMINDER_FILE = os.environ.get('REMINDER_FILE', 'reminders.jsonl')
+
+# Appointments in these states still get reminders
+REMINDABLE_STATUSES = ('scheduled', 'pending', 'confirmed', 'urgent')
+
+NOTIFICATION_INSERTS = {
+    'smart_notifications': (
+        'INSERT INTO smart_notifications (patient_id, type, title, message, timestamp, `read`, action_required)',
+        "(%s, 'appointment_reminder', 'Appointment reminder', %s, NOW(), 0, 0)",
+    ),
+    'notifications': (
+        'INSERT INTO notifications (patient_id, message, date, is_read)',
+        '(%s, %s, NOW(), 0)',
+    ),
+}
+
+logger = get_logger('reminders')
+
+
+def parse_leads(spec):
+    """[(kind, minutes)] from 'name:minutes,...'"""
+    leads = []
+    for part in spec.split(','):
+        kind, _, minutes = part.strip().partition(':')
+        if not kind or not minutes.isdigit():
+            raise ValueError(f'Invalid reminder lead: {part!r}')
+        leads.append((kind, int(minutes)))
+    return leads
+
+
+def reminder_message(row):
+    when = f"{row['date']} at {format_minutes(to_minutes(row['time']))[:5]}"
+    if row.get('doctor_name'):
+        return f"Reminder: your appointment with {row['doctor_name']} is on {when}."
+    return f'Reminder: your appointment is on {when}.'
+
+
+def _due_page(cursor, kind, after, end, limit):
+    """Next page of unreminded appointments after the (date, time, id) key `after`, up to `end`"""
+    after_date, after_time, after_id = after
+    placeholders = ', '.join(['%s'] * len(REMINDABLE_STATUSES))
+    cursor.execute(f'''
+        SELECT a.id, a.patient_id, a.doctor_id, a.date, a.time, d.name AS doctor_name
+        FROM appointments a
+        LEFT JOIN doctors d ON d.id = a.doctor_id
+        LEFT JOIN reminder_log r ON r.appointment_id = a.id AND r.kind = %s
+        WHERE a.date >= %s AND (a.date > %s OR a.time > %s OR (a.time = %s AND a.id > %s))
+          AND a.date <= %s AND a.time IS NOT NULL AND a.patient_id IS NOT NULL
+          AND a.status IN ({placeholders}) AND r.appointment_id IS NULL
+        ORDER BY a.date, a.time, a.id
+        LIMIT %s
+    ''', (kind, after_date, after_date, after_time, after_time, after_id, end.date(),
+          *REMINDABLE_STATUSES, limit))
+    return cursor.fetchall()
+
+
+def _claim(cursor, kind, rows):
+    """Record the rows in reminder_log; returns the ids this call claimed"""
+    batch_id = secrets.token_hex(8)
+    params = []
+    for row in rows:
+        params.extend((row['id'], kind, batch_id))
+    cursor.execute(f'''
+        INSERT IGNORE INTO reminder_log (appointment_id, kind, batch_id, created_at)
+        VALUES {', '.join(['(%s, %s, %s, NOW())'] * len(rows))}
+    ''', params)
+    cursor.execute('SELECT appointment_id FROM reminder_log WHERE batch_id = %s', (batch_id,))
+    return {row['appointment_id'] for row in cursor.fetchall()}
+
+
+def _insert_notifications(cursor, table, reminders):
+    prefix, template = NOTIFICATION_INSERTS[table]
+    params = []
+    for reminder in reminders:
+        params.extend((reminder['patient_id'], reminder['message']))
+    cursor.execute(f"{prefix} VALUES {', '.join([template] * len(reminders))}", params)
+
+
+def generate_reminders(conn, kind, lead_minutes, after_minutes=0, now=None, batch_size=REMINDER_BATCH_SIZE,
+                       table=REMINDER_TABLE):
+    """Create the reminders of one kind for appointments starting in
+    (now + after_minutes, now + lead_minutes]; returns them in appointment order
+
+    Every page is committed on its own, so a failure part-way keeps the
+    pages already written and the next run picks up the rest.
+    """
+    now = now or datetime.now()
+    start = now + timedelta(minutes=after_minutes)
+    end = now + timedelta(minutes=lead_minutes)
+    after = (start.date(), start.strftime('%H:%M:%S'), 0)
+    created = []
+    with conn.cursor() as cursor:
+        while True:
+            rows = _due_page(cursor, kind, after, end, batch_size)
+            last_page = len(rows) < batch_size
+            if rows:
+                after = (rows[-1]['date'], rows[-1]['time'], rows[-1]['id'])
+            # The query bounds the date only; drop the part of the last day past `end`
+            rows = [r for r in rows if (r['date'], to_minutes(r['time'])) <= (end.date(), end.hour * 60 + end.minute)]
+            if rows:
+                try:
+                    claimed = _claim(cursor, kind, rows)
+                    reminders = [{
+                        'appointment_id': r['id'],
+                        'patient_id': r['patient_id'],
+                        'doctor_id': r['doctor_id'],
+                        'date': str(r['date']),
+                        'time': format_minutes(to_minutes(r['time'])),
+                        'kind': kind,
+                        'message': reminder_message(r),
+                    } for r in rows if r['id'] in claimed]
+                    if reminders:
+                        _insert_notifications(cursor, table, reminders)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                created.extend(reminders)
+            if last_page or not rows:
+                break
+    return created
+
+
+class StdoutSender:
+    def send(self, reminders):
+        for reminder in reminders:
+            print(f"🔔 [{reminder['kind']}] patient {reminder['patient_id']}: {reminder['message']}", flush=True)
+
+
+class FileSender:
+    """Appends one JSON line per reminder, standing in for an SMS/e-mail gateway"""
+
+    def __init__(self, path=REMINDER_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, reminders):
+        lines = ''.join(json.dumps(reminder) + '\n' for reminder in reminders)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+
+class NullSender:
+    def send(self, reminders):
+        pass
+
+
+def load_sender(spec=REMINDER_SENDER):
+    """Sender for 'stdout', 'file[:PATH]', 'none' or 'package.module:Class'"""
+    name, _, arg = spec.partition(':')
+    if name == 'stdout':
+        return StdoutSender()
+    if name == 'file':
+        return FileSender(arg or REMINDER_FILE)
+    if name == 'none':
+        return NullSender()
+    if not arg:
+        raise ValueError(f'Unknown reminder sender: {spec!r}')
+    return getattr(importlib.import_module(name), arg)()
+
+
+class ReminderDispatcher:
+    """Runs generate_reminders for every lead on a background thread"""
+
+    def __init__(self, sender=None, leads=None, interval=REMINDER_INTERVAL, on_created=None):
+        self.sender = sender or load_sender()
+        self.leads = leads or parse_leads(REMINDER_LEADS)
+        self.interval = interval
+        # Called with each committed batch before delivery, e.g. to notify open event streams
+        self.on_created = on_created
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metrics = {'runs': 0, 'created': 0, 'send_failures': 0, 'errors': 0, 'last_run': None}
+
+    def run_once(self, now=None):
+        """One pass over every lead; returns the number of reminders created"""
+        total = 0
+        # Each kind covers the time up to the next shorter lead, so an appointment
+        # booked at short notice only gets the reminders still meaningful for it
+        after_minutes = 0
+        for kind, lead_minutes in sorted(self.leads, key=lambda lead: lead[1]):
+            conn = get_db_connection()
+            try:
+                reminders = generate_reminders(conn, kind, lead_minutes, after_minutes, now=now)
+            finally:
+                conn.close()
+            if reminders:
+                total += len(reminders)
+                if self.on_created:
+                    self.on_created(reminders)
+                try:
+                    self.sender.send(reminders)
+                except Exception:
+                    # The in-app notifications are committed; only the external copy is lost
+                    logger.exception('reminder delivery failed', extra={'fields': {'kind': kind, 'count': len(reminders)}})
+                    with self._lock:
+                        self._metrics['send_failures'] += len(reminders)
+            after_minutes = lead_minutes
+        with self._lock:
+            self._metrics['runs'] += 1
+            self._metrics['created'] += total
+            self._metrics['last_run'] = datetime.now().isoformat(timespec='seconds')
+        if total:
+            logger.info('reminders created', extra={'fields': {'count': total}})
+        return total
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception('reminder run failed')
+                with self._lock:
+                    self._metrics['errors'] += 1
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='reminder-dispatcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._metrics, running=self._thread is not None)
+
+
+def main(argv):
+    args = argv[1:]
+    once = '--once' in args
+    args = [a for a in args if a != '--once']
+    sender = REMINDER_SENDER
+    if args[:1] == ['--sender'] and len(args) == 2:
+        sender = args[1]
+    elif args:
+        print(__doc__)
+        return 2
+
+    configure_logging()
+    dispatcher = ReminderDispatcher(sender=load_sender(sender))
+    if once:
+        created = dispatcher.run_once()
+        print(f"✅ Created {created} reminders")
+        return 0
+    print(f"⏰ Sending reminders every {dispatcher.interval:g}s (Ctrl+C to stop)")
+    dispatcher.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        dispatcher.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
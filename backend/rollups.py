@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Daily per-chair and per-doctor appointment rollups
+
+The rollup tables are kept in step with the appointments table by the write
+handlers in app.py (inside the same transaction), so analytics never has to
+aggregate the raw appointments table. The same hooks keep
+doctor_patient_summary (one row per doctor and patient: appointment count,
+last completed visit, next open visit from today on) for the doctor patient
+lists. Usage:
+
+    python rollups.py rebuild [start_date end_date]   # recompute from appointments
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+from db_pool import get_db_connection
+
+# Appointments a chair / doctor can take per day; used for the utilization rates
+CHAIR_DAILY_CAPACITY = int(os.environ.get('CHAIR_DAILY_CAPACITY', '8'))
+DOCTOR_DAILY_CAPACITY = int(os.environ.get('DOCTOR_DAILY_CAPACITY', '10'))
+
+ROLLUP_TABLES = {
+    'chair': ('chair_daily_stats', 'chair_id'),
+    'doctor': ('doctor_daily_stats', 'doctor_id'),
+}
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# An appointment in one of these states is the patient's next visit
+UPCOMING_STATUSES = ('scheduled', 'pending', 'confirmed', 'urgent')
+
+# (doctor, patient) pairs re-aggregated per statement
+SUMMARY_CHUNK_SIZE = 200
+
+
+def _buckets(appointment):
+    """(table, key column, key) for every rollup row an appointment counts towards"""
+    buckets = []
+    for field, (table, column) in (('chair_id', ROLLUP_TABLES['chair']), ('doctor_id', ROLLUP_TABLES['doctor'])):
+        if appointment.get(field) is not None:
+            buckets.append((table, column, appointment[field]))
+    return buckets
+
+
+def _apply(cursor, appointment, count_delta, completed_delta):
+    if not appointment or appointment.get('date') is None:
+        return
+    for table, column, key in _buckets(appointment):
+        cursor.execute(f'''
+            INSERT INTO {table} (day, {column}, appointment_count, completed_count)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE appointment_count = appointment_count + VALUES(appointment_count),
+                                    completed_count = completed_count + VALUES(completed_count)
+        ''', (appointment['date'], key, count_delta, completed_delta))
+
+
+def _completed(appointment):
+    return 1 if appointment.get('status') == 'completed' else 0
+
+
+def _summary_select(where):
+    statuses = ', '.join(f"'{status}'" for status in UPCOMING_STATUSES)
+    return f'''
+        SELECT doctor_id, patient_id, COUNT(*), MAX(date),
+               MAX(CASE WHEN status = 'completed' THEN date END),
+               MIN(CASE WHEN status IN ({statuses}) AND date >= CURDATE() THEN date END)
+        FROM appointments
+        WHERE {where}
+        GROUP BY doctor_id, patient_id
+    '''
+
+
+def _chunks(items):
+    return [items[i:i + SUMMARY_CHUNK_SIZE] for i in range(0, len(items), SUMMARY_CHUNK_SIZE)]
+
+
+def _summary_pairs(appointments):
+    """(patient_id, doctor_id) of every appointment that has both"""
+    return {(str(a['patient_id']), str(a['doctor_id'])) for a in appointments
+            if a and a.get('patient_id') is not None and a.get('doctor_id') is not None}
+
+
+def refresh_patient_summary(cursor, appointments, previous=()):
+    """Re-aggregate the doctor_patient_summary rows the appointments belong to
+
+    Each (doctor, patient) pair is recomputed from that patient's appointments
+    rather than adjusted by a delta, since last and next visit cannot be
+    derived from the old row. Pairs only found in `previous` (appointments as
+    they were before a change) are dropped once they have no appointments left.
+    """
+    pairs = _summary_pairs(appointments)
+    stale = _summary_pairs(previous) - pairs
+    for chunk in _chunks(sorted(pairs | stale)):
+        predicate = ' OR '.join(['(patient_id = %s AND doctor_id = %s)'] * len(chunk))
+        cursor.execute(f'''
+            INSERT INTO doctor_patient_summary
+                (doctor_id, patient_id, appointment_count, last_appointment, last_visit, next_visit)
+            {_summary_select(predicate)}
+            ON DUPLICATE KEY UPDATE appointment_count = VALUES(appointment_count),
+                                    last_appointment = VALUES(last_appointment),
+                                    last_visit = VALUES(last_visit),
+                                    next_visit = VALUES(next_visit)
+        ''', [value for pair in chunk for value in pair])
+    for chunk in _chunks(sorted(stale)):
+        predicate = ' OR '.join(['(patient_id = %s AND doctor_id = %s)'] * len(chunk))
+        cursor.execute(f'''
+            DELETE FROM doctor_patient_summary
+            WHERE ({predicate}) AND NOT EXISTS (
+                SELECT 1 FROM appointments a
+                WHERE a.patient_id = doctor_patient_summary.patient_id AND a.doctor_id = doctor_patient_summary.doctor_id
+            )
+        ''', [value for pair in chunk for value in pair])
+
+
+def refresh_past_next_visits(cursor, doctor_id):
+    """Re-aggregate the doctor's summary rows whose next visit is now in the past
+
+    next_visit is computed against the current date when a row is written, so
+    it goes stale once that day has passed; readers call this first. The
+    lookup is a range on the (doctor_id, next_visit) index.
+    """
+    cursor.execute('''
+        SELECT doctor_id, patient_id FROM doctor_patient_summary
+        WHERE doctor_id = %s AND next_visit < CURDATE()
+    ''', (doctor_id,))
+    refresh_patient_summary(cursor, cursor.fetchall())
+
+
+def record_created(cursor, appointment):
+    """Count a newly inserted appointment (dict with patient_id, doctor_id, chair_id, date, status)"""
+    _apply(cursor, appointment, 1, _completed(appointment))
+    refresh_patient_summary(cursor, [appointment])
+
+
+def record_changed(cursor, before, after):
+    """Move an appointment's counts from its old doctor/chair/day/status to the new ones"""
+    refresh_patient_summary(cursor, [after], [before])
+    if all(str(before.get(f)) == str(after.get(f)) for f in ('doctor_id', 'chair_id', 'date')):
+        # Same buckets: only the completed count can move
+        delta = _completed(after) - _completed(before)
+        if delta:
+            _apply(cursor, after, 0, delta)
+        return
+    _apply(cursor, before, -1, -_completed(before))
+    _apply(cursor, after, 1, _completed(after))
+
+
+def record_changes(cursor, changes):
+    """record_changed() for many (before, after) pairs, one multi-row upsert per table
+
+    Deltas are summed per rollup row first, so moving a batch within one day
+    touches each (day, chair/doctor) row once and rows that net to zero not at all.
+    """
+    deltas = {}
+    for before, after in changes:
+        for appointment, sign in ((before, -1), (after, 1)):
+            if not appointment or appointment.get('date') is None:
+                continue
+            for table, column, key in _buckets(appointment):
+                entry = deltas.setdefault((table, column, str(appointment['date']), str(key)), [0, 0])
+                entry[0] += sign
+                entry[1] += sign * _completed(appointment)
+    by_table = {}
+    for (table, column, day, key), (count_delta, completed_delta) in deltas.items():
+        if count_delta or completed_delta:
+            by_table.setdefault((table, column), []).append((day, key, count_delta, completed_delta))
+    for (table, column), rows in by_table.items():
+        cursor.executemany(f'''
+            INSERT INTO {table} (day, {column}, appointment_count, completed_count)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE appointment_count = appointment_count + VALUES(appointment_count),
+                                    completed_count = completed_count + VALUES(completed_count)
+        ''', sorted(rows))
+    refresh_patient_summary(cursor, [after for _, after in changes], [before for before, _ in changes])
+
+
+def rebuild(cursor, start=None, end=None):
+    """Recompute rollups from the appointments table, optionally for a date range
+
+    doctor_patient_summary is not bucketed by day, so it is only rebuilt
+    without a range.
+    """
+    where = ''
+    params = []
+    if start and end:
+        where = 'WHERE day BETWEEN %s AND %s'
+        params = [start, end]
+    for table, column in ROLLUP_TABLES.values():
+        cursor.execute(f'DELETE FROM {table} {where}', params)
+        cursor.execute(f'''
+            INSERT INTO {table} (day, {column}, appointment_count, completed_count)
+            SELECT date, {column}, COUNT(*), COUNT(CASE WHEN status = 'completed' THEN 1 END)
+            FROM appointments
+            WHERE {column} IS NOT NULL AND date IS NOT NULL {'AND date BETWEEN %s AND %s' if where else ''}
+            GROUP BY date, {column}
+        ''', params)
+    if not where:
+        cursor.execute('DELETE FROM doctor_patient_summary')
+        cursor.execute(f'''
+            INSERT INTO doctor_patient_summary
+                (doctor_id, patient_id, appointment_count, last_appointment, last_visit, next_visit)
+            {_summary_select('doctor_id IS NOT NULL AND patient_id IS NOT NULL')}
+        ''')
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_days(period_start, granularity, start, end):
+    """Number of days of a bucket that fall inside [start, end]"""
+    if granularity == 'week':
+        period_end = period_start + timedelta(days=6)
+    elif granularity == 'month':
+        period_end = (period_start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    else:
+        period_end = period_start
+    return (min(period_end, end) - max(period_start, start)).days + 1
+
+
+def read_rollups(cursor, kind, start, end):
+    """Rollup rows (day, rollup_key, appointment_count, completed_count) for the range"""
+    table, column = ROLLUP_TABLES[kind]
+    cursor.execute(f'''
+        SELECT day, {column} AS rollup_key, appointment_count, completed_count
+        FROM {table}
+        WHERE day BETWEEN %s AND %s
+    ''', (start, end))
+    return cursor.fetchall()
+
+
+def summarize(rows, granularity, start, end, capacity):
+    """Group rollup rows by key (and period when a granularity is given)
+
+    Returns {key: {'appointment_count', 'completed_count', 'rate'}} without a
+    granularity, or {(period_start, key): {...}} with one.
+    """
+    groups = {}
+    for row in rows:
+        day = row['day'] if isinstance(row['day'], date) else date.fromisoformat(str(row['day']))
+        group_key = row['rollup_key'] if granularity is None else (bucket_start(day, granularity), row['rollup_key'])
+        entry = groups.setdefault(group_key, {'appointment_count': 0, 'completed_count': 0})
+        entry['appointment_count'] += row['appointment_count']
+        entry['completed_count'] += row['completed_count']
+    total_days = (end - start).days + 1
+    for group_key, entry in groups.items():
+        days = total_days if granularity is None else _bucket_days(group_key[0], granularity, start, end)
+        entry['rate'] = round(entry['appointment_count'] * 100.0 / (capacity * days), 2)
+    return groups
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != 'rebuild':
+        print(__doc__)
+        return 2
+    start, end = (argv[2], argv[3]) if len(argv) >= 4 else (None, None)
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            rebuild(cursor, start, end)
+        conn.commit()
+        print("✅ Rollups rebuilt" + (f" for {start}..{end}" if start else ""))
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error: {str(e)}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,222 @@
+"""
+Day schedule optimizer for POST /api/appointments/optimize
+
+Places a day's appointments onto (time slot, chair) pairs so that no doctor
+or chair is double-booked, every appointment sits inside its doctor's
+working hours, and higher-priority / emergency appointments stay closest to
+the time they asked for. A greedy pass in priority order builds a feasible
+schedule; a local search then moves or swaps appointments while that lowers
+the weighted displacement, within a fixed time budget.
+"""
+
+import json
+import os
+import time
+
+from booking_index import SLOT_MINUTES, to_minutes
+
+CLINIC_OPEN = os.environ.get('CLINIC_OPEN', '09:00')
+CLINIC_CLOSE = os.environ.get('CLINIC_CLOSE', '17:00')
+SEARCH_BUDGET_SECONDS = float(os.environ.get('OPTIMIZER_BUDGET_SECONDS', '0.25'))
+# Per-doctor working hours as JSON, e.g. {"1": ["09:00", "13:00"]}; other doctors work clinic hours
+DOCTOR_HOURS_JSON = os.environ.get('DOCTOR_HOURS', '')
+
+# Appointments in these states keep their slot and are never moved
+FIXED_STATUSES = ('completed', 'in_progress')
+SKIPPED_STATUSES = ('cancelled',)
+
+PRIORITY_WEIGHTS = {'critical': 8, 'urgent': 8, 'high': 4, 'medium': 2, 'normal': 1, 'low': 1}
+
+
+def priority_weight(appointment):
+    """How costly it is to move this appointment away from its requested time"""
+    weight = PRIORITY_WEIGHTS.get(str(appointment.get('priority') or '').lower(), 1)
+    if appointment.get('status') == 'urgent':
+        weight = max(weight, PRIORITY_WEIGHTS['urgent'])
+    if str(appointment.get('type') or '').lower() == 'emergency':
+        weight = max(weight, PRIORITY_WEIGHTS['critical'])
+    return weight
+
+
+def format_minutes(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}:00'
+
+
+def parse_doctor_hours(doctor_hours):
+    """{doctor_id: (start_minutes, end_minutes)} from {doctor_id: [start, end]}"""
+    return {int(k): (to_minutes(v[0]), to_minutes(v[1])) for k, v in (doctor_hours or {}).items()}
+
+
+# Shared by the optimizer and the availability index
+DOCTOR_HOURS = parse_doctor_hours(json.loads(DOCTOR_HOURS_JSON) if DOCTOR_HOURS_JSON else None)
+
+
+class ScheduleOptimizer:
+    def __init__(self, chair_ids, doctor_hours=None, slot_minutes=SLOT_MINUTES,
+                 clinic_open=CLINIC_OPEN, clinic_close=CLINIC_CLOSE, budget=SEARCH_BUDGET_SECONDS):
+        self.chair_ids = sorted(chair_ids)
+        self.slot_minutes = slot_minutes
+        self.open_slot = to_minutes(clinic_open) // slot_minutes
+        self.close_slot = to_minutes(clinic_close) // slot_minutes
+        # {doctor_id: (start_minutes, end_minutes)}: DOCTOR_HOURS, overridden per request; clinic hours when absent
+        self.doctor_hours = {**DOCTOR_HOURS, **parse_doctor_hours(doctor_hours)}
+        self.budget = budget
+
+    def _doctor_slots(self, doctor_id):
+        if doctor_id in self.doctor_hours:
+            start, end = self.doctor_hours[doctor_id]
+            return range(start // self.slot_minutes, end // self.slot_minutes)
+        return range(self.open_slot, self.close_slot)
+
+    def optimize(self, appointments):
+        """Returns {'assignments': [...], 'unscheduled': [...], 'cost': int}
+
+        Each assignment is {'id', 'chair_id', 'time', 'status'}; only
+        appointments whose chair or time changed are included. Unscheduled
+        appointments keep their current time, and no assignment takes it.
+        """
+        fixed = []
+        movable = []
+        for appointment in appointments:
+            status = appointment.get('status')
+            if status in SKIPPED_STATUSES or appointment.get('doctor_id') is None:
+                continue
+            if status in FIXED_STATUSES and appointment.get('time') is not None:
+                fixed.append(appointment)
+                continue
+            movable.append(appointment)
+
+        by_id = {a['id']: a for a in movable}
+        requested = {}
+        for appointment in movable:
+            if appointment.get('time') is not None:
+                requested[appointment['id']] = to_minutes(appointment['time']) // self.slot_minutes
+            else:
+                requested[appointment['id']] = self.open_slot
+        weights = {a['id']: priority_weight(a) for a in movable}
+
+        def cost(appointment_id, slot):
+            return weights[appointment_id] * abs(slot - requested[appointment_id])
+
+        def free_chair(slot, preferred=None):
+            if preferred is not None and (preferred, slot) not in chair_busy and preferred in self.chair_ids:
+                return preferred
+            for chair_id in self.chair_ids:
+                if (chair_id, slot) not in chair_busy:
+                    return chair_id
+            return None
+
+        def place(appointment_id, slot, chair_id):
+            doctor_id = by_id[appointment_id]['doctor_id']
+            doctor_busy[(doctor_id, slot)] = appointment_id
+            chair_busy[(chair_id, slot)] = appointment_id
+            placed[appointment_id] = (slot, chair_id)
+
+        def unplace(appointment_id):
+            slot, chair_id = placed.pop(appointment_id)
+            doctor_id = by_id[appointment_id]['doctor_id']
+            del doctor_busy[(doctor_id, slot)]
+            del chair_busy[(chair_id, slot)]
+
+        def reserve(appointment):
+            slot = to_minutes(appointment['time']) // self.slot_minutes
+            doctor_busy[(appointment['doctor_id'], slot)] = appointment['id']
+            if appointment.get('chair_id') is not None:
+                chair_busy[(appointment['chair_id'], slot)] = appointment['id']
+
+        # Greedy: highest weight first, each to the nearest feasible slot. An
+        # appointment that cannot be placed keeps its current row, so its slot
+        # is reserved and the pass rerun until no other appointment needs it.
+        kept = set()
+        order = sorted(movable, key=lambda a: (-weights[a['id']], requested[a['id']], a['id']))
+        while True:
+            doctor_busy = {}   # (doctor_id, slot) -> appointment id
+            chair_busy = {}    # (chair_id, slot) -> appointment id
+            placed = {}        # appointment id -> (slot, chair_id)
+            for appointment in fixed:
+                reserve(appointment)
+            for appointment_id in kept:
+                appointment = by_id[appointment_id]
+                slot = requested[appointment_id]
+                if appointment.get('chair_id') in self.chair_ids and slot in self._doctor_slots(appointment['doctor_id']):
+                    # Its current slot is a valid placement after all
+                    place(appointment_id, slot, appointment['chair_id'])
+                else:
+                    reserve(appointment)
+            unscheduled = []
+            for appointment in order:
+                appointment_id = appointment['id']
+                if appointment_id in kept:
+                    continue
+                doctor_id = appointment['doctor_id']
+                slots = sorted(self._doctor_slots(doctor_id), key=lambda s: (abs(s - requested[appointment_id]), s))
+                for slot in slots:
+                    if (doctor_id, slot) in doctor_busy:
+                        continue
+                    chair_id = free_chair(slot, appointment.get('chair_id'))
+                    if chair_id is not None:
+                        place(appointment_id, slot, chair_id)
+                        break
+                else:
+                    unscheduled.append(appointment_id)
+            stuck = {i for i in unscheduled if by_id[i].get('time') is not None}
+            if not stuck:
+                break
+            kept |= stuck
+        unscheduled.extend(i for i in kept if i not in placed)
+
+        # Local search: move towards the requested slot, or swap with a same-doctor neighbour
+        deadline = time.monotonic() + self.budget
+        improved = True
+        while improved and time.monotonic() < deadline:
+            improved = False
+            for appointment_id in sorted(placed, key=lambda i: -cost(i, placed[i][0])):
+                if time.monotonic() >= deadline:
+                    break
+                slot, chair_id = placed[appointment_id]
+                current = cost(appointment_id, slot)
+                if current == 0:
+                    continue
+                doctor_id = by_id[appointment_id]['doctor_id']
+                target = requested[appointment_id]
+                step = 1 if target > slot else -1
+                for candidate in range(target, slot, -step):
+                    if candidate not in self._doctor_slots(doctor_id):
+                        continue
+                    occupant = doctor_busy.get((doctor_id, candidate))
+                    if occupant is None:
+                        new_chair = free_chair(candidate, chair_id)
+                        if new_chair is not None:
+                            unplace(appointment_id)
+                            place(appointment_id, candidate, new_chair)
+                            improved = True
+                            break
+                    elif occupant in placed:
+                        # Swap slots (and chairs) with the doctor's other appointment
+                        other_slot, other_chair = placed[occupant]
+                        if cost(appointment_id, candidate) + cost(occupant, slot) < current + cost(occupant, other_slot):
+                            unplace(appointment_id)
+                            unplace(occupant)
+                            place(appointment_id, candidate, other_chair)
+                            place(occupant, slot, chair_id)
+                            improved = True
+                            break
+
+        assignments = []
+        for appointment_id, (slot, chair_id) in placed.items():
+            appointment = by_id[appointment_id]
+            new_time = format_minutes(slot * self.slot_minutes)
+            old_time = format_minutes(to_minutes(appointment['time'])) if appointment.get('time') is not None else None
+            if new_time != old_time or chair_id != appointment.get('chair_id'):
+                assignments.append({
+                    'id': appointment_id,
+                    'chair_id': chair_id,
+                    'time': new_time,
+                    'status': appointment.get('status') or 'scheduled',
+                })
+        assignments.sort(key=lambda a: a['id'])
+        return {
+            'assignments': assignments,
+            'unscheduled': sorted(unscheduled),
+            'cost': sum(cost(i, s) for i, (s, _) in placed.items()),
+        }
@@ -0,0 +1,110 @@
+"""
+Startup check of the tables and columns the API depends on
+
+One information_schema query compares the live database with
+REQUIRED_COLUMNS, and schema_migrations (when there is one) is compared
+with migrations.py.
+The result is cached and reported by /api/health, so request handlers never
+introspect the schema; a failed check (e.g. MySQL not reachable yet) is
+retried at most every SCHEMA_RECHECK_SECONDS when the status is read.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+from migrations import MIGRATIONS
+
+SCHEMA_RECHECK_SECONDS = float(os.environ.get('SCHEMA_RECHECK_SECONDS', '30'))
+
+REQUIRED_COLUMNS = {
+    'doctors': ('id', 'name', 'specialty', 'contact', 'email', 'license_number', 'experience', 'education',
+                'status', 'rejection_reason', 'created_at'),
+    'patients': ('id', 'name', 'age', 'gender', 'contact'),
+    'users': ('id', 'username', 'password', 'role', 'patient_id', 'doctor_id'),
+    # priority, chair_id and type are written by the emergency slot endpoint;
+    # active_slot carries the unique keys against double booking
+    'appointments': ('id', 'patient_id', 'doctor_id', 'chair_id', 'date', 'time', 'status', 'priority', 'type',
+                     'active_slot'),
+    'chairs': ('id', 'name', 'status'),
+    'payments': ('id', 'patient_id', 'amount', 'date', 'status'),
+    'notifications': ('id', 'patient_id', 'message', 'date', 'is_read'),
+    'smart_notifications': ('id', 'patient_id', 'type', 'title', 'message', 'timestamp', 'read', 'action_required'),
+    'treatment_notes': ('id', 'doctor_id', 'patient_id', 'diagnosis', 'treatment_plan', 'notes', 'created_at'),
+    'chair_daily_stats': ('day', 'chair_id', 'appointment_count', 'completed_count'),
+    'doctor_daily_stats': ('day', 'doctor_id', 'appointment_count', 'completed_count'),
+    'reminder_log': ('appointment_id', 'kind', 'batch_id', 'created_at'),
+    'doctor_patient_summary': ('doctor_id', 'patient_id', 'appointment_count', 'last_appointment', 'last_visit',
+                               'next_visit'),
+}
+
+
+def check_schema(conn):
+    """{'ok', 'missing_tables', 'missing_columns', 'pending_migrations'} for the live database
+
+    Read-only. Without a schema_migrations table (e.g. a database built from
+    create_tables.sql) pending_migrations is None: unknown, not pending.
+    """
+    tables = list(REQUIRED_COLUMNS)
+    placeholders = ', '.join(['%s'] * (len(tables) + 1))
+    with conn.cursor() as cursor:
+        cursor.execute(f'''
+            SELECT table_name AS table_name, column_name AS column_name
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name IN ({placeholders})
+        ''', tables + ['schema_migrations'])
+        found = {}
+        for row in cursor.fetchall():
+            found.setdefault(row['table_name'].lower(), set()).add(row['column_name'].lower())
+        pending = None
+        if 'schema_migrations' in found:
+            cursor.execute('SELECT version FROM schema_migrations')
+            applied = {row['version'] for row in cursor.fetchall()}
+            pending = [version for version, _, _ in MIGRATIONS if version not in applied]
+    conn.commit()
+
+    missing_tables = [t for t in tables if t not in found]
+    missing_columns = [f'{t}.{c}' for t in tables if t in found for c in REQUIRED_COLUMNS[t] if c not in found[t]]
+    return {
+        'ok': not (missing_tables or missing_columns or pending),
+        'missing_tables': missing_tables,
+        'missing_columns': missing_columns,
+        'pending_migrations': pending,
+    }
+
+
+class SchemaStatus:
+    """Cached result of check_schema()"""
+
+    def __init__(self, connect, recheck_seconds=SCHEMA_RECHECK_SECONDS):
+        self.connect = connect
+        self.recheck_seconds = recheck_seconds
+        self._result = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def verify(self):
+        """Run the check now and cache the result"""
+        try:
+            conn = self.connect()
+            try:
+                result = check_schema(conn)
+            finally:
+                conn.close()
+        except Exception as e:
+            result = {'ok': False, 'error': str(e)}
+        result['checked_at'] = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            self._result = result
+            self._checked_at = time.monotonic()
+        return result
+
+    def get(self):
+        """The cached result; re-checked only when the last check could not reach the database"""
+        with self._lock:
+            result = self._result
+            stale = time.monotonic() - self._checked_at >= self.recheck_seconds
+        if result is None or ('error' in result and stale):
+            result = self.verify()
+        return result
@@ -0,0 +1,32 @@
+"""
+Conversion of MySQL row values into JSON-friendly types
+"""
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+
+def _format_timedelta(value):
+    # pymysql returns TIME columns as timedelta; keep the HH:MM:SS form MySQL uses
+    return str(value)
+
+
+# Exact-type lookup is cheaper than an isinstance chain; datetime must not fall
+# through to the date converter, so both are listed explicitly.
+CONVERTERS = {
+    datetime: lambda value: value.strftime('%Y-%m-%d %H:%M:%S'),
+    date: lambda value: value.isoformat(),
+    time: lambda value: value.strftime('%H:%M:%S'),
+    timedelta: _format_timedelta,
+    Decimal: float,
+}
+
+
+def serialize_row(row):
+    """Convert date/time/timedelta/Decimal values of a single row in place"""
+    for key, value in row.items():
+        converter = CONVERTERS.get(type(value))
+        if converter:
+            row[key] = converter(value)
+    return row
+
@@ -0,0 +1,485 @@
+"""
+Embedded SQLite engine behind the pymysql connection API
+
+With DB_BACKEND=sqlite the pool in db_pool.py opens these connections
+instead of MySQL ones. Connections, cursors, dict rows and exceptions look
+like pymysql's, and each statement is rewritten from the MySQL dialect used
+in this codebase (%s parameters, INSERT IGNORE, ON DUPLICATE KEY UPDATE,
+NOW()/CURDATE(), inline indexes in CREATE TABLE, information_schema lookups,
+MATCH ... AGAINST, EXPLAIN), so app.py, the maintenance scripts and the
+benchmark run unchanged. An empty database is created from create_tables.sql
+and migrated. SQLITE_PATH is a file, or ':memory:' for a database shared by
+the connections of one process that lives until the process exits.
+
+This is for local runs, tests and benchmarks: results are always buffered,
+string comparisons are case-sensitive, and MATCH ... AGAINST is answered by
+a term-count function rather than a full-text index.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from functools import lru_cache
+
+from pymysql import err
+from pymysql.constants import ER, SERVER_STATUS
+
+SQLITE_PATH = os.environ.get('SQLITE_PATH', ':memory:')
+# Seconds a writer waits for another connection's transaction to finish
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', '10'))
+SCHEMA_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'create_tables.sql')
+
+# information_schema tables used by migrations.py and schema.py, per connection
+INFORMATION_SCHEMA_VIEWS = {
+    'tables': '''
+        SELECT 'main' AS table_schema, name AS table_name
+        FROM sqlite_master WHERE type = 'table'
+    ''',
+    'columns': '''
+        SELECT 'main' AS table_schema, m.name AS table_name, c.name AS column_name, c.cid + 1 AS ordinal_position
+        FROM sqlite_master m JOIN pragma_table_xinfo(m.name) c
+        WHERE m.type = 'table'
+    ''',
+    'statistics': '''
+        SELECT 'main' AS table_schema, m.name AS table_name, l.name AS index_name,
+               i.seqno + 1 AS seq_in_index, i.name AS column_name, 1 - l."unique" AS non_unique
+        FROM sqlite_master m JOIN pragma_index_list(m.name) l JOIN pragma_index_info(l.name) i
+        WHERE m.type = 'table'
+    ''',
+}
+
+_WRITE = re.compile(r'\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b', re.I)
+_INDEX_ITEM = re.compile(r'(UNIQUE\s+(?:KEY|INDEX)|FULLTEXT\s+(?:KEY|INDEX)|KEY|INDEX)\s+`?(\w+)`?\s*\((.*)\)$',
+                         re.I | re.S)
+_MATCH = re.compile(r'MATCH\s*\(([^)]*)\)\s*AGAINST\s*\(\s*(\S+?)\s*'
+                    r'(IN\s+NATURAL\s+LANGUAGE\s+MODE|IN\s+BOOLEAN\s+MODE)?\s*\)', re.I)
+_FUNCTIONS = [
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.I), 'INSERT OR IGNORE'),
+    (re.compile(r'\bNOW\(\)', re.I), "datetime('now', 'localtime')"),
+    (re.compile(r'\bCURDATE\(\)', re.I), "date('now', 'localtime')"),
+    (re.compile(r'\bDATABASE\(\)', re.I), "'main'"),
+    (re.compile(r'@@auto_increment_increment', re.I), '1'),
+    (re.compile(r'\binformation_schema\.(\w+)', re.I), r'information_schema_\1'),
+    (re.compile(r'\bCREATE\s+FULLTEXT\s+INDEX\b', re.I), 'CREATE INDEX'),
+    (re.compile(r'\bDROP\s+INDEX\s+(\w+)\s+ON\s+\w+', re.I), r'DROP INDEX IF EXISTS \1'),
+]
+_UPSERT = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.I)
+_WORD = re.compile(r'\w+')
+_BOOLEAN_TERM = re.compile(r'([+\-~<>]*)("[^"]*"|\w+\*?)')
+# MySQL's innodb_ft_min_token_size
+MIN_TOKEN_SIZE = 3
+
+_bootstrap_lock = threading.Lock()
+# Keeps each in-memory database alive while its pooled connections come and go
+_memory_anchors = {}
+
+
+# --- type conversion ----------------------------------------------------------
+
+def _format_timedelta(value):
+    seconds = int(value.total_seconds())
+    return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+
+def _converter(parse):
+    def convert(raw):
+        text = raw.decode()
+        try:
+            return parse(text)
+        except ValueError:
+            return text
+    return convert
+
+
+def _parse_time(text):
+    hours, minutes, seconds = (text.split(':') + ['0', '0'])[:3]
+    return timedelta(hours=int(hours), minutes=int(minutes), seconds=float(seconds))
+
+
+# Values come back as pymysql returns them: DATE -> date, TIME -> timedelta, ...
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' ', 'seconds'))
+sqlite3.register_adapter(time, lambda value: value.isoformat('seconds'))
+sqlite3.register_adapter(timedelta, _format_timedelta)
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter('DATE', _converter(lambda text: date.fromisoformat(text[:10])))
+sqlite3.register_converter('TIME', _converter(_parse_time))
+sqlite3.register_converter('DATETIME', _converter(datetime.fromisoformat))
+sqlite3.register_converter('TIMESTAMP', _converter(datetime.fromisoformat))
+sqlite3.register_converter('DECIMAL', _converter(Decimal))
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+def _mysql_error(e):
+    """The pymysql exception (with its MySQL error code) matching a sqlite3 one"""
+    message = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        if message.startswith(('UNIQUE', 'PRIMARY KEY')):
+            return err.IntegrityError(ER.DUP_ENTRY, message)
+        if message.startswith('FOREIGN KEY'):
+            return err.IntegrityError(ER.NO_REFERENCED_ROW_2, message)
+        if message.startswith('NOT NULL'):
+            return err.IntegrityError(ER.BAD_NULL_ERROR, message)
+        return err.IntegrityError(ER.UNKNOWN_ERROR, message)
+    if isinstance(e, sqlite3.OperationalError):
+        if message.startswith('no such table'):
+            return err.ProgrammingError(ER.NO_SUCH_TABLE, message)
+        if message.startswith('no such column'):
+            return err.OperationalError(ER.BAD_FIELD_ERROR, message)
+        if 'syntax error' in message:
+            return err.ProgrammingError(ER.PARSE_ERROR, message)
+        if 'locked' in message:
+            return err.OperationalError(ER.LOCK_WAIT_TIMEOUT, message)
+        return err.OperationalError(ER.UNKNOWN_ERROR, message)
+    if isinstance(e, sqlite3.ProgrammingError):
+        return err.ProgrammingError(ER.UNKNOWN_ERROR, message)
+    return err.DatabaseError(ER.UNKNOWN_ERROR, message)
+
+
+# --- full-text stand-in ---------------------------------------------------------
+
+def match_against(query, mode, *columns):
+    """Relevance of the columns for MATCH ... AGAINST: matching term count, 0 for no match
+
+    Boolean mode honours +required, -excluded, prefix* and "phrase" terms.
+    """
+    text = ' '.join(str(column) for column in columns if column).lower()
+    counts = Counter(_WORD.findall(text))
+    query = (query or '').lower()
+    if mode != 'boolean':
+        terms = {term for term in _WORD.findall(query) if len(term) >= MIN_TOKEN_SIZE}
+        return float(sum(counts[term] for term in terms))
+    score = 0
+    for operators, term in _BOOLEAN_TERM.findall(query):
+        if term.startswith('"'):
+            phrase = ' '.join(_WORD.findall(term))
+            hits = ' '.join(_WORD.findall(text)).count(phrase) if phrase else 0
+        elif term.endswith('*'):
+            hits = sum(n for word, n in counts.items() if word.startswith(term[:-1]))
+        else:
+            hits = counts[term]
+        if '-' in operators and hits:
+            return 0.0
+        if '+' in operators and not hits:
+            return 0.0
+        score += hits
+    return float(score)
+
+
+def _rewrite_match(m):
+    mode = 'boolean' if m.group(3) and 'BOOLEAN' in m.group(3).upper() else 'natural'
+    return f"match_against({m.group(2)}, '{mode}', {m.group(1)})"
+
+
+# --- dialect translation ------------------------------------------------------
+
+def _split_top_level(text, separator=','):
+    """Split on separators outside parentheses and quotes"""
+    parts = []
+    depth = 0
+    quote = None
+    start = 0
+    for i, c in enumerate(text):
+        if quote:
+            if c == quote:
+                quote = None
+        elif c in '\'"`':
+            quote = c
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _strip_comments(sql):
+    """Drop -- comments outside quotes"""
+    lines = []
+    for line in sql.splitlines():
+        quote = None
+        for i, c in enumerate(line):
+            if quote:
+                if c == quote:
+                    quote = None
+            elif c in '\'"`':
+                quote = c
+            elif line.startswith('--', i):
+                line = line[:i]
+                break
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def _create_table(sql):
+    """CREATE TABLE with its inline INDEX/KEY clauses moved to CREATE INDEX statements"""
+    head, _, rest = sql.partition('(')
+    body, _, tail = rest.rpartition(')')
+    table = re.search(r'TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?', head, re.I).group(1)
+    columns = []
+    indexes = []
+    for item in _split_top_level(body):
+        item = item.strip()
+        index = _INDEX_ITEM.match(item)
+        if index:
+            unique = 'UNIQUE ' if index.group(1).upper().startswith('UNIQUE') else ''
+            indexes.append(f'CREATE {unique}INDEX IF NOT EXISTS {index.group(2)} ON {table} ({index.group(3)})')
+            continue
+        item = re.sub(r'\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b', 'INTEGER PRIMARY KEY AUTOINCREMENT', item, flags=re.I)
+        item = re.sub(r'\bENUM\s*\([^)]*\)', 'TEXT', item, flags=re.I)
+        item = re.sub(r'\bON\s+UPDATE\s+CURRENT_TIMESTAMP\b', '', item, flags=re.I)
+        columns.append(item)
+    return [f"{head}({', '.join(columns)}){tail}"] + indexes
+
+
+def _set_statement(sql):
+    """SET SESSION ...: foreign_key_checks maps to the pragma, the rest has no SQLite equivalent"""
+    m = re.match(r'\s*SET\s+(?:SESSION\s+)?foreign_key_checks\s*=\s*(\d)', sql, re.I)
+    if m:
+        return [f"PRAGMA foreign_keys = {'ON' if m.group(1) == '1' else 'OFF'}"]
+    return []
+
+
+@lru_cache(maxsize=2048)
+def translate(sql, has_params=True):
+    """SQLite statements for one MySQL statement; [] when it is a no-op here"""
+    sql = _strip_comments(sql).strip().rstrip(';')
+    if has_params:
+        sql = re.sub(r'%(s|%)', lambda m: '?' if m.group(1) == 's' else '%', sql)
+    keyword = sql.split(None, 1)[0].upper() if sql else ''
+    if keyword in ('USE', '') or re.match(r'CREATE\s+DATABASE\b', sql, re.I):
+        return []
+    if keyword == 'SET':
+        return _set_statement(sql)
+    m = re.match(r"SHOW\s+TABLES(?:\s+LIKE\s+('[^']*'))?$", sql, re.I)
+    if m:
+        pattern = m.group(1) or "'%'"
+        return [f"SELECT name AS Tables_in_main FROM sqlite_master WHERE type = 'table' AND name LIKE {pattern}"]
+    if re.match(r'CREATE\s+TABLE\b', sql, re.I):
+        return _create_table(sql)
+    if re.match(r'ALTER\s+TABLE\b', sql, re.I):
+        # SQLite can only add virtual generated columns; the unique indexes work the same on them
+        sql = re.sub(r'\bSTORED\b', 'VIRTUAL', sql, flags=re.I)
+    for pattern, replacement in _FUNCTIONS:
+        sql = pattern.sub(replacement, sql)
+    sql = _MATCH.sub(_rewrite_match, sql)
+    upsert = _UPSERT.search(sql)
+    if upsert:
+        assignments = re.sub(r'\bVALUES\s*\(\s*`?(\w+)`?\s*\)', r'excluded.\1', sql[upsert.end():], flags=re.I)
+        sql = sql[:upsert.start()] + 'ON CONFLICT DO UPDATE SET' + assignments
+    if keyword == 'EXPLAIN':
+        sql = 'EXPLAIN QUERY PLAN' + sql[len('EXPLAIN'):]
+    return [sql]
+
+
+def split_script(script):
+    """Statements of a .sql file such as create_tables.sql"""
+    return [statement for statement in _split_top_level(_strip_comments(script), ';') if statement.strip()]
+
+
+def _explain_rows(rows):
+    """EXPLAIN QUERY PLAN rows in the shape of MySQL's EXPLAIN (table, type, key, Extra)"""
+    plan = []
+    for row in rows:
+        m = re.match(r'(SCAN|SEARCH) (\w+)(?: USING (?:COVERING )?INDEX (\w+))?', row['detail'])
+        if not m:
+            continue
+        access, table, key = m.groups()
+        if access == 'SEARCH':
+            kind = 'ref'
+        else:
+            kind = 'index' if key else 'ALL'
+        plan.append({'id': row['id'], 'table': table, 'type': kind, 'key': key, 'Extra': row['detail']})
+    return plan
+
+
+# --- connection API -----------------------------------------------------------
+
+class Cursor:
+    """DictCursor look-alike; every result is fetched when the statement runs"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self._rows = []
+        self._position = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def execute(self, query, args=None):
+        if isinstance(args, list):
+            args = tuple(args)
+        try:
+            for statement in translate(query, args is not None):
+                self._run(statement, args if args is not None and '?' in statement else ())
+        except sqlite3.Error as e:
+            raise _mysql_error(e) from e
+        return self.rowcount
+
+    def executemany(self, query, args):
+        rows = [tuple(row) for row in args]
+        if not rows:
+            return 0
+        try:
+            statements = translate(query, True)
+            self.connection._begin(statements[0])
+            cursor = self.connection._db.executemany(statements[0], rows)
+        except sqlite3.Error as e:
+            raise _mysql_error(e) from e
+        self.description = None
+        self._rows = []
+        self.rowcount = cursor.rowcount
+        return self.rowcount
+
+    def _run(self, statement, args):
+        self.connection._begin(statement)
+        cursor = self.connection._db.execute(statement, args)
+        self.description = cursor.description
+        self._rows = cursor.fetchall() if cursor.description else []
+        self._position = 0
+        if statement.upper().startswith('EXPLAIN QUERY PLAN'):
+            self._rows = _explain_rows(self._rows)
+            self.description = tuple((name, None, None, None, None, None, None) for name in
+                                     ('id', 'table', 'type', 'key', 'Extra'))
+        self.rowcount = len(self._rows) if cursor.description else cursor.rowcount
+        if statement.upper().startswith('INSERT') and cursor.rowcount > 0:
+            # MySQL reports the first id of a multi-row INSERT, SQLite the last
+            self.lastrowid = cursor.lastrowid - cursor.rowcount + 1
+        else:
+            self.lastrowid = cursor.lastrowid
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    def close(self):
+        self._rows = []
+
+
+class Connection:
+    """The parts of pymysql.Connection the app and db_pool use"""
+
+    def __init__(self, db):
+        self._db = db
+
+    @property
+    def open(self):
+        try:
+            self._db.total_changes
+        except sqlite3.ProgrammingError:
+            return False
+        return True
+
+    @property
+    def server_status(self):
+        return SERVER_STATUS.SERVER_STATUS_IN_TRANS if self._db.in_transaction else 0
+
+    def _begin(self, statement):
+        # Take the write lock up front: a deferred transaction that already read
+        # would fail at once, instead of waiting, when another writer holds the lock
+        if not self._db.in_transaction and _WRITE.match(statement):
+            self._db.execute('BEGIN IMMEDIATE')
+
+    def cursor(self, cursorclass=None):
+        return Cursor(self)
+
+    def commit(self):
+        try:
+            if self._db.in_transaction:
+                self._db.execute('COMMIT')
+        except sqlite3.Error as e:
+            raise _mysql_error(e) from e
+
+    def rollback(self):
+        if self._db.in_transaction:
+            self._db.execute('ROLLBACK')
+
+    def ping(self, reconnect=False):
+        try:
+            self._db.execute('SELECT 1')
+        except sqlite3.Error as e:
+            raise err.OperationalError(ER.UNKNOWN_ERROR, str(e)) from e
+
+    def close(self):
+        self._db.close()
+
+
+def _open(path):
+    if path == ':memory:':
+        # memdb databases are shared by name between the connections of a process
+        target, uri = 'file:/dental_care?vfs=memdb', True
+    else:
+        target, uri = path, path.startswith('file:')
+    db = sqlite3.connect(target, uri=uri, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None,
+                         detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+    db.row_factory = _dict_row
+    db.create_function('match_against', -1, match_against, deterministic=True)
+    db.execute('PRAGMA foreign_keys = ON')
+    for name, select in INFORMATION_SCHEMA_VIEWS.items():
+        db.execute(f'CREATE TEMP VIEW information_schema_{name} AS {select}')
+    return db
+
+
+def load_script(conn, path=SCHEMA_SCRIPT):
+    """Run every statement of a MySQL .sql file"""
+    with open(path, encoding='utf-8') as f:
+        statements = split_script(f.read())
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    conn.commit()
+
+
+def _bootstrap(conn):
+    # Imported here: migrations imports db_pool, which imports this module
+    from migrations import run_migrations
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) AS count FROM sqlite_master WHERE type = 'table' AND name = 'patients'")
+        if cursor.fetchone()['count']:
+            return
+    load_script(conn)
+    run_migrations(conn)
+
+
+def connect(path=SQLITE_PATH):
+    """Open a connection, creating the schema from create_tables.sql on first use"""
+    with _bootstrap_lock:
+        if path == ':memory:' and path not in _memory_anchors:
+            _memory_anchors[path] = _open(path)
+        conn = Connection(_open(path))
+        if path != ':memory:':
+            conn._db.execute('PRAGMA journal_mode = WAL')
+        _bootstrap(conn)
+    return conn
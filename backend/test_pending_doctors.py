@@ -1,14 +1,7 @@
-import pymysql
-from pymysql.cursors import DictCursor
+from db_pool import get_db_connection
 
 def test_pending_doctors():
-    conn = pymysql.connect(
-        host='localhost',
-        user='root',
-        password='V1S21_pass_mysql',
-        db='dental_care',
-        cursorclass=DictCursor
-    )
+    conn = get_db_connection()
     
     try:
         with conn.cursor() as cursor:
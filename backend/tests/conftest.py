@@ -0,0 +1,77 @@
+"""
+Shared fixtures: the API on the embedded SQLite backend
+
+DB_BACKEND is set before anything imports db_pool, so the whole suite runs
+against the in-memory database sqlite_db builds from create_tables.sql
+(sample users riya / drsmith ... with password123, doctors and chairs 1-3).
+The tests share that database, so each one books its own dates and rows.
+
+    cd backend && python -m pytest
+"""
+
+import os
+import sys
+
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = ':memory:'
+os.environ.setdefault('SESSION_SECRET', 'test-session-secret')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import app as app_module
+from db_pool import get_db_connection
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def conn():
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+@pytest.fixture
+def auth(client):
+    """auth(username) -> Authorization header of a fresh session for that sample user"""
+    def login(username, password='password123'):
+        response = client.post('/api/login', json={'username': username, 'password': password})
+        assert response.status_code == 200, response.get_json()
+        return {'Authorization': f"Bearer {response.get_json()['token']}"}
+    return login
+
+
+@pytest.fixture
+def insert_appointment(conn):
+    """insert_appointment(**columns) -> id of a committed appointments row"""
+    def insert(patient_id=1, doctor_id=1, chair_id=None, date=None, time=None, status='scheduled',
+               priority=None, type=None):
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                INSERT INTO appointments (patient_id, doctor_id, chair_id, date, time, status, priority, type)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ''', (patient_id, doctor_id, chair_id, date, time, status, priority, type))
+            appointment_id = cursor.lastrowid
+        conn.commit()
+        return appointment_id
+    return insert
+
+
+@pytest.fixture
+def new_patient(conn):
+    """new_patient(name) -> id of a patient no other test books for"""
+    def insert(name='Test Patient'):
+        with conn.cursor() as cursor:
+            cursor.execute("INSERT INTO patients (name, age, gender, contact) VALUES (%s, 40, 'Female', '+1 555-0100')",
+                           (name,))
+            patient_id = cursor.lastrowid
+        conn.commit()
+        return patient_id
+    return insert
@@ -0,0 +1,56 @@
+import json
+import logging
+
+import pytest
+
+from app_logging import ROOT_LOGGER, JsonFormatter, SamplingFilter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(JsonFormatter().format(record))
+
+
+@pytest.fixture
+def captured():
+    """JSON lines of every record the API logs, DEBUG included"""
+    logger = logging.getLogger(ROOT_LOGGER)
+    handler = ListHandler()
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    yield handler.lines
+    logger.setLevel(level)
+    logger.removeHandler(handler)
+
+
+def _record(level, **extra):
+    return logging.makeLogRecord(dict(name='carecraft.test', levelno=level, levelname=logging.getLevelName(level),
+                                      msg='hello', **extra))
+
+
+def test_records_are_json_lines_with_their_fields():
+    entry = json.loads(JsonFormatter().format(_record(logging.INFO, fields={'patient_id': 7})))
+    assert (entry['level'], entry['logger'], entry['msg'], entry['patient_id']) == \
+        ('INFO', 'carecraft.test', 'hello', 7)
+
+
+def test_sampling_never_drops_warnings():
+    drop_all = SamplingFilter(0.0)
+    assert not drop_all.filter(_record(logging.INFO))
+    assert drop_all.filter(_record(logging.WARNING))
+    assert drop_all.filter(_record(logging.ERROR))
+    assert SamplingFilter(1.0).filter(_record(logging.DEBUG))
+
+
+def test_registration_does_not_log_the_password(client, captured):
+    response = client.post('/api/register', json={'username': 'logged_user', 'password': 'not-in-the-logs',
+                                                  'role': 'patient', 'name': 'Logged User', 'contact': '+1 555-0103',
+                                                  'age': 30, 'gender': 'Male'})
+    assert response.status_code == 201, response.get_json()
+    assert captured
+    assert not any('not-in-the-logs' in line for line in captured)
@@ -0,0 +1,72 @@
+from datetime import date, datetime
+
+from availability import AvailabilityIndex
+from scheduler import ScheduleOptimizer, parse_doctor_hours
+
+DAY = date(2031, 6, 2)
+
+
+def _free(conn, doctor_ids, start=DAY, end=DAY, now=None, doctor_hours=None):
+    index = AvailabilityIndex(slot_minutes=30, clinic_open='09:00', clinic_close='12:00',
+                              doctor_hours=parse_doctor_hours(doctor_hours))
+    with conn.cursor() as cursor:
+        return index.free_slots(cursor, doctor_ids, start, end, now=now or datetime(2031, 1, 1))
+
+
+def test_a_booking_takes_its_doctors_slot_only(conn, insert_appointment):
+    insert_appointment(doctor_id=1, chair_id=1, date=DAY, time='09:30:00')
+    slots = _free(conn, [1, 2])
+    assert slots[1][DAY.isoformat()] == ['09:00:00', '10:00:00', '10:30:00', '11:00:00', '11:30:00']
+    # Chairs 2 and 3 are still free at 09:30
+    assert '09:30:00' in slots[2][DAY.isoformat()]
+
+
+def test_a_slot_with_every_chair_taken_is_not_offered(conn, insert_appointment):
+    day = date(2031, 6, 3)
+    for chair_id in (1, 2, 3):
+        insert_appointment(doctor_id=chair_id, chair_id=chair_id, date=day, time='10:00:00')
+    insert_appointment(doctor_id=1, chair_id=1, date=day, time='11:00:00', status='cancelled')
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) AS n FROM chairs WHERE status = 'available'")
+        assert cursor.fetchone()['n'] == 3
+    free = _free(conn, [1], day, day)[1][day.isoformat()]
+    assert '10:00:00' not in free
+    assert '11:00:00' in free
+
+
+def test_off_grid_bookings_block_both_slots_they_overlap(conn, insert_appointment):
+    day = date(2031, 6, 4)
+    insert_appointment(doctor_id=2, chair_id=2, date=day, time='09:45:00')
+    assert _free(conn, [2], day, day)[2][day.isoformat()] == ['09:00:00', '10:30:00', '11:00:00', '11:30:00']
+
+
+def test_today_only_offers_slots_that_have_not_started(conn):
+    day = date(2031, 6, 5)
+    slots = _free(conn, [3], date(2031, 6, 4), day, now=datetime(2031, 6, 5, 10, 10))
+    assert slots[3]['2031-06-05'] == ['10:30:00', '11:00:00', '11:30:00']
+    # Past days are left out altogether
+    assert list(slots[3]) == ['2031-06-05']
+
+
+def test_a_doctor_with_own_hours_is_only_offered_those(conn):
+    day = date(2031, 6, 6)
+    hours = {'2': ['10:00', '11:30']}
+    slots = _free(conn, [1, 2], day, day, doctor_hours=hours)
+    assert slots[2][day.isoformat()] == ['10:00:00', '10:30:00', '11:00:00']
+    # Doctors without their own hours keep the clinic's
+    assert slots[1][day.isoformat()][0] == '09:00:00'
+    # The optimizer reads the same hours
+    assert list(ScheduleOptimizer([1], doctor_hours=hours, slot_minutes=30)._doctor_slots(2)) == [20, 21, 22]
+
+
+def test_availability_endpoint_only_serves_approved_doctors(client, conn):
+    with conn.cursor() as cursor:
+        cursor.execute('''
+            INSERT INTO doctors (name, specialty, contact, email, license_number, experience, education, status)
+            VALUES ('Dr. Pending', 'Orthodontics', '+1 555-0101', 'pending@example.com', 'PD001', 3, 'DDS',
+                    'pending_approval')
+        ''')
+        pending_id = cursor.lastrowid
+    conn.commit()
+    assert client.get('/api/doctors/1/availability?start=2031-06-02&end=2031-06-03').status_code == 200
+    assert client.get(f'/api/doctors/{pending_id}/availability').status_code == 404
@@ -0,0 +1,47 @@
+import pytest
+
+import benchmark
+import sqlite_db
+
+SIZES = ['--doctors', '2', '--patients', '4', '--appointments', '20', '--notes', '3']
+
+
+@pytest.fixture
+def bench_db(tmp_path, monkeypatch):
+    """A file database of its own, so seeding never touches the shared in-memory one"""
+    path = str(tmp_path / 'bench.db')
+    monkeypatch.setattr(benchmark, 'get_db_connection', lambda: sqlite_db.connect(path))
+    monkeypatch.setattr(benchmark, 'MANIFEST_PATH', str(tmp_path / 'manifest.json'))
+    return path
+
+
+def _counts(path):
+    conn = sqlite_db.connect(path)
+    try:
+        with conn.cursor() as cursor:
+            counts = {}
+            for table in ('users', 'doctors', 'patients', 'chairs', 'appointments', 'treatment_notes'):
+                cursor.execute(f'SELECT COUNT(*) AS n FROM {table}')
+                counts[table] = cursor.fetchone()['n']
+            return counts
+    finally:
+        conn.close()
+
+
+def test_seed_refuses_a_seeded_database_unless_forced(bench_db):
+    assert benchmark.main(['benchmark.py', 'seed', *SIZES]) == 0
+    seeded = _counts(bench_db)
+    assert benchmark.main(['benchmark.py', 'seed', *SIZES]) == 1
+    assert _counts(bench_db) == seeded
+    # --force replaces the bench rows instead of piling a second set on top
+    assert benchmark.main(['benchmark.py', 'seed', *SIZES, '--force']) == 0
+    assert _counts(bench_db) == seeded
+
+
+def test_find_regressions_flags_latency_and_throughput():
+    baseline = {'login': {'p95_ms': 100.0, 'throughput': 50.0}, 'booking': {'p95_ms': 40.0, 'throughput': 20.0}}
+    results = {'login': {'p95_ms': 130.0, 'throughput': 49.0}, 'booking': {'p95_ms': 41.0, 'throughput': 10.0},
+               'analytics': {'p95_ms': 900.0, 'throughput': 1.0}}
+    problems = benchmark.find_regressions(results, baseline, 0.2)
+    assert [problem.split(':')[0] for problem in problems] == ['login', 'booking']
+    assert benchmark.percentile([1, 2, 3, 4], 0.95) == 4
@@ -0,0 +1,100 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+from booking_index import BookingIndex, date_error, slot_alignment_error
+
+DAY = '2031-03-03'
+
+
+def test_overlap_is_found_per_doctor_and_chair(conn, insert_appointment):
+    booked = insert_appointment(doctor_id=1, chair_id=1, date=DAY, time='10:00:00')
+    index = BookingIndex(slot_minutes=30)
+    with conn.cursor() as cursor:
+        doctor = index.find_conflict(cursor, {'doctor_id': 1, 'chair_id': 2, 'date': DAY, 'time': '10:00',
+                                              'status': 'scheduled'})
+        chair = index.find_conflict(cursor, {'doctor_id': 2, 'chair_id': 1, 'date': DAY, 'time': '10:00',
+                                             'status': 'scheduled'})
+        # A legacy off-grid booking still overlaps the slot it starts in
+        partial = index.find_conflict(cursor, {'doctor_id': 1, 'date': DAY, 'time': '10:15', 'status': 'scheduled'})
+        adjacent = index.find_conflict(cursor, {'doctor_id': 1, 'chair_id': 1, 'date': DAY, 'time': '10:30',
+                                                'status': 'scheduled'})
+    assert (doctor.resource, doctor.resource_id, doctor.appointment_id) == ('doctor', 1, booked)
+    assert (chair.resource, chair.resource_id, chair.appointment_id) == ('chair', 1, booked)
+    assert partial.appointment_id == booked
+    assert adjacent is None
+
+
+def test_cancelled_and_ignored_bookings_do_not_conflict(conn, insert_appointment):
+    insert_appointment(doctor_id=2, chair_id=2, date=DAY, time='11:00:00', status='cancelled')
+    booked = insert_appointment(doctor_id=2, chair_id=2, date=DAY, time='11:30:00')
+    index = BookingIndex(slot_minutes=30)
+    candidate = {'doctor_id': 2, 'chair_id': 2, 'date': DAY, 'status': 'scheduled'}
+    with conn.cursor() as cursor:
+        assert index.find_conflict(cursor, dict(candidate, time='11:00')) is None
+        assert index.find_conflict(cursor, dict(candidate, time='11:30'), ignore_id=booked) is None
+        assert index.find_conflict(cursor, dict(candidate, time='11:30', status='cancelled')) is None
+
+
+def test_committed_changes_update_loaded_buckets(conn, insert_appointment):
+    index = BookingIndex(slot_minutes=30, ttl=3600)
+    candidate = {'doctor_id': 3, 'date': DAY, 'time': '14:00', 'status': 'scheduled'}
+    with conn.cursor() as cursor:
+        assert index.find_conflict(cursor, candidate) is None
+        booked = insert_appointment(doctor_id=3, date=DAY, time='14:00:00')
+        index.add(booked, dict(candidate, id=booked))
+        assert index.find_conflict(cursor, candidate).appointment_id == booked
+        index.apply_change(booked, dict(candidate), dict(candidate, status='cancelled'))
+        assert index.find_conflict(cursor, candidate) is None
+
+
+def test_api_answers_409_for_a_taken_slot(client):
+    booking = {'patient_id': 1, 'doctor_id': 1, 'date': '2031-03-04', 'time': '09:00', 'status': 'scheduled'}
+    assert client.post('/api/appointments', json=booking).status_code == 201
+    response = client.post('/api/appointments', json=dict(booking, patient_id=2))
+    assert response.status_code == 409
+    assert response.get_json()['conflict']['resource'] == 'doctor'
+
+
+def test_api_rejects_times_off_the_slot_grid(client):
+    booking = {'patient_id': 1, 'doctor_id': 2, 'date': '2031-03-04', 'time': '09:15', 'status': 'scheduled'}
+    response = client.post('/api/appointments', json=booking)
+    assert response.status_code == 400
+    assert 'slot boundary' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/api/appointments', {'patient_id': 1, 'doctor_id': 2, 'time': '09:00', 'status': 'scheduled'}),
+    ('/api/appointments/emergency', {'patient_id': 1, 'doctor_id': 2, 'time': '09:00', 'priority': 'urgent'}),
+])
+def test_api_rejects_malformed_dates(client, path, body):
+    for value in ('bad', '2031-13-01'):
+        response = client.post(path, json=dict(body, date=value))
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'date must be YYYY-MM-DD'}
+    response = client.get('/api/appointments/conflicts', query_string={'doctor_id': 2, 'date': 'bad', 'time': '09:00'})
+    assert response.status_code == 400
+
+
+def test_date_error():
+    assert date_error('2031-03-04') is None
+    assert date_error(date(2031, 3, 4)) is None
+    assert date_error('04/03/2031') == 'date must be YYYY-MM-DD'
+
+
+@pytest.mark.parametrize('value, aligned', [
+    ('09:00', True),
+    ('09:30:00', True),
+    (timedelta(hours=13), True),
+    (time(9, 30), True),
+    ('09:15', False),
+    ('09:00:30', False),
+    (time(9, 10), False),
+])
+def test_slot_alignment(value, aligned):
+    assert (slot_alignment_error(value, slot_minutes=30) is None) == aligned
+
+
+def test_slot_alignment_rejects_malformed_times():
+    assert slot_alignment_error('nine') == 'time must be HH:MM or HH:MM:SS'
+    assert slot_alignment_error('9') == 'time must be HH:MM or HH:MM:SS'
@@ -0,0 +1,82 @@
+import rollups
+
+
+def _pages(client, path, key, headers=None):
+    """Every page of a keyset-paginated endpoint, following next_cursor"""
+    pages = []
+    cursor = None
+    while True:
+        response = client.get(path + (f'&cursor={cursor}' if cursor else ''), headers=headers)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        pages.append(body[key])
+        cursor = body['next_cursor']
+        if not cursor:
+            return pages
+
+
+def test_appointment_pages_cover_every_row_once(client, new_patient, insert_appointment):
+    patient_id = new_patient('Paged Patient')
+    ids = [insert_appointment(patient_id=patient_id, doctor_id=doctor_id, date=day, time=time)
+           for day in ('2031-08-01', '2031-08-02')
+           for doctor_id, time in ((1, '09:00:00'), (2, '09:00:00'), (3, '10:30:00'))]
+    pages = _pages(client, f'/api/appointments?patient_id={patient_id}&limit=2', 'appointments')
+    assert [len(page) for page in pages] == [2, 2, 2]
+    assert [a['id'] for page in pages for a in page] == ids
+    assert all('active_slot' not in a for page in pages for a in page)
+
+
+def test_malformed_cursors_are_rejected(client):
+    assert client.get('/api/appointments?cursor=not-a-cursor').status_code == 400
+    assert client.get('/api/notifications?cursor=not-a-cursor').status_code == 400
+
+
+def test_notification_pages_continue_past_rows_without_a_date(client, conn, new_patient):
+    patient_id = new_patient('Notified Patient')
+    with conn.cursor() as cursor:
+        for day in ('2031-08-01 10:00:00', '2031-08-02 10:00:00', None, None, None):
+            cursor.execute('INSERT INTO notifications (patient_id, message, date, is_read) VALUES (%s, %s, %s, 0)',
+                           (patient_id, f'on {day}', day))
+    conn.commit()
+    pages = _pages(client, f'/api/notifications?patient_id={patient_id}&limit=2', 'notifications')
+    messages = [n['message'] for page in pages for n in page]
+    assert messages[:2] == ['on 2031-08-02 10:00:00', 'on 2031-08-01 10:00:00']
+    assert messages[2:] == ['on None'] * 3
+    assert len({n['id'] for page in pages for n in page}) == 5
+
+
+def test_doctor_patient_cursor_is_tied_to_its_sort(client, conn, auth, insert_appointment, new_patient):
+    appointments = [{'patient_id': new_patient(name), 'doctor_id': 2} for name in ('Ann Keyset', 'Ben Keyset')]
+    for appointment in appointments:
+        insert_appointment(date='2031-08-05', time='09:00:00', status='cancelled', **appointment)
+    # The API write paths maintain the summary table; do the same for the raw inserts
+    with conn.cursor() as cursor:
+        rollups.refresh_patient_summary(cursor, appointments)
+    conn.commit()
+    headers = auth('drjohnson')
+    response = client.get('/api/doctors/2/patients?sort=name&limit=1', headers=headers)
+    cursor = response.get_json()['next_cursor']
+    assert cursor
+    other = client.get(f'/api/doctors/2/patients?sort=last_visit&limit=1&cursor={cursor}', headers=headers)
+    assert other.status_code == 400
+    assert other.get_json()['error'] == 'Cursor belongs to a different sort order'
+
+
+def test_note_search_cursor_is_tied_to_its_search(client, conn):
+    with conn.cursor() as cursor:
+        for _ in range(3):
+            cursor.execute('''
+                INSERT INTO treatment_notes (doctor_id, patient_id, diagnosis, treatment_plan, notes)
+                VALUES (1, 1, 'Cursorcase fracture', 'Splint', 'Cursorcase follow-up')
+            ''')
+    conn.commit()
+    first = client.get('/api/treatment-notes/search?q=cursorcase&limit=2&doctor_id=1').get_json()
+    cursor = first['next_cursor']
+    assert len(first['notes']) == 2 and cursor
+    same = client.get(f'/api/treatment-notes/search?q=cursorcase&limit=2&doctor_id=1&cursor={cursor}')
+    assert same.status_code == 200
+    assert len(same.get_json()['notes']) == 1
+    for changed in ('q=cursorcase&doctor_id=2', 'q=cursorcase', 'q=cursorcase&doctor_id=1&mode=boolean',
+                    'q=splint&doctor_id=1'):
+        response = client.get(f'/api/treatment-notes/search?{changed}&limit=2&cursor={cursor}')
+        assert response.status_code == 400, changed
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+def _pool(**options):
+    return ConnectionPool(backend='sqlite', **dict({'max_size': 1, 'timeout': 0.05}, **options))
+
+
+def _patient_names(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT name FROM patients WHERE name LIKE 'Pool %'")
+        return [row['name'] for row in cursor.fetchall()]
+
+
+def test_a_returned_connection_is_reused():
+    pool = _pool()
+    with pool.acquire() as conn:
+        first = conn._raw
+    with pool.acquire() as conn:
+        assert conn._raw is first
+    stats = pool.stats()
+    assert (stats['created'], stats['in_use'], stats['idle']) == (1, 0, 1)
+
+
+def test_closing_twice_returns_the_connection_once():
+    pool = _pool(max_size=2)
+    conn = pool.acquire()
+    conn.close()
+    conn.close()
+    assert (pool.stats()['in_use'], pool.stats()['idle']) == (0, 1)
+
+
+def test_an_exhausted_pool_times_out():
+    pool = _pool()
+    with pool.acquire():
+        with pytest.raises(PoolTimeout):
+            pool.acquire()
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_a_waiting_borrower_gets_the_released_connection():
+    pool = _pool(timeout=5)
+    conn = pool.acquire()
+    threading.Timer(0.05, conn.close).start()
+    with pool.acquire() as again:
+        assert again._raw is conn._raw
+    assert pool.stats()['waits'] == 1
+
+
+def test_uncommitted_work_is_rolled_back_on_release():
+    pool = _pool()
+    with pool.acquire() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("INSERT INTO patients (name, age, gender, contact) VALUES ('Pool Uncommitted', 1, 'Male', '')")
+    with pool.acquire() as conn:
+        assert _patient_names(conn) == []
+
+
+def test_old_connections_are_recycled_on_borrow():
+    pool = _pool(recycle=0)
+    with pool.acquire() as conn:
+        first = conn._raw
+    with pool.acquire() as conn:
+        assert conn._raw is not first
+    assert (pool.stats()['created'], pool.stats()['recycled']) == (2, 1)
+
+
+def test_unknown_backends_are_rejected():
+    with pytest.raises(ValueError):
+        ConnectionPool(backend='postgres')
@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+
+from tokens import tokens as session_tokens
+
+
+def _brute_force(conn, doctor_id):
+    """The stats recomputed from every appointment of the doctor"""
+    today = date.today()
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT patient_id, date, status FROM appointments WHERE doctor_id = %s', (doctor_id,))
+        rows = [dict(row, date=str(row['date'])) for row in cursor.fetchall()]
+    todays = [row for row in rows if row['date'] == today.isoformat()]
+    month = today.isoformat()[:7]
+    return {
+        'today': {'today_appointments': len(todays),
+                  'completed': sum(row['status'] == 'completed' for row in todays),
+                  'pending': sum(row['status'] == 'pending' for row in todays),
+                  'urgent': sum(row['status'] == 'urgent' for row in todays)},
+        'patients': {'total_patients': len({row['patient_id'] for row in rows})},
+        'monthly': {'monthly_appointments': sum(row['date'][:7] == month for row in rows)},
+    }
+
+
+def test_stats_match_a_full_recount(client, conn, new_patient):
+    # A doctor of its own: other tests insert appointments without maintaining the summary table
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO doctors (name, specialty, contact, email, license_number, experience, education, status)
+            VALUES ('Dr. Stats', 'Periodontics', '+1 555-0120', 'stats@example.com', 'ST001', 5, 'DDS', 'approved')
+        """)
+        doctor_id = cursor.lastrowid
+    conn.commit()
+    token, _ = session_tokens.issue({'id': 9100, 'role': 'doctor', 'patient_id': None, 'doctor_id': doctor_id})
+    today = date.today()
+    patients = [new_patient(f'Stats Patient {i}') for i in range(3)]
+    bookings = [(patients[0], today, '09:00', 'pending'), (patients[1], today, '09:30', 'urgent'),
+                (patients[1], today, '10:00', 'completed'), (patients[2], today - timedelta(days=400), '09:00', 'completed')]
+    for patient_id, day, time, status in bookings:
+        response = client.post('/api/appointments', json={'patient_id': patient_id, 'doctor_id': doctor_id,
+                                                          'date': day.isoformat(), 'time': time, 'status': status})
+        assert response.status_code == 201, response.get_json()
+    stats = client.get(f'/api/doctors/{doctor_id}/stats', headers={'Authorization': f'Bearer {token}'}).get_json()
+    assert stats == _brute_force(conn, doctor_id)
+    assert stats['today'] == {'today_appointments': 3, 'completed': 1, 'pending': 1, 'urgent': 1}
+    assert stats['patients'] == {'total_patients': 3}
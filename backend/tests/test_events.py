@@ -0,0 +1,78 @@
+import pytest
+
+from events import EventBroker, TooManySubscribers
+from tokens import tokens as session_tokens
+
+
+def _events(stream, count):
+    """The next `count` events of a stream, keep-alives skipped"""
+    events = []
+    while len(events) < count:
+        chunk = next(stream)
+        if chunk.startswith('event: ') or chunk.startswith('id: '):
+            events.append(dict(line.split(': ', 1) for line in chunk.strip().split('\n')))
+    return events
+
+
+def _open(broker, last_event_id=None):
+    stream = broker.stream(7, last_event_id, heartbeat=0.01, max_seconds=5)
+    assert next(stream).startswith('retry: ')
+    return stream
+
+
+def test_a_new_subscriber_only_gets_events_published_after_it_connected():
+    broker = EventBroker()
+    broker.publish(7, 'notification', {'id': 1})
+    stream = _open(broker)
+    event_id = broker.publish(7, 'notification', {'id': 2})
+    broker.publish(8, 'notification', {'id': 3})
+    assert _events(stream, 1) == [{'id': event_id, 'event': 'notification', 'data': '{"id": 2}'}]
+    stream.close()
+
+
+def test_reconnecting_with_last_event_id_replays_what_was_missed():
+    broker = EventBroker()
+    seen = broker.publish(7, 'notification', {'id': 1})
+    missed = [broker.publish(7, 'notification', {'id': n}) for n in (2, 3)]
+    stream = _open(broker, seen)
+    assert [event['id'] for event in _events(stream, 2)] == missed
+    stream.close()
+
+
+def test_unresumable_ids_get_a_resync(monkeypatch):
+    monkeypatch.setattr('events.EVENT_BUFFER_SIZE', 2)
+    broker = EventBroker()
+    first = broker.publish(7, 'notification', {'id': 1})
+    for n in (2, 3, 4):
+        broker.publish(7, 'notification', {'id': n})
+    # Dropped out of the buffer, or from before a restart
+    for last_event_id in (first, 'deadbeef-1'):
+        stream = _open(broker, last_event_id)
+        assert _events(stream, 1)[0]['event'] == 'resync'
+        stream.close()
+
+
+def test_closing_a_stream_frees_its_subscriber_slot():
+    broker = EventBroker(max_subscribers=1)
+    stream = _open(broker)
+    with pytest.raises(TooManySubscribers):
+        broker.stream(7)
+    stream.close()
+    assert broker.stats()['subscribers'] == 0
+    _open(broker).close()
+
+
+def test_the_event_stream_needs_the_patients_token(client, auth):
+    assert client.get('/api/patients/2/events').status_code == 401
+    assert client.post('/api/patients/2/events/token', headers=auth('sarah')).status_code == 403
+    token = client.post('/api/patients/2/events/token', headers=auth('john')).get_json()['token']
+    assert client.get('/api/patients/3/events', query_string={'token': token}).status_code == 403
+    # A session token is not accepted as an event token
+    session, _ = session_tokens.issue({'id': 2, 'role': 'patient', 'patient_id': 2, 'doctor_id': None})
+    assert client.get('/api/patients/2/events', query_string={'token': session}).status_code == 401
+
+    response = client.get('/api/patients/2/events', query_string={'token': token}, buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert next(response.response).startswith(b'retry: ')
+    response.close()
@@ -0,0 +1,63 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+import exports
+from db_pool import get_db_connection, pool
+
+
+@pytest.fixture(scope='module')
+def booked_patient():
+    """A patient with three appointments, one of them cancelled, booked once for the module"""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("INSERT INTO patients (name, age, gender, contact) VALUES ('Exported Patient', 40, 'Male', '')")
+            patient_id = cursor.lastrowid
+            for day, status in (('2031-09-01', 'scheduled'), ('2031-09-02', 'cancelled'), ('2031-09-03', 'scheduled')):
+                cursor.execute("INSERT INTO appointments (patient_id, doctor_id, date, time, status) "
+                               "VALUES (%s, 1, %s, '09:00:00', %s)", (patient_id, day, status))
+        conn.commit()
+    finally:
+        conn.close()
+    return patient_id
+
+
+def test_csv_export_streams_the_filtered_rows(client, booked_patient):
+    in_use = pool.stats()['in_use']
+    response = client.get(f'/api/export/appointments?patient_id={booked_patient}&status=scheduled')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(row['date'], row['time'], row['patient_name']) for row in rows] == \
+        [('2031-09-01', '9:00:00', 'Exported Patient'), ('2031-09-03', '9:00:00', 'Exported Patient')]
+    # The streaming connection went back to the pool once the body was read
+    assert pool.stats()['in_use'] == in_use
+
+
+def test_jsonl_export_can_be_gzipped_and_flushed_in_chunks(client, booked_patient, monkeypatch):
+    monkeypatch.setattr(exports, 'EXPORT_FLUSH_BYTES', 1)
+    response = client.get(f'/api/export/appointments?format=jsonl&gzip=true&patient_id={booked_patient}'
+                          '&date_from=2031-09-02&date_to=2031-09-03')
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=appointments.jsonl.gz'
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert [(row['date'], row['status']) for row in map(json.loads, lines)] == \
+        [('2031-09-02', 'cancelled'), ('2031-09-03', 'scheduled')]
+
+
+def test_datetime_exports_include_the_whole_last_day():
+    sql, params = exports.build_query('treatment_notes', {'date_from': '2031-09-01', 'date_to': '2031-09-01'})
+    assert 'tn.created_at >= %s AND tn.created_at < %s' in sql
+    assert [str(p) for p in params] == ['2031-09-01', '2031-09-02']
+
+
+def test_bad_requests_are_rejected_before_streaming(client):
+    assert client.get('/api/export/users').status_code == 404
+    assert client.get('/api/export/payments?format=xml').status_code == 400
+    response = client.get('/api/export/payments?date_from=yesterday')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'date_from and date_to must be YYYY-MM-DD'}
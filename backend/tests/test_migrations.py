@@ -0,0 +1,69 @@
+import pytest
+
+import migrations
+import sqlite_db
+
+USERS_INDEX = 'idx_users_username_password'
+
+
+@pytest.fixture
+def fresh_conn(tmp_path):
+    """A database of its own, created from create_tables.sql and migrated"""
+    conn = sqlite_db.connect(str(tmp_path / 'migrations.db'))
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _versions(conn):
+    with conn.cursor() as cursor:
+        return migrations.applied_versions(cursor)
+
+
+def _user_indexes(conn):
+    with conn.cursor() as cursor:
+        return migrations._index_columns(cursor, 'users')
+
+
+def test_new_database_gets_every_version(fresh_conn):
+    assert _versions(fresh_conn) == {version for version, _, _ in migrations.MIGRATIONS}
+    assert migrations.verify_schema(fresh_conn) == []
+    assert migrations.run_migrations(fresh_conn) == []
+    assert USERS_INDEX not in _user_indexes(fresh_conn)
+
+
+def test_v9_drops_the_index_a_shipped_v2_created(fresh_conn):
+    # A database migrated before v9 existed still has the v2 index
+    with fresh_conn.cursor() as cursor:
+        cursor.execute(f'CREATE INDEX {USERS_INDEX} ON users (username, password)')
+        cursor.execute('DELETE FROM schema_migrations WHERE version = 9')
+    fresh_conn.commit()
+    assert migrations.verify_schema(fresh_conn) == ['v9: missing removal of index users.idx_users_username_password']
+
+    assert migrations.run_migrations(fresh_conn) == [9]
+    assert USERS_INDEX not in _user_indexes(fresh_conn)
+    assert migrations.verify_schema(fresh_conn) == []
+
+
+def test_v2_is_unchanged_and_v9_undoes_it():
+    steps = dict((version, steps) for version, _, steps in migrations.MIGRATIONS)
+    assert ('index', 'users', USERS_INDEX, ['username', 'password']) in steps[2]
+    assert steps[9] == [('drop_index', 'users', USERS_INDEX)]
+
+
+def test_missing_steps_are_reapplied_and_backfills_rerun(fresh_conn):
+    with fresh_conn.cursor() as cursor:
+        cursor.execute('DROP INDEX idx_notifications_patient_read')
+        cursor.execute('DELETE FROM doctor_patient_summary')
+        cursor.execute('DELETE FROM schema_migrations WHERE version IN (5, 8)')
+    fresh_conn.commit()
+    assert migrations.verify_schema(fresh_conn) == ['v5: missing index notifications.idx_notifications_patient_read']
+
+    assert migrations.run_migrations(fresh_conn) == [5, 8]
+    assert migrations.verify_schema(fresh_conn) == []
+    with fresh_conn.cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) AS n FROM doctor_patient_summary')
+        summaries = cursor.fetchone()['n']
+        cursor.execute('SELECT COUNT(*) AS n FROM (SELECT DISTINCT doctor_id, patient_id FROM appointments) pairs')
+        assert summaries == cursor.fetchone()['n'] > 0
@@ -0,0 +1,71 @@
+import pytest
+
+from tokens import tokens as session_tokens
+
+
+@pytest.fixture
+def notify(conn):
+    """notify(patient_id, smart=False) -> id of a new unread notification"""
+    def insert(patient_id, smart=False):
+        with conn.cursor() as cursor:
+            if smart:
+                cursor.execute('''
+                    INSERT INTO smart_notifications (patient_id, type, title, message, `read`)
+                    VALUES (%s, 'reminder', 'Reminder', 'See you soon', 0)
+                ''', (patient_id,))
+            else:
+                cursor.execute("INSERT INTO notifications (patient_id, message, date, is_read) VALUES (%s, 'Hello', NOW(), 0)",
+                               (patient_id,))
+            notification_id = cursor.lastrowid
+        conn.commit()
+        return notification_id
+    return insert
+
+
+def _session(role, patient_id=None):
+    token, _ = session_tokens.issue({'id': 9000 + (patient_id or 0), 'role': role, 'patient_id': patient_id,
+                                     'doctor_id': None})
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _unread(client, patient_id):
+    return client.get(f'/api/patients/{patient_id}/notifications/unread-count', headers=_session('admin')).get_json()
+
+
+def test_unread_count_needs_the_patients_session(client, auth):
+    assert client.get('/api/patients/2/notifications/unread-count').status_code == 401
+    assert client.get('/api/patients/2/notifications/unread-count', headers=auth('sarah')).status_code == 403
+    assert client.get('/api/patients/2/notifications/unread-count', headers=auth('drsmith')).status_code == 403
+    assert client.get('/api/patients/2/notifications/unread-count', headers=auth('john')).status_code == 200
+
+
+def test_mark_read_needs_a_session(client, auth, new_patient, notify):
+    patient_id = new_patient('Unread Patient')
+    body = {'patient_id': patient_id, 'ids': [notify(patient_id)]}
+    assert client.put('/api/notifications/read', json=body).status_code == 401
+    assert client.put('/api/notifications/read', json=body, headers=auth('drsmith')).status_code == 403
+    # A patient always acts on their own record, whatever the body names
+    response = client.put('/api/notifications/read', json=body, headers=auth('sarah'))
+    assert response.get_json()['updated'] == {'notifications': 0, 'smart_notifications': 0}
+    assert _unread(client, patient_id)['notifications'] == 1
+
+
+def test_mark_read_updates_the_unread_count(client, new_patient, notify):
+    patient_id = new_patient('Reading Patient')
+    ids, smart_ids = [notify(patient_id), notify(patient_id)], [notify(patient_id, smart=True)]
+    assert _unread(client, patient_id) == {'notifications': 2, 'smart_notifications': 1, 'total': 3}
+    response = client.put('/api/notifications/read', json={'ids': ids[:1], 'smart_ids': smart_ids},
+                          headers=_session('patient', patient_id))
+    assert response.get_json()['updated'] == {'notifications': 1, 'smart_notifications': 1}
+    # The cached count is invalidated by the read receipt
+    assert _unread(client, patient_id) == {'notifications': 1, 'smart_notifications': 0, 'total': 1}
+
+    response = client.put('/api/notifications/read', json={'patient_id': patient_id, 'all': True},
+                          headers=_session('admin'))
+    assert response.get_json()['updated'] == {'notifications': 1, 'smart_notifications': 0}
+    assert _unread(client, patient_id)['total'] == 0
+
+
+def test_admin_must_name_the_patient(client):
+    response = client.put('/api/notifications/read', json={'all': True}, headers=_session('admin'))
+    assert response.status_code == 400
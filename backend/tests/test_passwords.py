@@ -0,0 +1,48 @@
+import threading
+
+import pytest
+
+import app as app_module
+from passwords import HasherBusy, PasswordHasher, hash_password, verify_password
+
+
+@pytest.fixture
+def stalled_hasher():
+    """A one-worker hasher whose worker is stuck until the test ends"""
+    hasher = PasswordHasher(workers=1, queue_limit=4, timeout=0.05)
+    release = threading.Event()
+    hasher._submit(release.wait, ())
+    yield hasher
+    release.set()
+
+
+def test_hashes_verify_and_legacy_plaintext_needs_a_rehash():
+    stored = hash_password('secret', n=2 ** 4)
+    assert verify_password('secret', stored) == (True, True)
+    assert verify_password('wrong', stored) == (False, False)
+    assert verify_password('secret', 'secret') == (True, True)
+    assert verify_password('secret', None) == (False, False)
+
+
+def test_a_timed_out_job_is_reported_as_busy(stalled_hasher):
+    with pytest.raises(HasherBusy, match='timed out'):
+        stalled_hasher.hash('secret')
+
+
+def test_login_answers_503_when_the_hasher_times_out(client, monkeypatch, stalled_hasher):
+    monkeypatch.setattr(app_module, 'password_hasher', stalled_hasher)
+    for path in ('/api/login', '/api/admin/login'):
+        response = client.post(path, json={'username': 'riya', 'password': 'password123'})
+        assert response.status_code == 503
+        assert 'timed out' in response.get_json()['error']
+
+
+def test_non_string_passwords_are_rejected(client):
+    for path in ('/api/login', '/api/admin/login'):
+        response = client.post(path, json={'username': 'riya', 'password': 5})
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'password must be a string'}
+    response = client.post('/api/register', json={'username': 'numeric', 'password': 12345678, 'role': 'patient',
+                                                  'name': 'Numeric', 'contact': '+1 555-0102', 'age': 30,
+                                                  'gender': 'Male'})
+    assert response.status_code == 400
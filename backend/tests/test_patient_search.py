@@ -0,0 +1,75 @@
+import pytest
+
+from db_pool import get_db_connection
+from patient_search import PatientIndex, normalize
+
+
+@pytest.fixture(scope='module')
+def named_patients():
+    """A few patients with distinctive names, inserted once for the module"""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            for name in ('Quentin Zabriskie', 'Quinn Zabel', 'Zabriskie Quarles', 'Zoë Quirke-Zander'):
+                cursor.execute("INSERT INTO patients (name, age, gender, contact) VALUES (%s, 40, 'Male', '')", (name,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def index(conn, named_patients):
+    """An index loaded synchronously, without the background build"""
+    index = PatientIndex(get_db_connection)
+    with conn.cursor() as cursor:
+        index._load(cursor)
+    return index
+
+
+def _names(conn, index, query, limit=10):
+    with conn.cursor() as cursor:
+        return [index._names[patient_id] for patient_id in index.search(cursor, query, limit)]
+
+
+def test_normalize_drops_accents_and_punctuation():
+    assert normalize("  Zoë O'Brien-Smith ") == 'zoe o brien smith'
+
+
+def test_prefix_matches_rank_whole_name_prefixes_first(conn, index):
+    assert _names(conn, index, 'zab', limit=3) == ['zabriskie quarles', 'quinn zabel', 'quentin zabriskie']
+    # Exact matches come before one-edit ones
+    assert _names(conn, index, 'zab qui')[0] == 'quinn zabel'
+    assert _names(conn, index, 'zoe quir', limit=1) == ['zoe quirke zander']
+
+
+def test_a_typo_in_the_last_word_still_finds_the_patient(conn, index):
+    assert sorted(_names(conn, index, 'zabriksie')) == ['quentin zabriskie', 'zabriskie quarles']
+
+
+def test_contacts_match_on_their_digits(conn, index, new_patient):
+    patient_id = new_patient('Contact Only')
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE patients SET contact = '+1 555-7391' WHERE id = %s", (patient_id,))
+    conn.commit()
+    index.clear()
+    with conn.cursor() as cursor:
+        index._load(cursor)
+        assert index.search(cursor, '7391') == [patient_id]
+        assert index.search(cursor, '1-555-739') == [patient_id]
+
+
+def test_patients_added_after_the_load_are_searchable(conn, index):
+    index.add(987654, 'Xanthippe Quarles', '+1 555-0199')
+    assert _names(conn, index, 'xanth') == ['xanthippe quarles']
+
+
+def test_an_unloaded_index_defers_to_sql(client, new_patient):
+    index = PatientIndex(get_db_connection)
+    index._start_build = lambda: None
+    assert index.search(None, 'anything') is None
+    patient_id = new_patient('Yardley Sqlfallback')
+    response = client.get('/api/patients/search?q=Yardley')
+    assert response.status_code == 200
+    assert [p['id'] for p in response.get_json()['patients']] == [patient_id]
+    assert client.get('/api/patients/search').status_code == 400
+    assert client.get('/api/patients/search?q=a&limit=many').status_code == 400
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+
+from reminders import ReminderDispatcher, generate_reminders, parse_leads
+
+LEADS = [('day_before', 1440), ('upcoming', 120)]
+
+
+class ListSender:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, reminders):
+        self.sent.extend(reminders)
+
+
+class BrokenSender:
+    def send(self, reminders):
+        raise ConnectionError('gateway down')
+
+
+def _book(insert_appointment, patient_id, day, times, status='scheduled'):
+    return [insert_appointment(patient_id=patient_id, doctor_id=doctor_id, date=day, time=time, status=status)
+            for doctor_id, time in zip((1, 2, 3), times)]
+
+
+def test_each_appointment_gets_the_reminder_for_its_window_once(conn, new_patient, insert_appointment):
+    patient_id = new_patient('Reminded Patient')
+    now = datetime(2033, 3, 1, 8, 0)
+    soon, tonight, tomorrow = _book(insert_appointment, patient_id, '2033-03-01', ('09:00:00', '20:00:00')) + \
+        _book(insert_appointment, patient_id, '2033-03-02', ('07:30:00',))
+    _book(insert_appointment, patient_id, '2033-03-02', ('09:00:00',))  # More than a day away
+    _book(insert_appointment, patient_id, '2033-03-01', ('08:30:00',), status='cancelled')
+
+    sender = ListSender()
+    dispatcher = ReminderDispatcher(sender=sender, leads=LEADS)
+    assert dispatcher.run_once(now=now) == 3
+    assert [(r['appointment_id'], r['kind']) for r in sender.sent] == \
+        [(soon, 'upcoming'), (tonight, 'day_before'), (tomorrow, 'day_before')]
+    assert sender.sent[0]['message'] == 'Reminder: your appointment with Dr. Sarah Smith is on 2033-03-01 at 09:00.'
+    # A second pass, or a second dispatcher, finds nothing left to send
+    assert ReminderDispatcher(sender=sender, leads=LEADS).run_once(now=now) == 0
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) AS n FROM smart_notifications WHERE patient_id = %s AND type = 'appointment_reminder'",
+                       (patient_id,))
+        assert cursor.fetchone()['n'] == 3
+
+
+def test_pages_are_walked_to_the_end_of_the_window(conn, new_patient, insert_appointment):
+    patient_id = new_patient('Paged Reminders')
+    ids = _book(insert_appointment, patient_id, '2033-03-05', ('09:00:00', '09:00:00', '10:00:00')) + \
+        _book(insert_appointment, patient_id, '2033-03-05', ('11:00:00', '12:00:00'))
+    reminders = generate_reminders(conn, 'upcoming', 180, now=datetime(2033, 3, 5, 8, 30), batch_size=2,
+                                   table='notifications')
+    # 12:00 is past the three-hour window
+    assert [r['appointment_id'] for r in reminders] == ids[:4]
+
+
+def test_failed_delivery_keeps_the_in_app_reminders(new_patient, insert_appointment):
+    patient_id = new_patient('Undelivered Reminder')
+    _book(insert_appointment, patient_id, '2033-03-07', ('09:00:00',))
+    dispatcher = ReminderDispatcher(sender=BrokenSender(), leads=LEADS)
+    assert dispatcher.run_once(now=datetime(2033, 3, 7, 8, 0)) == 1
+    assert dispatcher.stats()['send_failures'] == 1
+
+
+def test_leads_are_parsed_from_name_minutes_pairs():
+    assert parse_leads('day_before:1440, upcoming:120') == LEADS
+    with pytest.raises(ValueError):
+        parse_leads('soon')
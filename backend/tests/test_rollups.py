@@ -0,0 +1,143 @@
+from datetime import date, timedelta
+
+import rollups
+
+DAY = date(2031, 7, 7)
+NEXT_DAY = date(2031, 7, 8)
+
+
+def _rollup_rows(cursor, table, column, key):
+    cursor.execute(f'''
+        SELECT day, appointment_count, completed_count FROM {table}
+        WHERE {column} = %s AND day BETWEEN %s AND %s ORDER BY day
+    ''', (key, DAY, NEXT_DAY))
+    return [(str(row['day']), row['appointment_count'], row['completed_count']) for row in cursor.fetchall()]
+
+
+def _summary_row(cursor, doctor_id, patient_id):
+    cursor.execute('''
+        SELECT appointment_count, last_appointment, last_visit, next_visit FROM doctor_patient_summary
+        WHERE doctor_id = %s AND patient_id = %s
+    ''', (doctor_id, patient_id))
+    row = cursor.fetchone()
+    # Dates compared as ISO strings
+    return row and {k: (str(v) if isinstance(v, (date, str)) else v) for k, v in row.items()}
+
+
+def _create(cursor, appointment):
+    cursor.execute('''
+        INSERT INTO appointments (patient_id, doctor_id, chair_id, date, time, status)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    ''', (appointment['patient_id'], appointment['doctor_id'], appointment['chair_id'], appointment['date'],
+          appointment['time'], appointment['status']))
+    appointment['id'] = cursor.lastrowid
+    rollups.record_created(cursor, appointment)
+    return appointment
+
+
+def _change(cursor, before, **changes):
+    after = dict(before, **changes)
+    cursor.execute('UPDATE appointments SET chair_id = %s, date = %s, status = %s WHERE id = %s',
+                   (after['chair_id'], after['date'], after['status'], after['id']))
+    rollups.record_changed(cursor, before, after)
+    return after
+
+
+def test_write_hooks_match_a_rebuild(conn, new_patient):
+    patient_id = new_patient('Rollup Patient')
+    with conn.cursor() as cursor:
+        first = _create(cursor, {'patient_id': patient_id, 'doctor_id': 2, 'chair_id': 2, 'date': DAY,
+                                 'time': '09:00:00', 'status': 'scheduled'})
+        second = _create(cursor, {'patient_id': patient_id, 'doctor_id': 2, 'chair_id': 3, 'date': DAY,
+                                  'time': '09:30:00', 'status': 'scheduled'})
+        _change(cursor, first, status='completed')
+        _change(cursor, second, chair_id=2, date=NEXT_DAY)
+        conn.commit()
+
+        incremental = (_rollup_rows(cursor, 'doctor_daily_stats', 'doctor_id', 2),
+                       _rollup_rows(cursor, 'chair_daily_stats', 'chair_id', 2),
+                       _rollup_rows(cursor, 'chair_daily_stats', 'chair_id', 3))
+        assert incremental == ([(str(DAY), 1, 1), (str(NEXT_DAY), 1, 0)],
+                               [(str(DAY), 1, 1), (str(NEXT_DAY), 1, 0)],
+                               [(str(DAY), 0, 0)])
+        assert _summary_row(cursor, 2, patient_id) == {
+            'appointment_count': 2, 'last_appointment': str(NEXT_DAY), 'last_visit': str(DAY),
+            'next_visit': str(NEXT_DAY)}
+
+        rollups.rebuild(cursor, DAY, NEXT_DAY)
+        rollups.rebuild(cursor)
+        conn.commit()
+        rebuilt = (_rollup_rows(cursor, 'doctor_daily_stats', 'doctor_id', 2),
+                   _rollup_rows(cursor, 'chair_daily_stats', 'chair_id', 2),
+                   _rollup_rows(cursor, 'chair_daily_stats', 'chair_id', 3))
+        # A rebuild drops the emptied chair 3 row and agrees on the rest
+        assert rebuilt == incremental[:2] + ([],)
+        assert _summary_row(cursor, 2, patient_id)['appointment_count'] == 2
+
+
+def test_summary_row_follows_the_pair_and_is_dropped_when_empty(conn, new_patient):
+    patient_id = new_patient('Moving Patient')
+    with conn.cursor() as cursor:
+        appointment = _create(cursor, {'patient_id': patient_id, 'doctor_id': 1, 'chair_id': None, 'date': DAY,
+                                       'time': '11:00:00', 'status': 'scheduled'})
+        conn.commit()
+        assert _summary_row(cursor, 1, patient_id)['next_visit'] == str(DAY)
+
+        moved = dict(appointment, doctor_id=3)
+        cursor.execute('UPDATE appointments SET doctor_id = 3 WHERE id = %s', (appointment['id'],))
+        rollups.record_changed(cursor, appointment, moved)
+        conn.commit()
+        assert _summary_row(cursor, 1, patient_id) is None
+        assert _summary_row(cursor, 3, patient_id)['appointment_count'] == 1
+
+
+def test_record_changes_nets_deltas_per_row(conn, new_patient):
+    patient_id = new_patient('Batch Patient')
+    day = date(2031, 7, 9)
+    with conn.cursor() as cursor:
+        created = [_create(cursor, {'patient_id': patient_id, 'doctor_id': 3, 'chair_id': 1, 'date': day,
+                                    'time': time, 'status': 'scheduled'}) for time in ('09:00:00', '09:30:00')]
+        # Swap chairs within the day and complete one: the doctor row only gains a completion
+        changes = [(created[0], dict(created[0], chair_id=2, status='completed')),
+                   (created[1], dict(created[1], chair_id=2))]
+        rollups.record_changes(cursor, changes)
+        conn.commit()
+        cursor.execute('SELECT appointment_count, completed_count FROM doctor_daily_stats WHERE doctor_id = 3 AND day = %s',
+                       (day,))
+        assert cursor.fetchone() == {'appointment_count': 2, 'completed_count': 1}
+        cursor.execute('SELECT chair_id, appointment_count FROM chair_daily_stats WHERE day = %s ORDER BY chair_id',
+                       (day,))
+        assert cursor.fetchall() == [{'chair_id': 1, 'appointment_count': 0}, {'chair_id': 2, 'appointment_count': 2}]
+
+
+def test_summarize_rates_by_period():
+    rows = [{'day': date(2031, 7, 7), 'rollup_key': 1, 'appointment_count': 4, 'completed_count': 2},
+            {'day': date(2031, 7, 8), 'rollup_key': 1, 'appointment_count': 6, 'completed_count': 3},
+            {'day': date(2031, 7, 14), 'rollup_key': 1, 'appointment_count': 5, 'completed_count': 5}]
+    total = rollups.summarize(rows, None, date(2031, 7, 7), date(2031, 7, 16), capacity=10)
+    assert total[1] == {'appointment_count': 15, 'completed_count': 10, 'rate': 15.0}
+    weekly = rollups.summarize(rows, 'week', date(2031, 7, 7), date(2031, 7, 16), capacity=10)
+    assert weekly[(date(2031, 7, 7), 1)]['rate'] == round(10 * 100.0 / 70, 2)
+    # Only the three days of the second week inside the range count
+    assert weekly[(date(2031, 7, 14), 1)]['rate'] == round(5 * 100.0 / 30, 2)
+
+
+def test_next_visit_skips_open_appointments_in_the_past(client, conn, auth, new_patient):
+    patient_id = new_patient('Overdue Patient')
+    past, future = date.today() - timedelta(days=30), date.today() + timedelta(days=30)
+    with conn.cursor() as cursor:
+        _create(cursor, {'patient_id': patient_id, 'doctor_id': 2, 'chair_id': None, 'date': past,
+                         'time': '13:00:00', 'status': 'scheduled'})
+        conn.commit()
+        assert _summary_row(cursor, 2, patient_id)['next_visit'] is None
+        _create(cursor, {'patient_id': patient_id, 'doctor_id': 2, 'chair_id': None, 'date': future,
+                         'time': '13:00:00', 'status': 'scheduled'})
+        conn.commit()
+        assert _summary_row(cursor, 2, patient_id)['next_visit'] == str(future)
+
+        # A next visit written before its day passed is recomputed when the list is read
+        cursor.execute('UPDATE doctor_patient_summary SET next_visit = %s WHERE doctor_id = 2 AND patient_id = %s',
+                       (past, patient_id))
+        conn.commit()
+    patients = client.get('/api/doctors/2/patients', headers=auth('drjohnson')).get_json()
+    assert next(p for p in patients if p['id'] == patient_id)['next_visit'] == str(future)
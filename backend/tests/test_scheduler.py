@@ -0,0 +1,79 @@
+from booking_index import to_minutes
+from scheduler import ScheduleOptimizer
+
+HOURS = {1: ['09:00', '09:30'], 2: ['09:00', '09:30']}
+
+
+def _appointment(appointment_id, doctor_id, chair_id, time, status='scheduled', priority='normal'):
+    return {'id': appointment_id, 'doctor_id': doctor_id, 'chair_id': chair_id, 'time': time,
+            'status': status, 'priority': priority, 'type': None}
+
+
+def _final_slots(appointments, result):
+    """{id: (time minutes, chair)} after applying the assignments; unscheduled rows keep theirs"""
+    slots = {a['id']: (to_minutes(a['time']), a['chair_id']) for a in appointments if a['time'] is not None}
+    for assignment in result['assignments']:
+        slots[assignment['id']] = (to_minutes(assignment['time']), assignment['chair_id'])
+    return slots
+
+
+def _assert_no_double_booking(appointments, result):
+    doctors = {a['id']: a['doctor_id'] for a in appointments}
+    taken = set()
+    for appointment_id, (minutes, chair_id) in _final_slots(appointments, result).items():
+        for key in (('doctor', doctors[appointment_id], minutes), ('chair', chair_id, minutes)):
+            assert key not in taken, f'{key} double-booked'
+            taken.add(key)
+
+
+def test_clashing_bookings_are_spread_over_slots_and_chairs():
+    appointments = [_appointment(i, 1 + i % 2, 1, '10:00:00') for i in range(1, 7)]
+    result = ScheduleOptimizer([1, 2], budget=0.05).optimize(appointments)
+    assert result['unscheduled'] == []
+    _assert_no_double_booking(appointments, result)
+    clinic = range(to_minutes('09:00'), to_minutes('17:00'))
+    assert all(to_minutes(a['time']) in clinic for a in result['assignments'])
+
+
+def test_higher_priority_keeps_its_requested_time():
+    appointments = [_appointment(1, 1, 1, '11:00:00', priority='low'),
+                    _appointment(2, 1, 2, '11:00:00', priority='urgent')]
+    result = ScheduleOptimizer([1, 2], budget=0.05).optimize(appointments)
+    assert _final_slots(appointments, result)[2][0] == to_minutes('11:00')
+    assert _final_slots(appointments, result)[1][0] != to_minutes('11:00')
+
+
+def test_fixed_appointments_never_move():
+    appointments = [_appointment(1, 1, 1, '09:00:00', status='in_progress'),
+                    _appointment(2, 1, 1, '09:00:00', priority='urgent')]
+    result = ScheduleOptimizer([1], budget=0.05).optimize(appointments)
+    assert [a['id'] for a in result['assignments']] == [2]
+    _assert_no_double_booking(appointments, result)
+
+
+def test_unscheduled_appointments_keep_their_slot():
+    # Doctor 1 can only work 09:00 on chair 1; the urgent booking must not take it
+    appointments = [_appointment(1, 1, 1, '09:00:00', priority='low'),
+                    _appointment(2, 2, 1, '10:00:00', priority='urgent')]
+    result = ScheduleOptimizer([1], doctor_hours=HOURS, budget=0.05).optimize(appointments)
+    assert result['assignments'] == []
+    assert result['unscheduled'] == [2]
+    _assert_no_double_booking(appointments, result)
+
+
+def test_optimize_endpoint_saves_around_unscheduled_appointments(client, conn, insert_appointment):
+    day = '2031-05-05'
+    insert_appointment(patient_id=1, doctor_id=1, chair_id=1, date=day, time='09:00:00', priority='low')
+    urgent = insert_appointment(patient_id=2, doctor_id=2, chair_id=1, date=day, time='10:00:00',
+                                status='urgent', priority='urgent')
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE chairs SET status = 'maintenance' WHERE id <> 1")
+    conn.commit()
+    try:
+        response = client.post('/api/appointments/optimize', json={'date': day, 'doctor_hours': HOURS})
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("UPDATE chairs SET status = 'available'")
+        conn.commit()
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['unscheduled'] == [urgent]
@@ -0,0 +1,64 @@
+import pytest
+
+import sqlite_db
+from schema import SchemaStatus, check_schema
+
+
+@pytest.fixture
+def fresh_conn(tmp_path):
+    """A database of its own, created from create_tables.sql and migrated"""
+    conn = sqlite_db.connect(str(tmp_path / 'schema.db'))
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _execute(conn, *statements):
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    conn.commit()
+
+
+def test_a_migrated_database_passes(fresh_conn):
+    assert check_schema(fresh_conn) == {'ok': True, 'missing_tables': [], 'missing_columns': [],
+                                        'pending_migrations': []}
+
+
+def test_missing_tables_columns_and_migrations_are_reported(fresh_conn):
+    _execute(fresh_conn, 'DROP TABLE reminder_log', 'ALTER TABLE patients DROP COLUMN age',
+             'DELETE FROM schema_migrations WHERE version = 7')
+    result = check_schema(fresh_conn)
+    assert not result['ok']
+    assert (result['missing_tables'], result['missing_columns'], result['pending_migrations']) == \
+        (['reminder_log'], ['patients.age'], [7])
+
+
+def test_without_schema_migrations_pending_is_unknown(fresh_conn):
+    _execute(fresh_conn, 'DROP TABLE schema_migrations')
+    result = check_schema(fresh_conn)
+    assert result['ok'] and result['pending_migrations'] is None
+
+
+def test_the_status_is_cached_and_only_failures_are_rechecked(tmp_path):
+    calls = []
+
+    def connect():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError('database not up yet')
+        return sqlite_db.connect(str(tmp_path / 'status.db'))
+
+    status = SchemaStatus(connect, recheck_seconds=0)
+    first = status.get()
+    assert (first['ok'], first['error']) == (False, 'database not up yet')
+    assert status.get()['ok']
+    assert status.get()['ok']
+    assert len(calls) == 2
+
+
+def test_health_reports_the_startup_check(client):
+    body = client.get('/api/health').get_json()
+    assert body['status'] == 'ok'
+    assert body['schema']['ok']
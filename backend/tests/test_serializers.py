@@ -0,0 +1,23 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import app as app_module
+from serializers import serialize_row
+
+ROW = {'id': 1, 'day': date(2031, 2, 3), 'at': datetime(2031, 2, 3, 9, 5, 7), 'opens': time(8, 30),
+       'slot': timedelta(hours=9, minutes=30), 'amount': Decimal('12.50'), 'note': None}
+EXPECTED = {'id': 1, 'day': '2031-02-03', 'at': '2031-02-03 09:05:07', 'opens': '08:30:00', 'slot': '9:30:00',
+            'amount': 12.5, 'note': None}
+
+
+def test_serialize_row_converts_in_place():
+    row = dict(ROW)
+    assert serialize_row(row) is row
+    assert row == EXPECTED
+
+
+def test_json_provider_encodes_raw_rows_the_same_way():
+    with app_module.app.app_context():
+        assert app_module.app.json.loads(app_module.app.json.dumps([ROW])) == [EXPECTED]
+        # The pretty-printed (stdlib) path agrees with the orjson one
+        assert app_module.app.json.loads(app_module.app.json.dumps(ROW, indent=2)) == EXPECTED
@@ -0,0 +1,81 @@
+import pytest
+
+from tokens import TokenError, TokenManager
+
+USER = {'id': 7, 'role': 'patient', 'patient_id': 3, 'doctor_id': None}
+
+
+@pytest.fixture
+def manager():
+    return TokenManager(secret=b'test-secret', ttl=60)
+
+
+def test_issued_tokens_verify(manager):
+    token, claims = manager.issue(USER)
+    verified = manager.verify(token)
+    assert verified == claims
+    assert (verified['sub'], verified['role'], verified['patient_id']) == (7, 'patient', 3)
+
+
+def test_tampered_and_foreign_tokens_are_rejected(manager):
+    token, _ = manager.issue(USER)
+    payload, signature = token.split('.')
+    with pytest.raises(TokenError):
+        manager.verify(f'{payload}x.{signature}')
+    with pytest.raises(TokenError):
+        TokenManager(secret=b'other-secret').verify(token)
+    with pytest.raises(TokenError):
+        manager.verify('not-a-token')
+
+
+def test_expired_tokens_are_rejected(manager):
+    token, _ = manager.issue(USER, ttl=-1)
+    with pytest.raises(TokenError, match='expired'):
+        manager.verify(token)
+
+
+def test_scoped_tokens_only_work_for_their_scope(manager):
+    events_token, _ = manager.issue(USER, scope='events')
+    session_token, _ = manager.issue(USER)
+    assert manager.verify(events_token, scope='events')['scope'] == 'events'
+    with pytest.raises(TokenError):
+        manager.verify(events_token)
+    with pytest.raises(TokenError):
+        manager.verify(session_token, scope='events')
+
+
+def test_revoke_denies_one_token(manager):
+    token, claims = manager.issue(USER)
+    other, _ = manager.issue(USER)
+    manager.revoke(claims)
+    with pytest.raises(TokenError, match='revoked'):
+        manager.verify(token)
+    assert manager.verify(other)['sub'] == 7
+
+
+def test_revoke_user_keeps_tokens_issued_right_after(manager):
+    before, _ = manager.issue(USER)
+    manager.revoke_user(USER['id'])
+    after, _ = manager.issue(USER)
+    with pytest.raises(TokenError, match='revoked'):
+        manager.verify(before)
+    # Issued within the same second as the revocation
+    assert manager.verify(after)['sub'] == 7
+    assert manager.verify(manager.issue(dict(USER, id=8))[0])['sub'] == 8
+
+
+def test_log_out_everywhere_then_log_in_again(client, auth):
+    headers = auth('sarah')
+    assert client.post('/api/logout', json={'all': True}, headers=headers).status_code == 200
+    assert client.get('/api/patients/3', headers=headers).status_code == 401
+    assert client.get('/api/patients/3', headers=auth('sarah')).status_code == 200
+
+
+def test_self_service_endpoints_check_the_session(client, auth):
+    assert client.get('/api/patients/3').status_code == 401
+    assert client.get('/api/patients/2', headers=auth('sarah')).status_code == 403
+    assert client.get('/api/doctors/profile?doctor_id=1').status_code == 401
+    doctor = auth('drbrown')
+    assert client.get('/api/doctors/profile', headers=doctor).get_json()['id'] == 3
+    assert client.get('/api/doctors/3/stats', headers=doctor).status_code == 200
+    assert client.get('/api/doctors/1/stats', headers=doctor).status_code == 403
@@ -0,0 +1,80 @@
+import pytest
+
+import user_import
+from passwords import HasherBusy, hash_password, verify_password
+
+
+def _patient(username, name, **fields):
+    return dict({'username': username, 'password': 'import-pass', 'role': 'patient', 'name': name,
+                 'contact': '+1 555-0110', 'age': 33, 'gender': 'Female'}, **fields)
+
+
+def _doctor(username, name, **fields):
+    return dict({'username': username, 'password': 'import-pass', 'role': 'doctor', 'name': name,
+                 'contact': '+1 555-0111', 'specialty': 'Endodontics', 'status': 'approved'}, **fields)
+
+
+@pytest.fixture
+def fast_hashes(monkeypatch):
+    """Cheap scrypt parameters; the importer only has to store something verifiable"""
+    monkeypatch.setattr(user_import.hasher, 'hash_many',
+                        lambda passwords: [hash_password(p, n=2 ** 4) for p in passwords])
+
+
+def _profile_of(conn, username):
+    with conn.cursor() as cursor:
+        cursor.execute('''
+            SELECT u.role, u.password, COALESCE(p.name, d.name) AS name, u.patient_id, u.doctor_id
+            FROM users u
+            LEFT JOIN patients p ON p.id = u.patient_id
+            LEFT JOIN doctors d ON d.id = u.doctor_id
+            WHERE u.username = %s
+        ''', (username,))
+        return cursor.fetchone()
+
+
+def test_every_user_is_linked_to_its_own_profile(conn, fast_hashes):
+    records = [_patient('imp_p1', 'Import Patient One'), _doctor('imp_d1', 'Dr. Import One'),
+               _patient('imp_p2', 'Import Patient Two'), _doctor('imp_d2', 'Dr. Import Two'),
+               _patient('imp_p3', 'Import Patient Three')]
+    summary = user_import.register_records(records, chunk_size=2)
+    assert (summary['created'], summary['failed'], summary['doctors_created']) == (5, 0, 2)
+    for record, result in zip(records, summary['results']):
+        profile = _profile_of(conn, record['username'])
+        assert profile['name'] == record['name']
+        assert result[f"{record['role']}_id"] == profile[f"{record['role']}_id"]
+        assert verify_password('import-pass', profile['password'])[0]
+
+
+def test_invalid_and_taken_usernames_are_reported_per_record(conn, fast_hashes):
+    records = [_patient('riya', 'Taken'), _patient('imp_dup', 'First'), _patient('imp_dup', 'Second'),
+               _patient('imp_noage', 'No Age', age=None), _doctor('imp_ok', 'Dr. Fine')]
+    summary = user_import.register_records(records)
+    assert [r['status'] for r in summary['results']] == ['error', 'created', 'error', 'error', 'created']
+    assert summary['results'][0]['error'] == 'Username already exists'
+    assert summary['results'][2]['error'] == 'Duplicate username in batch'
+    assert _profile_of(conn, 'imp_dup')['name'] == 'First'
+
+
+def test_dry_run_writes_nothing(conn):
+    summary = user_import.register_records([_patient('imp_dry', 'Dry Run')], dry_run=True)
+    assert summary['results'][0]['status'] == 'valid'
+    assert _profile_of(conn, 'imp_dry') is None
+
+
+def test_a_busy_hasher_fails_the_request_before_any_write(client, conn, monkeypatch):
+    def busy(passwords):
+        raise HasherBusy('Too many concurrent password operations, retry shortly')
+    monkeypatch.setattr(user_import.hasher, 'hash_many', busy)
+    response = client.post('/api/register/bulk', json={'records': [_patient('imp_busy', 'Busy')]})
+    assert response.status_code == 503
+    assert _profile_of(conn, 'imp_busy') is None
+
+
+def test_bulk_endpoint_hides_the_import_key(client, fast_hashes):
+    response = client.post('/api/register/bulk', json={'records': [_patient('imp_api', 'Api Patient')]})
+    assert response.status_code == 201
+    patient_id = response.get_json()['results'][0]['patient_id']
+    patient = next(p for p in client.get('/api/patients').get_json() if p['id'] == patient_id)
+    assert patient['name'] == 'Api Patient'
+    assert 'import_key' not in patient
@@ -0,0 +1,119 @@
+"""
+HMAC-signed, expiring session tokens
+
+A token is base64url(JSON claims) + '.' + base64url(HMAC-SHA256 of that
+part). Claims carry the user id, role, patient/doctor id, issue and expiry
+times and a random token id, so a request can be authenticated without a
+database query. Revocation is in-memory: a denylist of token ids (kept
+until the token would have expired anyway) and a per-user "not before"
+time for revoking every session of a user, e.g. a doctor who was rejected.
+With several worker processes, each process only knows the revocations it
+handled itself; keep SESSION_TOKEN_TTL short accordingly.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+SESSION_TOKEN_TTL = int(os.environ.get('SESSION_TOKEN_TTL', str(8 * 3600)))
+
+# Without SESSION_SECRET every process signs with its own random key, so tokens
+# do not survive a restart and are not accepted by other worker processes
+EPHEMERAL_SECRET = not os.environ.get('SESSION_SECRET')
+SECRET = secrets.token_bytes(32) if EPHEMERAL_SECRET else os.environ['SESSION_SECRET'].encode('utf-8')
+
+
+class TokenError(Exception):
+    """Raised for a malformed, forged, expired or revoked token"""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class TokenManager:
+    def __init__(self, secret=SECRET, ttl=SESSION_TOKEN_TTL):
+        self.secret = secret
+        self.ttl = ttl
+        self._denied = {}           # token id -> expiry
+        self._not_before = {}       # user id -> tokens issued before this time are revoked
+        self._lock = threading.Lock()
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self.secret, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, user, ttl=None, scope=None):
+        """Token for a users row (id, role, patient_id, doctor_id); returns (token, claims)"""
+        now = time.time()
+        claims = {
+            'sub': user['id'],
+            'role': user['role'],
+            'patient_id': user.get('patient_id'),
+            'doctor_id': user.get('doctor_id'),
+            # Sub-second issue time, so a login right after a revoke_user() stays valid
+            'iat': now,
+            'exp': int(now) + (ttl or self.ttl),
+            'jti': secrets.token_urlsafe(12),
+        }
+        if scope:
+            claims['scope'] = scope
+        payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+        return f'{payload}.{self._sign(payload)}', claims
+
+    def verify(self, token, scope=None):
+        """Claims of a valid token for `scope` (None for sessions); raises TokenError otherwise"""
+        try:
+            payload, signature = token.split('.')
+        except ValueError:
+            raise TokenError('Malformed token')
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            raise TokenError('Invalid token signature')
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            raise TokenError('Malformed token')
+        if not isinstance(claims, dict):
+            raise TokenError('Malformed token')
+        if claims.get('exp', 0) <= time.time():
+            raise TokenError('Token expired')
+        if claims.get('scope') != scope:
+            raise TokenError('Token not valid for this endpoint')
+        with self._lock:
+            if claims.get('jti') in self._denied:
+                raise TokenError('Token revoked')
+            if claims.get('iat', 0) < self._not_before.get(claims.get('sub'), 0):
+                raise TokenError('Token revoked')
+        return claims
+
+    def revoke(self, claims):
+        """Deny one token until it expires"""
+        now = time.time()
+        with self._lock:
+            self._denied[claims['jti']] = claims['exp']
+            # Expired ids can no longer be presented; drop them as we go
+            for jti in [j for j, exp in self._denied.items() if exp <= now]:
+                del self._denied[jti]
+
+    def revoke_user(self, user_id):
+        """Revoke every token issued to a user so far"""
+        with self._lock:
+            self._not_before[user_id] = time.time()
+            cutoff = time.time() - self.ttl
+            for uid in [u for u, t in self._not_before.items() if t < cutoff]:
+                del self._not_before[uid]
+
+    def stats(self):
+        with self._lock:
+            return {'denylist': len(self._denied), 'revoked_users': len(self._not_before)}
+
+
+tokens = TokenManager()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Bulk registration of doctors and patients
+
+Shared by POST /api/register/bulk and the command line importer. Every record
+is validated up front (same rules as /api/register) and the passwords are
+hashed before a connection is taken for the inserts. The valid records are
+then written in chunks, each chunk one transaction with one multi-row INSERT
+into doctors, patients and users. Profile rows carry a per-chunk import_key
+(migration v10), which is how their ids are read back. Usage:
+
+    python user_import.py FILE.csv|FILE.jsonl [--role patient|doctor] [--chunk-size N] [--dry-run]
+
+CSV files need a header row using the /api/register field names. Passwords
+are scrypt-hashed on the shared hasher pool unless they already are hashes.
+"""
+
+import csv
+import json
+import os
+import sys
+import uuid
+
+from pymysql.err import IntegrityError
+
+from db_pool import get_db_connection
+from passwords import hasher, is_hashed
+
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', '1000'))
+
+REQUIRED_FIELDS = ('username', 'password', 'role', 'name', 'contact')
+DOCTOR_STATUSES = ('pending_approval', 'approved', 'rejected')
+
+ER_DUP_ENTRY = 1062
+
+
+def _to_int(value, default=None):
+    if value in (None, ''):
+        return default
+    if isinstance(value, bool):
+        raise ValueError
+    return int(value)
+
+
+def normalize_record(record, default_role=None):
+    """(row, error) for one registration record; row holds the columns to insert"""
+    if not isinstance(record, dict):
+        return None, 'record must be an object'
+    record = dict(record)
+    if default_role and not record.get('role'):
+        record['role'] = default_role
+    missing = [k for k in REQUIRED_FIELDS if not record.get(k)]
+    if missing:
+        return None, f"Missing required fields: {', '.join(missing)}"
+    row = {'username': str(record['username']).strip(), 'password': str(record['password']),
+           'role': record['role'], 'name': record['name'], 'contact': record['contact']}
+    if not row['username'] or len(row['username']) > 50:
+        return None, 'username must be 1-50 characters'
+    if row['role'] == 'doctor':
+        if not record.get('specialty'):
+            return None, 'Missing specialty for doctor'
+        try:
+            experience = _to_int(record.get('experience'), 0)
+        except ValueError:
+            return None, 'experience must be an integer'
+        status = record.get('status') or 'pending_approval'
+        if status not in DOCTOR_STATUSES:
+            return None, f"status must be one of {', '.join(DOCTOR_STATUSES)}"
+        row.update(specialty=record['specialty'], email=record.get('email', ''),
+                   license_number=record.get('licenseNumber', ''), experience=experience,
+                   education=record.get('education', ''), status=status)
+    elif row['role'] == 'patient':
+        if record.get('age') in (None, '') or not record.get('gender'):
+            return None, 'Missing age or gender for patient'
+        try:
+            row['age'] = _to_int(record['age'])
+        except ValueError:
+            return None, 'age must be an integer'
+        row['gender'] = record['gender']
+    else:
+        return None, 'Invalid role'
+    return row, None
+
+
+def _existing_usernames(cursor, usernames):
+    existing = set()
+    usernames = list(usernames)
+    for start in range(0, len(usernames), IMPORT_CHUNK_SIZE):
+        chunk = usernames[start:start + IMPORT_CHUNK_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f'SELECT username FROM users WHERE username IN ({placeholders})', chunk)
+        existing.update(row['username'] for row in cursor.fetchall())
+    return existing
+
+
+def validate_records(cursor, records, default_role=None):
+    """Validate every record; returns (valid [(index, row)], results list with errors filled in)"""
+    results = [None] * len(records)
+    candidates = []
+    seen = set()
+    for index, record in enumerate(records):
+        row, error = normalize_record(record, default_role)
+        if error is None and row['username'] in seen:
+            error = 'Duplicate username in batch'
+        if error:
+            username = record.get('username') if isinstance(record, dict) else None
+            results[index] = {'index': index, 'username': username, 'status': 'error', 'error': error}
+            continue
+        seen.add(row['username'])
+        candidates.append((index, row))
+    existing = _existing_usernames(cursor, seen)
+    valid = []
+    for index, row in candidates:
+        if row['username'] in existing:
+            results[index] = {'index': index, 'username': row['username'], 'status': 'error', 'error': 'Username already exists'}
+        else:
+            valid.append((index, row))
+    return valid, results
+
+
+def _insert_many(cursor, sql_prefix, row_template, rows):
+    """One multi-row INSERT"""
+    params = []
+    for row in rows:
+        params.extend(row)
+    cursor.execute(f"{sql_prefix} VALUES {', '.join([row_template] * len(rows))}", params)
+
+
+def _insert_profiles(cursor, table, columns, row_template, rows):
+    """Multi-row INSERT of profile rows; returns their ids, in order
+
+    Ids of a multi-row INSERT are not consecutive while other sessions
+    insert too (innodb_autoinc_lock_mode=2), so each row gets
+    '<batch>:<position>' as its last value, the import_key column, and the
+    ids are read back by it.
+    """
+    batch = uuid.uuid4().hex
+    _insert_many(cursor, f'INSERT INTO {table} ({columns})', row_template,
+                 [row + (f'{batch}:{position}',) for position, row in enumerate(rows)])
+    cursor.execute(f'SELECT id, import_key FROM {table} WHERE import_key LIKE %s', (f'{batch}:%',))
+    ids = {row['import_key']: row['id'] for row in cursor.fetchall()}
+    return [ids[f'{batch}:{position}'] for position in range(len(rows))]
+
+
+def _insert_chunk(cursor, chunk):
+    """Insert doctors/patients and their users for one chunk; returns {index: (role, profile_id)}"""
+    doctors = [(index, row) for index, row in chunk if row['role'] == 'doctor']
+    patients = [(index, row) for index, row in chunk if row['role'] == 'patient']
+    created = {}
+    users = []
+    if doctors:
+        ids = _insert_profiles(
+            cursor, 'doctors',
+            'name, specialty, contact, email, license_number, experience, education, status, rejection_reason, created_at, '
+            'import_key',
+            '(%s, %s, %s, %s, %s, %s, %s, %s, NULL, NOW(), %s)',
+            [(r['name'], r['specialty'], r['contact'], r['email'], r['license_number'], r['experience'], r['education'], r['status'])
+             for _, r in doctors])
+        for (index, row), doctor_id in zip(doctors, ids):
+            users.append((row['username'], row['password'], 'doctor', None, doctor_id))
+            created[index] = ('doctor', doctor_id)
+    if patients:
+        ids = _insert_profiles(
+            cursor, 'patients', 'name, age, gender, contact, import_key', '(%s, %s, %s, %s, %s)',
+            [(r['name'], r['age'], r['gender'], r['contact']) for _, r in patients])
+        for (index, row), patient_id in zip(patients, ids):
+            users.append((row['username'], row['password'], 'patient', patient_id, None))
+            created[index] = ('patient', patient_id)
+    _insert_many(cursor, 'INSERT INTO users (username, password, role, patient_id, doctor_id)',
+                 '(%s, %s, %s, %s, %s)', users)
+    return created
+
+
+def _write_chunks(conn, valid, results, chunk_size):
+    """Insert the validated, hashed rows chunk by chunk; returns how many doctors were created"""
+    doctors_created = 0
+    with conn.cursor() as cursor:
+        for start in range(0, len(valid), chunk_size):
+            chunk = valid[start:start + chunk_size]
+            # A username registered concurrently since validation fails the chunk;
+            # drop the taken ones and retry the rest once
+            for attempt in range(2):
+                try:
+                    created = _insert_chunk(cursor, chunk)
+                    conn.commit()
+                    break
+                except IntegrityError as e:
+                    conn.rollback()
+                    if attempt or not e.args or e.args[0] != ER_DUP_ENTRY:
+                        created = {}
+                        for index, row in chunk:
+                            results[index] = {'index': index, 'username': row['username'], 'status': 'error', 'error': str(e)}
+                        break
+                    taken = _existing_usernames(cursor, [row['username'] for _, row in chunk])
+                    for index, row in chunk:
+                        if row['username'] in taken:
+                            results[index] = {'index': index, 'username': row['username'], 'status': 'error',
+                                              'error': 'Username already exists'}
+                    chunk = [(index, row) for index, row in chunk if row['username'] not in taken]
+                    if not chunk:
+                        created = {}
+                        break
+                except Exception as e:
+                    conn.rollback()
+                    created = {}
+                    for index, row in chunk:
+                        results[index] = {'index': index, 'username': row['username'], 'status': 'error', 'error': str(e)}
+                    break
+            for index, row in chunk:
+                if index in created:
+                    role, profile_id = created[index]
+                    results[index] = {'index': index, 'username': row['username'], 'status': 'created',
+                                      'role': role, f'{role}_id': profile_id}
+                    doctors_created += role == 'doctor'
+    return doctors_created
+
+
+def register_records(records, default_role=None, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+    """Validate and insert registration records
+
+    Returns {'created', 'failed', 'doctors_created', 'results'}; results has
+    one entry per input record, in input order. Pooled connections are only
+    held for the validation query and the inserts, not while hashing;
+    HasherBusy is raised before anything is written.
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            valid, results = validate_records(cursor, records, default_role)
+    finally:
+        conn.close()
+    doctors_created = 0
+    if dry_run:
+        for index, row in valid:
+            results[index] = {'index': index, 'username': row['username'], 'status': 'valid'}
+    elif valid:
+        # Values already in the stored hash format are kept
+        plain = [row for _, row in valid if not is_hashed(row['password'])]
+        for row, value in zip(plain, hasher.hash_many([row['password'] for row in plain])):
+            row['password'] = value
+        conn = get_db_connection()
+        try:
+            doctors_created = _write_chunks(conn, valid, results, chunk_size)
+        finally:
+            conn.close()
+    failed = sum(1 for result in results if result['status'] == 'error')
+    return {'created': len(results) - failed if not dry_run else 0, 'failed': failed,
+            'doctors_created': doctors_created, 'results': results}
+
+
+def read_records(path):
+    """Records from a .csv (with header) or .jsonl file"""
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            return [{k: v for k, v in row.items() if v != ''} for row in csv.DictReader(f)]
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+    return records
+
+
+def main(argv):
+    args = argv[1:]
+    options = {'--role': None, '--chunk-size': str(IMPORT_CHUNK_SIZE)}
+    dry_run = '--dry-run' in args
+    args = [a for a in args if a != '--dry-run']
+    paths = []
+    while args:
+        arg = args.pop(0)
+        if arg in options and args:
+            options[arg] = args.pop(0)
+        else:
+            paths.append(arg)
+    if len(paths) != 1:
+        print(__doc__)
+        return 2
+
+    records = read_records(paths[0])
+    print(f"📥 Importing {len(records)} records from {paths[0]}" + (" (dry run)" if dry_run else ""))
+    summary = register_records(records, default_role=options['--role'], chunk_size=int(options['--chunk-size']),
+                               dry_run=dry_run)
+    for result in summary['results']:
+        if result['status'] == 'error':
+            print(f"❌ #{result['index']} {result['username']}: {result['error']}")
+    print(f"✅ Created {summary['created']}, failed {summary['failed']}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Bell, User, Stethoscope, LogOut } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 import axios from 'axios';
+import { authHeaders } from '@/lib/auth';
 import { useNavigate } from 'react-router-dom';
 
 const DoctorHeader = () => {
@@ -15,7 +16,7 @@ const DoctorHeader = () => {
   useEffect(() => {
     const fetchDoctorProfile = async () => {
       try {
-        const response = await axios.get(`http://127.0.0.1:5000/api/doctors/profile?doctor_id=${doctorId}`);
+        const response = await axios.get(`http://127.0.0.1:5000/api/doctors/profile`, { headers: authHeaders() });
         setDoctorProfile(response.data);
       } catch (error) {
         console.error('Error fetching doctor profile:', error);
@@ -4,6 +4,7 @@ import { Button } from '@/components/ui/button';
 import NotificationDropdown from './NotificationDropdown';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
+import { authHeaders } from '@/lib/auth';
 
 const PatientHeader = () => {
   const [patientName, setPatientName] = useState('Patient');
@@ -12,7 +13,7 @@ const PatientHeader = () => {
   useEffect(() => {
     const user = JSON.parse(localStorage.getItem('user') || '{}');
     if (user && user.patient_id) {
-      axios.get('http://127.0.0.1:5000/api/patients/' + user.patient_id)
+      axios.get('http://127.0.0.1:5000/api/patients/' + user.patient_id, { headers: authHeaders() })
         .then(res => setPatientName(res.data.name))
         .catch(() => setPatientName('Patient'));
     }
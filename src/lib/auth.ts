@@ -0,0 +1,5 @@
+// Authorization header for the signed-in user's session token
+export function authHeaders(): Record<string, string> {
+  const user = JSON.parse(localStorage.getItem('user') || '{}');
+  return user.token ? { Authorization: `Bearer ${user.token}` } : {};
+}
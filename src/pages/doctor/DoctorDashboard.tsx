@@ -4,6 +4,7 @@ import { Badge } from '@/components/ui/badge';
 import { Button } from '@/components/ui/button';
 import { Calendar, Users, Clock, AlertTriangle, CheckCircle, FileText, Zap } from 'lucide-react';
 import axios from 'axios';
+import { authHeaders } from '@/lib/auth';
 import { useNavigate } from 'react-router-dom';
 import SmartScheduler from '@/components/doctor/SmartScheduler';
 import { formatDateToIST, formatTimeToIST } from '@/lib/utils';
@@ -25,15 +26,15 @@ const DoctorDashboard = () => {
         setLoading(true);
         
         // Fetch doctor profile
-        const profileResponse = await axios.get(`http://127.0.0.1:5000/api/doctors/profile?doctor_id=${doctorId}`);
+        const profileResponse = await axios.get(`http://127.0.0.1:5000/api/doctors/profile`, { headers: authHeaders() });
         setDoctorProfile(profileResponse.data);
         
         // Fetch today's appointments
-        const appointmentsResponse = await axios.get(`http://127.0.0.1:5000/api/doctors/${doctorId}/appointments/today`);
+        const appointmentsResponse = await axios.get(`http://127.0.0.1:5000/api/doctors/${doctorId}/appointments/today`, { headers: authHeaders() });
         setUpcomingAppointments(appointmentsResponse.data);
         
         // Fetch doctor stats
-        const statsResponse = await axios.get(`http://127.0.0.1:5000/api/doctors/${doctorId}/stats`);
+        const statsResponse = await axios.get(`http://127.0.0.1:5000/api/doctors/${doctorId}/stats`, { headers: authHeaders() });
         const stats = statsResponse.data;
         
         setTodayStats({
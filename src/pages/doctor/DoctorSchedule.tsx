@@ -5,6 +5,7 @@ import { Badge } from '@/components/ui/badge';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Calendar, Clock, User, CheckCircle, XCircle, AlertTriangle } from 'lucide-react';
 import axios from 'axios';
+import { authHeaders } from '@/lib/auth';
 import { useNavigate } from 'react-router-dom';
 import { getCurrentISTDate, formatDateToIST, formatTimeToIST } from '@/lib/utils';
 
@@ -21,7 +22,7 @@ const DoctorSchedule = () => {
     const fetchAppointments = async () => {
       try {
         setLoading(true);
-        const response = await axios.get(`http://127.0.0.1:5000/api/doctors/${doctorId}/appointments`);
+        const response = await axios.get(`http://127.0.0.1:5000/api/doctors/${doctorId}/appointments`, { headers: authHeaders() });
         setAppointments(response.data);
       } catch (error) {
         console.error('Error fetching appointments:', error);
@@ -40,7 +41,7 @@ const DoctorSchedule = () => {
       });
       
       // Refresh appointments
-      const response = await axios.get(`http://127.0.0.1:5000/api/doctors/${doctorId}/appointments`);
+      const response = await axios.get(`http://127.0.0.1:5000/api/doctors/${doctorId}/appointments`, { headers: authHeaders() });
       setAppointments(response.data);
     } catch (error) {
       console.error('Error updating appointment status:', error);
@@ -5,6 +5,7 @@ import { Badge } from '@/components/ui/badge';
 import { Input } from '@/components/ui/input';
 import { Search, User, Phone, Calendar, FileText, Eye } from 'lucide-react';
 import axios from 'axios';
+import { authHeaders } from '@/lib/auth';
 import { useNavigate } from 'react-router-dom';
 
 const PatientRecords = () => {
@@ -21,7 +22,7 @@ const PatientRecords = () => {
     const fetchPatients = async () => {
       try {
         setLoading(true);
-        const response = await axios.get(`http://127.0.0.1:5000/api/doctors/${doctorId}/patients`);
+        const response = await axios.get(`http://127.0.0.1:5000/api/doctors/${doctorId}/patients`, { headers: authHeaders() });
         setPatients(response.data);
         setFilteredPatients(response.data);
       } catch (error) {
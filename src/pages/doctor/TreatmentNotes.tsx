@@ -8,6 +8,7 @@ import { Label } from '@/components/ui/label';
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogTrigger } from '@/components/ui/dialog';
 import { Search, FileText, Plus, User, Calendar, Eye } from 'lucide-react';
 import axios from 'axios';
+import { authHeaders } from '@/lib/auth';
 import { useNavigate, useSearchParams } from 'react-router-dom';
 
 const TreatmentNotes = () => {
@@ -43,7 +44,7 @@ const TreatmentNotes = () => {
         setFilteredNotes(notesResponse.data);
         
         // Fetch patients for the doctor
-        const patientsResponse = await axios.get(`http://127.0.0.1:5000/api/doctors/${doctorId}/patients`);
+        const patientsResponse = await axios.get(`http://127.0.0.1:5000/api/doctors/${doctorId}/patients`, { headers: authHeaders() });
         setPatients(patientsResponse.data);
         
         // Check if patient_id is in URL params (for direct navigation from patient list)
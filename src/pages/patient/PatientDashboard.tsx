@@ -5,6 +5,7 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/com
 import { Input } from '@/components/ui/input';
 import { Link } from 'react-router-dom';
 import axios from 'axios';
+import { authHeaders } from '@/lib/auth';
 import { formatDateToIST, formatTimeToIST } from '@/lib/utils';
 
 const PatientDashboard = () => {
@@ -20,7 +21,7 @@ const PatientDashboard = () => {
   useEffect(() => {
     const user = JSON.parse(localStorage.getItem('user') || '{}');
     if (!user.patient_id) return;
-    axios.get('http://127.0.0.1:5000/api/patients/' + user.patient_id)
+    axios.get('http://127.0.0.1:5000/api/patients/' + user.patient_id, { headers: authHeaders() })
       .then(res => setPatient(res.data))
       .catch(() => setPatient(null));
     axios.get('http://127.0.0.1:5000/api/appointments?patient_id=' + user.patient_id)